@@ -0,0 +1,882 @@
+"""
+Adoption leaderboard for the copilot_user_adoption index.
+
+The user metrics records of a report period are reduced to one row per user
+(in order of first appearance) held in NumPy arrays, one array per signal.
+Scoring then works on whole arrays:
+
+- the 5th/95th percentile bounds of each signal come from np.partition
+  (O(n) selection) with the same linear interpolation as a sorted list,
+- each signal is robust-scaled into [0, 1] and combined with equal weights,
+- a consistency bonus of up to 10% rewards users active on more days,
+- adoption_pct is the score relative to the best user, rounded to 0.1.
+
+The top N users get their own entries; everyone else is folded into one
+"Others" entry. build_windowed_adoption_leaderboards builds per-user daily
+counters with prefix sums once and derives a leaderboard for each trailing
+window (ADOPTION_WINDOWS, default 7/14/28 days) in O(users). Because adoption_pct is rounded to one decimal it fits a
+small integer key, so the ranking is a stable radix argsort in O(n) that
+keeps users with equal percentages in first-appearance order.
+
+Per-team leaderboards join users to teams through a login -> team slug index
+built from the seat assignments. All teams are scored in one grouped pass: a
+lexsort by (team, value) yields every team's percentile bounds at once, and a
+lexsort by (team, -adoption_pct) yields every team's ranking.
+
+Every entry carries `leaderboard_scope`, "organization" or "team", so panels
+can select the org-wide leaderboard without picking up the teams' top N. It
+is not part of the unique_hash, so entry ids are unchanged.
+"""
+
+import os
+import math
+from operator import itemgetter
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from doc_ids import generate_unique_hash, key_scheme
+
+# Trailing windows (in days, ending on the report end day) to build leaderboards for
+ADOPTION_WINDOWS = [
+    int(days) for days in os.getenv("ADOPTION_WINDOWS", "7,14,28").split(",") if days.strip()
+]
+
+SIGNAL_WEIGHT = 0.2
+CONSISTENCY_BONUS = float(os.getenv("ADOPTION_CONSISTENCY_BONUS", "0.1"))
+TOP_N = int(os.getenv("ADOPTION_TOP_N", "10"))
+# Team of users without a seat assignment, same slug as the seat assignments use
+NO_TEAM = "no-team"
+# leaderboard_scope of the org-wide and the per-team entries
+ORGANIZATION_SCOPE = "organization"
+TEAM_SCOPE = "team"
+SCORE_SIGNALS = (
+    "volume",
+    "interactions_per_day",
+    "acceptance_rate",
+    "average_loc_added",
+    "feature_breadth",
+)
+
+
+def parse_weights(spec):
+    """
+    Signal weights from "signal=weight,..." (e.g. "volume=0.4,acceptance_rate=0.1").
+
+    Signals that are not listed keep SIGNAL_WEIGHT.
+    """
+    weights = {name: SIGNAL_WEIGHT for name in SCORE_SIGNALS}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in weights:
+            raise ValueError(f"Unknown adoption signal '{name}', expected one of {', '.join(SCORE_SIGNALS)}")
+        weights[name] = float(weight)
+    return weights
+
+
+SIGNAL_WEIGHTS = parse_weights(os.getenv("ADOPTION_WEIGHTS", ""))
+
+HASH_PROPERTIES = [
+    "organization_slug",
+    "user_login",
+    "report_start_day",
+    "report_end_day",
+    "bucket_type",
+]
+
+# UserSignals counter -> field of the persisted per-user aggregate documents
+AGGREGATE_FIELDS = {
+    "events_logged": "events_logged",
+    "volume": "volume",
+    "code_generation": "code_generation_activity_count",
+    "code_acceptance": "code_acceptance_activity_count",
+    "loc_added": "loc_added_sum",
+    "loc_suggested": "loc_suggested_to_add_sum",
+    "agent_usage": "agent_usage",
+    "chat_usage": "chat_usage",
+    "active_days": "active_days",
+}
+# Aggregates are keyed by the KEY_PROPERTIES of this index (see doc_ids.py)
+AGGREGATES_INDEX = os.getenv("INDEX_USER_ADOPTION_AGGREGATES", "copilot_user_adoption_aggregates")
+
+# Per-user aggregate -> user metrics field summed into it
+SUMMED_FIELDS = {
+    "volume": "user_initiated_interaction_count",
+    "code_generation": "code_generation_activity_count",
+    "code_acceptance": "code_acceptance_activity_count",
+    "loc_added": "loc_added_sum",
+    "loc_suggested": "loc_suggested_to_add_sum",
+}
+
+
+class UserSignals:
+    """Per-user aggregates of one report period, one array element per user."""
+
+    def __init__(
+        self,
+        logins,
+        counters,
+        report_start_day=None,
+        report_end_day=None,
+        int_users=None,
+        window_days=None,
+    ):
+        self.logins = logins
+        # events_logged, volume, code_generation, code_acceptance, loc_added,
+        # loc_suggested, agent_usage, chat_usage, active_days
+        self.counters = counters
+        # For counters that are float because some records held floats: users
+        # whose own records were all integers, so their sum stays an int
+        self.int_users = int_users or {}
+        self.report_start_day = report_start_day
+        self.report_end_day = report_end_day
+        # Length of the trailing window the aggregates cover; None for the whole report
+        self.window_days = window_days
+
+    def __len__(self):
+        return len(self.logins)
+
+    def __getitem__(self, name):
+        return self.counters[name]
+
+
+def _sum_by_user(user_ids, values, n_users, float_records=None):
+    """Per-user sums, plus which users only had integer values when `values` is float."""
+    if values.dtype.kind in "iub":
+        # Float accumulation is exact for integer sums below 2**53
+        return np.bincount(user_ids, weights=values, minlength=n_users).astype(np.int64), None
+    sums = np.bincount(user_ids, weights=values.astype(np.float64), minlength=n_users)
+    if float_records is None:
+        return sums, None
+    return sums, np.bincount(user_ids, weights=float_records, minlength=n_users) == 0
+
+
+def _columns(records, fields, default):
+    """
+    (array, float_records) per field; itemgetter fast path when every record
+    has all fields with integer values.
+    """
+    try:
+        rows = np.array(list(map(itemgetter(*fields), records)))
+    except KeyError:
+        rows = None
+    if rows is not None and rows.ndim == 2 and rows.dtype.kind in "iub":
+        return [(column, None) for column in rows.T]
+
+    # Missing keys or mixed value types: build each column on its own so an
+    # integer column stays integer
+    columns = []
+    for field in fields:
+        values = [record.get(field, default) for record in records]
+        array = np.asarray(values)
+        float_records = None
+        if array.dtype.kind == "f":
+            float_records = np.fromiter(
+                (isinstance(value, float) for value in values), dtype=bool, count=len(values)
+            )
+        columns.append((array, float_records))
+    return columns
+
+
+def _values(records, field, default=None):
+    try:
+        return list(map(itemgetter(field), records))
+    except KeyError:
+        return [record.get(field, default) for record in records]
+
+
+def _first_appearance_ids(values):
+    """Dense ids for `values` numbered in order of first appearance, plus the distinct values."""
+    index = {}
+    ids = np.fromiter(
+        (index.setdefault(value, len(index)) for value in values),
+        dtype=np.int64,
+        count=len(values),
+    )
+    return ids, list(index)
+
+
+def aggregate_user_signals(metrics_data):
+    """Group user metrics records by user_login into a UserSignals."""
+    user_ids, logins = _first_appearance_ids(
+        [login or "unknown" for login in _values(metrics_data, "user_login")]
+    )
+    n_users = len(logins)
+
+    counters = {"events_logged": np.bincount(user_ids, minlength=n_users).astype(np.int64)}
+    int_users = {}
+    summed = _columns(metrics_data, list(SUMMED_FIELDS.values()), 0)
+    for name, (values, float_records) in zip(SUMMED_FIELDS, summed):
+        counters[name], mask = _sum_by_user(user_ids, values, n_users, float_records)
+        if mask is not None:
+            int_users[name] = mask
+
+    for name, field in (("agent_usage", "used_agent"), ("chat_usage", "used_chat")):
+        flags = np.fromiter(map(bool, _values(metrics_data, field)), dtype=bool, count=len(metrics_data))
+        counters[name], _ = _sum_by_user(user_ids, flags, n_users)
+
+    # Distinct (user, day) pairs; records without a day do not count
+    day_ids, days = _first_appearance_ids([day or "" for day in _values(metrics_data, "day")])
+    pairs = np.unique(user_ids * (len(days) + 1) + day_ids)
+    if "" in days:
+        pairs = pairs[pairs % (len(days) + 1) != days.index("")]
+    counters["active_days"] = np.bincount(pairs // (len(days) + 1), minlength=n_users).astype(np.int64)
+
+    start_days = set(_values(metrics_data, "report_start_day")) - {None, ""}
+    end_days = set(_values(metrics_data, "report_end_day")) - {None, ""}
+
+    return UserSignals(
+        logins=logins,
+        counters=counters,
+        int_users=int_users,
+        report_start_day=min(start_days) if start_days else None,
+        report_end_day=max(end_days) if end_days else None,
+    )
+
+
+# Daily counters of records holding floats, kept next to float-valued counters
+FLOAT_RECORDS_SUFFIX = "_float_records"
+
+
+class DailyUserSignals:
+    """
+    Per-user, per-day counters with prefix sums along the day axis.
+
+    prefix[name][u, d] is user u's total over the first d days of the report,
+    so any trailing window is one subtraction per user.
+    """
+
+    def __init__(self, logins, first_day, prefix, report_start_day=None, report_end_day=None):
+        self.logins = logins
+        self.first_day = first_day
+        self.prefix = prefix
+        self.report_start_day = report_start_day
+        self.report_end_day = report_end_day
+
+    @property
+    def n_days(self):
+        return next(iter(self.prefix.values())).shape[1] - 1
+
+    def window(self, window_days):
+        """UserSignals for the `window_days` days ending on the report end day."""
+        last_day = self.first_day + timedelta(days=self.n_days - 1)
+        end_day = date.fromisoformat(self.report_end_day) if self.report_end_day else last_day
+        # The window ends on the report end day even when the data stops earlier
+        raw_end = (end_day - self.first_day).days + 1
+        raw_start = raw_end - window_days
+        if raw_end <= 0 or raw_start >= self.n_days:
+            return UserSignals([], {}, window_days=window_days)
+        end = min(raw_end, self.n_days)
+        start = max(raw_start, 0)
+
+        totals = {name: prefix[:, end] - prefix[:, start] for name, prefix in self.prefix.items()}
+        # Users without records in the window are not part of its leaderboard
+        present = np.flatnonzero(totals["events_logged"] > 0)
+        counters = {}
+        int_users = {}
+        for name, values in totals.items():
+            if name.endswith(FLOAT_RECORDS_SUFFIX):
+                int_users[name[: -len(FLOAT_RECORDS_SUFFIX)]] = values[present] == 0
+            else:
+                counters[name] = values[present]
+
+        window_start = (end_day - timedelta(days=window_days - 1)).isoformat()
+        if self.report_start_day and self.report_start_day > window_start:
+            window_start = self.report_start_day
+        return UserSignals(
+            logins=[self.logins[index] for index in present.tolist()],
+            counters=counters,
+            report_start_day=window_start,
+            report_end_day=self.report_end_day or last_day.isoformat(),
+            int_users=int_users,
+            window_days=window_days,
+        )
+
+
+def _daily_matrix(cells, values, n_cells, shape):
+    if values is None:
+        totals = np.bincount(cells, minlength=n_cells)
+    else:
+        totals = np.bincount(cells, weights=values, minlength=n_cells)
+    if values is None or values.dtype.kind in "iub":
+        totals = totals.astype(np.int64)
+    return totals.reshape(shape)
+
+
+def aggregate_daily_user_signals(metrics_data):
+    """
+    Group user metrics records by user and day into a DailyUserSignals.
+
+    Records without a day cannot be placed in a window and are left out.
+    """
+    dated = [record for record in metrics_data if record.get("day")]
+    if not dated:
+        return None
+
+    user_ids, logins = _first_appearance_ids(
+        [login or "unknown" for login in _values(dated, "user_login")]
+    )
+    day_ids, days = _first_appearance_ids(_values(dated, "day"))
+    day_dates = [date.fromisoformat(day[:10]) for day in days]
+    first_day = min(day_dates)
+    n_days = (max(day_dates) - first_day).days + 1
+    day_offsets = np.array([(day - first_day).days for day in day_dates], dtype=np.int64)
+
+    shape = (len(logins), n_days)
+    cells = user_ids * n_days + day_offsets[day_ids]
+    n_cells = shape[0] * shape[1]
+
+    daily = {"events_logged": _daily_matrix(cells, None, n_cells, shape)}
+    summed = _columns(dated, list(SUMMED_FIELDS.values()), 0)
+    for name, (values, float_records) in zip(SUMMED_FIELDS, summed):
+        daily[name] = _daily_matrix(cells, values, n_cells, shape)
+        if float_records is not None:
+            daily[name + FLOAT_RECORDS_SUFFIX] = _daily_matrix(cells, float_records, n_cells, shape)
+    for name, field in (("agent_usage", "used_agent"), ("chat_usage", "used_chat")):
+        flags = np.fromiter(map(bool, _values(dated, field)), dtype=bool, count=len(dated))
+        daily[name] = _daily_matrix(cells, flags, n_cells, shape)
+    daily["active_days"] = (daily["events_logged"] > 0).astype(np.int64)
+
+    prefix = {}
+    for name, matrix in daily.items():
+        cumulative = np.zeros((shape[0], n_days + 1), dtype=matrix.dtype)
+        np.cumsum(matrix, axis=1, out=cumulative[:, 1:])
+        prefix[name] = cumulative
+
+    start_days = set(_values(metrics_data, "report_start_day")) - {None, ""}
+    end_days = set(_values(metrics_data, "report_end_day")) - {None, ""}
+    return DailyUserSignals(
+        logins=logins,
+        first_day=first_day,
+        prefix=prefix,
+        report_start_day=min(start_days) if start_days else None,
+        report_end_day=max(end_days) if end_days else None,
+    )
+
+
+def _ratio(numerator, denominator):
+    return np.where(denominator != 0, numerator / np.where(denominator != 0, denominator, 1), 0.0)
+
+
+def derived_signals(signals):
+    """The five scored signals (plus inputs) as arrays."""
+    active_days = signals["active_days"]
+    return {
+        "volume": signals["volume"],
+        "interactions_per_day": _ratio(signals["volume"], active_days),
+        "acceptance_rate": _ratio(signals["code_acceptance"], signals["code_generation"]),
+        "average_loc_added": _ratio(signals["loc_added"], active_days),
+        "feature_breadth": signals["agent_usage"] + signals["chat_usage"],
+    }
+
+
+def compute_percentile_bounds(values, lower_pct=5, upper_pct=95):
+    """
+    Interpolated percentiles of `values` using partial selection.
+
+    Matches interpolating into sorted(values): k = (n - 1) * p / 100 with the
+    two neighbouring order statistics, computed with the same float operations.
+    """
+    n = len(values)
+    if not n:
+        return 0.0, 0.0
+    ks = [(n - 1) * (p / 100) for p in (lower_pct, upper_pct)]
+    positions = sorted({pos for k in ks for pos in (math.floor(k), math.ceil(k))})
+    selected = np.partition(values, positions)
+
+    bounds = []
+    for k in ks:
+        lower, upper = math.floor(k), math.ceil(k)
+        if lower == upper:
+            bounds.append(float(selected[lower]))
+        else:
+            bounds.append(
+                float(selected[lower]) * (upper - k) + float(selected[upper]) * (k - lower)
+            )
+    return tuple(bounds)
+
+
+def robust_scale(values, lower, upper):
+    if upper <= lower:
+        return np.ones(len(values))
+    return np.clip((values - lower) / (upper - lower), 0.0, 1.0)
+
+
+def score_signals(signals, weights=None, consistency_bonus=CONSISTENCY_BONUS):
+    """Return (derived signals, consistency bonus, adoption score) arrays."""
+    weights = weights or SIGNAL_WEIGHTS
+    derived = derived_signals(signals)
+
+    base_score = None
+    for name in SCORE_SIGNALS:
+        term = weights[name] * robust_scale(derived[name], *compute_percentile_bounds(derived[name]))
+        base_score = term if base_score is None else base_score + term
+
+    active_days = signals["active_days"]
+    max_active_days = active_days.max()
+    if max_active_days:
+        bonus = np.minimum(consistency_bonus * (active_days / max_active_days), consistency_bonus)
+    else:
+        bonus = np.zeros(len(signals))
+    return derived, bonus, base_score * (1 + bonus)
+
+
+def rank_order(adoption_pct):
+    """Indices by adoption_pct descending, ties in first-appearance order."""
+    keys = np.rint(np.asarray(adoption_pct) * 10).astype(np.int16)
+    return np.argsort(-keys, kind="stable")
+
+
+def _python_values(values, indices, int_mask=None):
+    result = values[indices].tolist()
+    if int_mask is not None:
+        result = [int(value) if is_int else value for value, is_int in zip(result, int_mask[indices].tolist())]
+    return result
+
+
+def _ordered_sum(values, indices, int_mask=None):
+    if values.dtype.kind in "iub":
+        return int(values[indices].sum())
+    # Left-to-right like the builtin sum, not NumPy's pairwise summation
+    total = sum(values[indices].tolist())
+    if int_mask is not None and int_mask[indices].all():
+        return int(total)
+    return total
+
+
+def _leaderboard_entries(
+    signals,
+    derived,
+    bonus,
+    adoption_score,
+    adoption_pct,
+    top,
+    others,
+    max_score,
+    organization_slug,
+    slug_type,
+    extra_fields=None,
+):
+    """
+    Entries for the ranked users in `top` plus one Others entry for `others`.
+
+    `extra_fields` (window_days, team_slug) are stored on every entry and are
+    part of its unique_hash.
+    """
+    extra_fields = extra_fields or {}
+    hash_properties = HASH_PROPERTIES + list(extra_fields)
+
+    start_day = signals.report_start_day
+    end_day = signals.report_end_day
+    # Stamp a day for Grafana time filtering: prefer the report end day, fallback to current UTC day
+    stamped_day = end_day if end_day else datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    columns = {
+        "events_logged": signals["events_logged"],
+        "volume": signals["volume"],
+        "code_generation_activity_count": signals["code_generation"],
+        "code_acceptance_activity_count": signals["code_acceptance"],
+        "loc_added_sum": signals["loc_added"],
+        "loc_suggested_to_add_sum": signals["loc_suggested"],
+        "average_loc_added": derived["average_loc_added"],
+        "interactions_per_day": derived["interactions_per_day"],
+        "acceptance_rate": derived["acceptance_rate"],
+        "feature_breadth": derived["feature_breadth"],
+        "agent_usage": signals["agent_usage"],
+        "chat_usage": signals["chat_usage"],
+        "active_days": signals["active_days"],
+    }
+    int_masks = {
+        "volume": signals.int_users.get("volume"),
+        "code_generation_activity_count": signals.int_users.get("code_generation"),
+        "code_acceptance_activity_count": signals.int_users.get("code_acceptance"),
+        "loc_added_sum": signals.int_users.get("loc_added"),
+        "loc_suggested_to_add_sum": signals.int_users.get("loc_suggested"),
+    }
+    top_columns = {
+        name: _python_values(values, top, int_masks.get(name)) for name, values in columns.items()
+    }
+    top_bonus = bonus[top].tolist()
+    top_score = adoption_score[top].tolist()
+
+    entries = []
+    for position, index in enumerate(top.tolist()):
+        entry = {
+            "user_login": signals.logins[index],
+            "organization_slug": organization_slug,
+            "slug_type": slug_type,
+        }
+        for name, values in top_columns.items():
+            entry[name] = values[position]
+        entry.update({
+            "report_start_day": start_day,
+            "report_end_day": end_day,
+            "day": stamped_day,
+            "bucket_type": "user",
+            "is_top10": True,
+            "rank": position + 1,
+            **extra_fields,
+        })
+        entry["unique_hash"] = generate_unique_hash(entry, key_properties=hash_properties)
+        entry["consistency_bonus"] = top_bonus[position]
+        entry["adoption_score"] = top_score[position]
+        entry["adoption_pct"] = adoption_pct[index]
+        entries.append(entry)
+
+    if len(others):
+        others_count = len(others)
+        others_entry = {
+            "user_login": "Others",
+            "organization_slug": organization_slug,
+            "slug_type": slug_type,
+        }
+        for name in (
+            "events_logged",
+            "volume",
+            "code_generation_activity_count",
+            "code_acceptance_activity_count",
+            "loc_added_sum",
+            "loc_suggested_to_add_sum",
+        ):
+            others_entry[name] = _ordered_sum(columns[name], others, int_masks.get(name))
+        for name in ("average_loc_added", "interactions_per_day", "acceptance_rate", "feature_breadth"):
+            others_entry[name] = _ordered_sum(columns[name], others) / others_count
+        for name in ("agent_usage", "chat_usage", "active_days"):
+            others_entry[name] = _ordered_sum(columns[name], others)
+        others_entry.update({
+            "report_start_day": start_day,
+            "report_end_day": end_day,
+            "day": stamped_day,
+            "bucket_type": "others",
+            "is_top10": False,
+            "rank": None,
+            "others_count": others_count,
+            "consistency_bonus": 0.0,
+            **extra_fields,
+        })
+        others_entry["adoption_score"] = _ordered_sum(adoption_score, others) / others_count
+        score_scale = max_score if max_score else 1
+        others_entry["adoption_pct"] = round(others_entry["adoption_score"] / score_scale * 100, 1)
+        others_entry["unique_hash"] = generate_unique_hash(others_entry, key_properties=hash_properties)
+        entries.append(others_entry)
+
+    return entries
+
+
+def _with_scope(entries, scope):
+    # Set after the unique_hash, which predates the scope
+    for entry in entries:
+        entry["leaderboard_scope"] = scope
+    return entries
+
+
+def _window_fields(signals):
+    if signals.window_days is None:
+        return {}
+    return {"window_days": signals.window_days}
+
+
+def build_leaderboard_entries(
+    signals,
+    organization_slug,
+    slug_type,
+    top_n=TOP_N,
+    weights=None,
+    consistency_bonus=CONSISTENCY_BONUS,
+):
+    """Score `signals` and return the top_n user entries plus an Others entry."""
+    if not len(signals):
+        return []
+
+    derived, bonus, adoption_score = score_signals(signals, weights, consistency_bonus)
+    max_score = float(adoption_score.max())
+    if max_score:
+        adoption_pct = [round(value, 1) for value in (adoption_score / max_score * 100).tolist()]
+    else:
+        adoption_pct = [0.0] * len(signals)
+
+    order = rank_order(adoption_pct)
+    entries = _leaderboard_entries(
+        signals,
+        derived,
+        bonus,
+        adoption_score,
+        adoption_pct,
+        order[:top_n],
+        order[top_n:],
+        max_score,
+        organization_slug,
+        slug_type,
+        _window_fields(signals),
+    )
+    return _with_scope(entries, ORGANIZATION_SCOPE)
+
+
+def build_team_index(seat_assignments):
+    """Hash index of assignee_login -> assignee_team_slug from seat assignments."""
+    return {
+        seat["assignee_login"]: seat.get("assignee_team_slug") or NO_TEAM
+        for seat in seat_assignments or []
+        if seat.get("assignee_login")
+    }
+
+
+def team_groups(signals, user_teams):
+    """(team slugs, per-user team id array) for the users in `signals`."""
+    team_ids = {}
+    group_ids = np.fromiter(
+        (team_ids.setdefault(user_teams.get(login, NO_TEAM), len(team_ids)) for login in signals.logins),
+        dtype=np.int64,
+        count=len(signals),
+    )
+    return list(team_ids), group_ids
+
+
+def grouped_percentile_bounds(values, group_ids, n_groups, lower_pct=5, upper_pct=95):
+    """
+    Per-group interpolated percentiles from one lexsort by (group, value).
+
+    Same interpolation as compute_percentile_bounds, vectorized over groups.
+    """
+    order = np.lexsort((values, group_ids))
+    sorted_values = values[order].astype(np.float64)
+    counts = np.bincount(group_ids, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+
+    bounds = []
+    for pct in (lower_pct, upper_pct):
+        k = (counts - 1) * (pct / 100)
+        lower = np.floor(k).astype(np.int64)
+        upper = np.ceil(k).astype(np.int64)
+        lower_values = sorted_values[starts + lower]
+        upper_values = sorted_values[starts + upper]
+        bounds.append(
+            np.where(lower == upper, lower_values, lower_values * (upper - k) + upper_values * (k - lower))
+        )
+    return tuple(bounds)
+
+
+def grouped_robust_scale(values, group_ids, lower, upper):
+    """robust_scale with each value scaled by its own group's bounds."""
+    lower = lower[group_ids]
+    upper = upper[group_ids]
+    spread = upper > lower
+    scaled = np.clip((values - lower) / np.where(spread, upper - lower, 1.0), 0.0, 1.0)
+    return np.where(spread, scaled, 1.0)
+
+
+def score_signals_by_group(signals, group_ids, n_groups, weights=None, consistency_bonus=CONSISTENCY_BONUS):
+    """
+    score_signals where bounds and the consistency bonus are per group.
+
+    Returns (derived signals, consistency bonus, adoption score, per-group max score).
+    """
+    weights = weights or SIGNAL_WEIGHTS
+    derived = derived_signals(signals)
+
+    base_score = None
+    for name in SCORE_SIGNALS:
+        lower, upper = grouped_percentile_bounds(derived[name], group_ids, n_groups)
+        term = weights[name] * grouped_robust_scale(derived[name], group_ids, lower, upper)
+        base_score = term if base_score is None else base_score + term
+
+    active_days = signals["active_days"]
+    max_active_days = np.zeros(n_groups, dtype=active_days.dtype)
+    np.maximum.at(max_active_days, group_ids, active_days)
+    user_max_active_days = max_active_days[group_ids]
+    has_active_days = user_max_active_days > 0
+    bonus = np.where(
+        has_active_days,
+        np.minimum(
+            consistency_bonus * (active_days / np.where(has_active_days, user_max_active_days, 1)),
+            consistency_bonus,
+        ),
+        0.0,
+    )
+    adoption_score = base_score * (1 + bonus)
+
+    max_score = np.zeros(n_groups)
+    np.maximum.at(max_score, group_ids, adoption_score)
+    return derived, bonus, adoption_score, max_score
+
+
+def build_team_leaderboard_entries(
+    signals,
+    user_teams,
+    organization_slug,
+    slug_type,
+    top_n=TOP_N,
+    weights=None,
+    consistency_bonus=CONSISTENCY_BONUS,
+):
+    """
+    Per-team leaderboards from one grouped scoring pass.
+
+    Users are joined to teams through `user_teams` (see build_team_index);
+    users without a seat fall into NO_TEAM. Each team is scored against its
+    own percentile bounds and best user, ranked within the team, and gets its
+    own top_n entries and Others entry carrying `team_slug`.
+    """
+    if not len(signals):
+        return []
+
+    teams, group_ids = team_groups(signals, user_teams)
+    derived, bonus, adoption_score, max_score = score_signals_by_group(
+        signals, group_ids, len(teams), weights, consistency_bonus
+    )
+    user_max_score = max_score[group_ids]
+    ratio = adoption_score / np.where(user_max_score > 0, user_max_score, 1) * 100
+    adoption_pct = [
+        round(value, 1) if has_score else 0.0
+        for value, has_score in zip(ratio.tolist(), (user_max_score > 0).tolist())
+    ]
+
+    # Group by team, then adoption_pct descending, ties in first-appearance order
+    keys = np.rint(np.asarray(adoption_pct) * 10).astype(np.int16)
+    order = np.lexsort((-keys, group_ids))
+    counts = np.bincount(group_ids, minlength=len(teams))
+    ends = np.cumsum(counts)
+
+    entries = []
+    window = _window_fields(signals)
+    for team_id, team_slug in enumerate(teams):
+        members = order[ends[team_id] - counts[team_id]:ends[team_id]]
+        entries.extend(
+            _leaderboard_entries(
+                signals,
+                derived,
+                bonus,
+                adoption_score,
+                adoption_pct,
+                members[:top_n],
+                members[top_n:],
+                float(max_score[team_id]),
+                organization_slug,
+                slug_type,
+                {**window, "team_slug": team_slug},
+            )
+        )
+    return _with_scope(entries, TEAM_SCOPE)
+
+
+def build_user_adoption_leaderboard(metrics_data, organization_slug, slug_type, top_n=TOP_N):
+    if not metrics_data:
+        return []
+    signals = aggregate_user_signals(metrics_data)
+    return build_leaderboard_entries(signals, organization_slug, slug_type, top_n=top_n)
+
+
+def windowed_user_signals(metrics_data, windows=None):
+    """UserSignals for each trailing window, from one aggregation pass."""
+    if not metrics_data:
+        return []
+    daily = aggregate_daily_user_signals(metrics_data)
+    if daily is None:
+        return []
+    return [daily.window(window_days) for window_days in windows or ADOPTION_WINDOWS]
+
+
+def build_adoption_entries(
+    signals,
+    organization_slug,
+    slug_type,
+    top_n=TOP_N,
+    user_teams=None,
+    weights=None,
+    consistency_bonus=CONSISTENCY_BONUS,
+):
+    """The org-wide leaderboard of `signals`, plus per-team ones when `user_teams` is given."""
+    entries = build_leaderboard_entries(
+        signals, organization_slug, slug_type, top_n=top_n, weights=weights, consistency_bonus=consistency_bonus
+    )
+    if user_teams is not None:
+        entries.extend(
+            build_team_leaderboard_entries(
+                signals,
+                user_teams,
+                organization_slug,
+                slug_type,
+                top_n=top_n,
+                weights=weights,
+                consistency_bonus=consistency_bonus,
+            )
+        )
+    return entries
+
+
+def build_windowed_adoption_leaderboards(
+    metrics_data, organization_slug, slug_type, windows=None, top_n=TOP_N, user_teams=None
+):
+    """
+    Leaderboards for several trailing windows from one aggregation pass.
+
+    Entries carry `window_days`, which is also part of their unique_hash, so
+    the windows live side by side in copilot_user_adoption. With `user_teams`
+    (login -> team slug) each window also gets per-team leaderboards.
+    """
+    entries = []
+    for signals in windowed_user_signals(metrics_data, windows):
+        entries.extend(
+            build_adoption_entries(signals, organization_slug, slug_type, top_n=top_n, user_teams=user_teams)
+        )
+    return entries
+
+
+def aggregate_documents(signals, organization_slug, slug_type, user_teams=None):
+    """
+    One copilot_user_adoption_aggregates document per user of `signals`.
+
+    The documents hold every input of the score, so signals_from_documents can
+    rebuild the UserSignals without the user metrics. `position` keeps the
+    first-appearance order that breaks ranking ties.
+    """
+    all_users = np.arange(len(signals))
+    columns = {
+        field: _python_values(signals[name], all_users, signals.int_users.get(name))
+        for name, field in AGGREGATE_FIELDS.items()
+    }
+    documents = []
+    for position, login in enumerate(signals.logins):
+        document = {
+            "organization_slug": organization_slug,
+            "slug_type": slug_type,
+            "user_login": login,
+            "report_start_day": signals.report_start_day,
+            "report_end_day": signals.report_end_day,
+            "day": signals.report_end_day,
+            "position": position,
+        }
+        if signals.window_days is not None:
+            document["window_days"] = signals.window_days
+        if user_teams is not None:
+            document["team_slug"] = user_teams.get(login, NO_TEAM)
+        for field, values in columns.items():
+            document[field] = values[position]
+        documents.append(document)
+    return key_scheme(AGGREGATES_INDEX).assign(documents)
+
+
+def signals_from_documents(documents):
+    """UserSignals of one org and period from its aggregate documents."""
+    documents = sorted(documents, key=itemgetter("position"))
+    counters = {}
+    int_users = {}
+    for name, field in AGGREGATE_FIELDS.items():
+        values = _values(documents, field, 0)
+        counters[name] = np.asarray(values)
+        if counters[name].dtype.kind == "f" and name in SUMMED_FIELDS:
+            int_users[name] = np.fromiter(
+                (isinstance(value, int) for value in values), dtype=bool, count=len(values)
+            )
+    first = documents[0] if documents else {}
+    return UserSignals(
+        logins=_values(documents, "user_login"),
+        counters=counters,
+        report_start_day=first.get("report_start_day"),
+        report_end_day=first.get("report_end_day"),
+        int_users=int_users,
+        window_days=first.get("window_days"),
+    )
@@ -0,0 +1,125 @@
+"""
+Benchmark gzip request compression for bulk traffic to Elasticsearch.
+
+Generates user-metrics documents with the mock data generator (nested
+totals_by_* arrays, like the real ones) and bulk-indexes them into a scratch
+index twice: once with a plain client and once with http_compress enabled.
+For each mode it reports the request bytes put on the wire and the latency of
+every bulk request.
+
+Start a local cluster first, for example:
+    docker compose up -d elasticsearch
+
+Usage:
+    python benchmarks/bench_es_compression.py --docs 20000 --batch-size 500 --rounds 3
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from es_client import create_es_client, load_mapping  # noqa: E402
+import generate_mock_data  # noqa: E402
+
+BENCH_INDEX = "bench_es_compression"
+
+
+def build_docs(count):
+    random.seed(42)
+    developers = generate_mock_data.create_developers()
+    adoption = datetime.now().date() - timedelta(days=400)
+    docs = []
+    day = adoption
+    while len(docs) < count:
+        for developer in developers:
+            doc = generate_mock_data.generate_copilot_metrics_for_day(developer, day, adoption)
+            if doc:
+                # Unique login per copy so ids do not collide
+                doc["user_login"] = f"{doc['user_login']}-{len(docs)}"
+                doc["unique_hash"] = f"bench-{len(docs)}"
+                docs.append(doc)
+        day += timedelta(days=1)
+    return docs[:count]
+
+
+def bulk_operations(docs):
+    operations = []
+    for doc in docs:
+        operations.append({"index": {"_index": BENCH_INDEX, "_id": doc["unique_hash"]}})
+        operations.append(doc)
+    return operations
+
+
+def wire_bytes(operations, compress):
+    # Same NDJSON the client sends; elastic_transport gzips it when http_compress is on
+    body = "".join(json.dumps(op, separators=(",", ":")) + "\n" for op in operations).encode()
+    return len(gzip.compress(body)) if compress else len(body)
+
+
+def reset_index(es):
+    es.indices.delete(index=BENCH_INDEX, ignore_unavailable=True)
+    mapping = load_mapping(os.getenv("INDEX_USER_METRICS", "copilot_user_metrics"))
+    es.indices.create(index=BENCH_INDEX, mappings=mapping.get("mappings", {}))
+
+
+def run(es, batches, compress):
+    reset_index(es)
+    latencies = []
+    sent = 0
+    started = time.perf_counter()
+    for operations in batches:
+        sent += wire_bytes(operations, compress)
+        t0 = time.perf_counter()
+        resp = es.bulk(operations=operations)
+        latencies.append(time.perf_counter() - t0)
+        if resp.get("errors"):
+            raise RuntimeError("Bulk request reported item errors")
+    elapsed = time.perf_counter() - started
+    return {"bytes": sent, "elapsed": elapsed, "latencies": latencies}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    docs = build_docs(args.docs)
+    batches = [
+        bulk_operations(docs[i:i + args.batch_size]) for i in range(0, len(docs), args.batch_size)
+    ]
+    clients = {
+        "plain": create_es_client(http_compress=False),
+        "gzip": create_es_client(http_compress=True),
+    }
+
+    print(f"{len(docs)} docs in {len(batches)} bulk requests of {args.batch_size}")
+    print(f"{'mode':<6} {'MB sent':>9} {'ratio':>6} {'p50 ms':>8} {'p95 ms':>8} {'docs/s':>9}")
+    try:
+        baseline = None
+        for mode, es in clients.items():
+            results = [run(es, batches, compress=(mode == "gzip")) for _ in range(args.rounds)]
+            sent = results[0]["bytes"]
+            baseline = baseline or sent
+            latencies = sorted(l for r in results for l in r["latencies"])
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            docs_per_second = len(docs) / statistics.median(r["elapsed"] for r in results)
+            print(
+                f"{mode:<6} {sent / 1e6:>9.2f} {sent / baseline:>6.2f} "
+                f"{statistics.median(latencies) * 1000:>8.1f} {p95 * 1000:>8.1f} {docs_per_second:>9.0f}"
+            )
+    finally:
+        clients["plain"].indices.delete(index=BENCH_INDEX, ignore_unavailable=True)
+
+
+if __name__ == "__main__":
+    main()
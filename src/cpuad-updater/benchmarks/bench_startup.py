@@ -0,0 +1,84 @@
+"""
+Benchmark the import time of the collector modules.
+
+Imports each module in a fresh interpreter (python -X importtime), in an empty
+working directory and without GITHUB_PAT or ORGANIZATION_SLUGS, and reports
+the median wall time, the cumulative import time of the module and its
+slowest dependencies. A module that exits or writes files (log folders) while
+being imported is reported as having side effects, and fails the benchmark.
+
+Usage:
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --module collector --module transforms --top 15
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODULES = ["collector", "transforms", "snapshots", "main"]
+UNSET_VARIABLES = ("GITHUB_PAT", "ORGANIZATION_SLUGS", "ENABLE_DEMO_MODE")
+
+
+def import_once(module):
+    """(wall seconds, return code, files created, -X importtime rows) of one import."""
+    env = {key: value for key, value in os.environ.items() if key not in UNSET_VARIABLES}
+    env["PYTHONPATH"] = SOURCE_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    with tempfile.TemporaryDirectory() as cwd:
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        elapsed = time.perf_counter() - start
+        created = sorted(os.listdir(cwd))
+    return elapsed, result.returncode, created, parse_importtime(result.stderr)
+
+
+def parse_importtime(stderr):
+    """[(cumulative us, self us, module)] of the -X importtime lines."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", action="append", help=f"Module to import (repeatable, default: {DEFAULT_MODULES})")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest dependencies to list per module")
+    args = parser.parse_args()
+
+    side_effects = False
+    for module in args.module or DEFAULT_MODULES:
+        runs = [import_once(module) for _ in range(max(1, args.repeat))]
+        wall = statistics.median(run[0] for run in runs)
+        _, returncode, created, rows = runs[-1]
+        own = next((row for row in reversed(rows) if row[2].strip() == module), None)
+        cumulative = own[0] / 1000 if own else float("nan")
+
+        print(f"{module}: {wall * 1000:8.1f} ms wall, {cumulative:8.1f} ms import (median of {len(runs)})")
+        if returncode or created:
+            side_effects = True
+            print(f"  side effects: exit code {returncode}, created {created or 'nothing'}")
+        for cumulative_us, self_us, name in sorted(rows, reverse=True)[1:args.top + 1]:
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+
+    if side_effects:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Adaptive bulk writer for Elasticsearch.
+
+Callers queue actions in the same shape as elasticsearch.helpers.bulk
+({"_op_type", "_index", "_id", "_source"}) and the writer sends them in
+batches from a small thread pool. Batch size and the number of bulk requests
+in flight are tuned while writing with AIMD (additive increase, multiplicative
+decrease), the same scheme TCP uses for its congestion window:
+
+- every bulk request that completes below BULK_TARGET_LATENCY grows the batch
+  by one step and, once per full window of requests, allows one more request
+  in flight;
+- a request that is slower than the target, is rejected with 429 or times
+  out halves both.
+
+Items that Elasticsearch rejects with 429 (write queue full) are retried with
+exponential backoff and jitter; other item errors are counted and logged.
+Per-index counters and throughput are available from stats().
+
+Usage:
+    with BulkWriter(es) as writer:
+        for doc in docs:
+            writer.add({"_index": "my-index", "_id": doc["id"], "_source": doc})
+    writer.log_stats()
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from elasticsearch import ApiError, ConnectionTimeout
+
+from es_client import get_es_client
+
+logger = logging.getLogger(__name__)
+
+BULK_INITIAL_BATCH_SIZE = int(os.getenv("BULK_INITIAL_BATCH_SIZE", "500"))
+BULK_MIN_BATCH_SIZE = int(os.getenv("BULK_MIN_BATCH_SIZE", "50"))
+BULK_MAX_BATCH_SIZE = int(os.getenv("BULK_MAX_BATCH_SIZE", "5000"))
+BULK_MAX_CONCURRENCY = int(os.getenv("BULK_MAX_CONCURRENCY", "4"))
+# Seconds; bulk requests slower than this are treated as backpressure
+BULK_TARGET_LATENCY = float(os.getenv("BULK_TARGET_LATENCY", "2.0"))
+BULK_MAX_RETRIES = int(os.getenv("BULK_MAX_RETRIES", "5"))
+
+# Item errors kept for inspection, the rest are only counted
+MAX_KEPT_ERRORS = 100
+
+
+class AIMDController:
+    """Batch size and concurrency limit, adjusted from bulk request outcomes."""
+
+    def __init__(
+        self,
+        batch_size=BULK_INITIAL_BATCH_SIZE,
+        min_batch_size=BULK_MIN_BATCH_SIZE,
+        max_batch_size=BULK_MAX_BATCH_SIZE,
+        max_concurrency=BULK_MAX_CONCURRENCY,
+        target_latency=BULK_TARGET_LATENCY,
+    ):
+        self.min_batch_size = max(1, min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, max_batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.target_latency = target_latency
+        self.batch_size = min(max(batch_size, self.min_batch_size), self.max_batch_size)
+        self.concurrency = 1
+
+        self._lock = threading.Lock()
+        self._successes = 0
+        self._last_decrease = 0.0
+
+    def on_success(self, latency):
+        if latency > self.target_latency:
+            self.on_backpressure()
+            return
+        with self._lock:
+            self.batch_size = min(self.max_batch_size, self.batch_size + self.min_batch_size)
+            self._successes += 1
+            if self._successes >= self.concurrency:
+                self._successes = 0
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+
+    def on_backpressure(self):
+        with self._lock:
+            now = time.monotonic()
+            # Requests in flight when the cluster pushed back report it as well;
+            # only back off once per window
+            if now - self._last_decrease < self.target_latency:
+                return
+            self._last_decrease = now
+            self._successes = 0
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            self.concurrency = max(1, self.concurrency // 2)
+            logger.info(
+                f"Bulk backpressure: batch size {self.batch_size}, concurrency {self.concurrency}"
+            )
+
+
+class BulkWriter:
+    """Thread-safe, adaptive replacement for elasticsearch.helpers.bulk."""
+
+    def __init__(self, es=None, controller=None, max_retries=BULK_MAX_RETRIES, backoff=1.0, max_backoff=30.0):
+        self.es = es or get_es_client()
+        self.controller = controller or AIMDController()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.errors = []
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.controller.max_concurrency, thread_name_prefix="bulk-writer"
+        )
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._in_flight = 0
+        self._in_flight_cond = threading.Condition()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, action, stats_key=None):
+        """Queue one action; `stats_key` groups its counters (defaults to its _index)."""
+        if self._closed:
+            raise RuntimeError("BulkWriter is closed")
+        key = stats_key or action["_index"]
+        batch = None
+        with self._buffer_lock:
+            self._buffer.append((action, key))
+            if len(self._buffer) >= self.controller.batch_size:
+                batch, self._buffer = self._buffer, []
+        if batch:
+            self._submit(batch)
+
+    def add_many(self, actions, stats_key=None):
+        for action in actions:
+            self.add(action, stats_key=stats_key)
+
+    def flush(self):
+        """Send everything queued so far and wait for all requests in flight."""
+        with self._buffer_lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._submit(batch)
+        with self._in_flight_cond:
+            while self._in_flight:
+                self._in_flight_cond.wait()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        """Per-index counters: indexed, failed, retried, requests, seconds, docs_per_second."""
+        with self._stats_lock:
+            result = {}
+            for key, entry in self._stats.items():
+                elapsed = max(entry["last_done"] - entry["first_sent"], 1e-9)
+                result[key] = {
+                    "indexed": entry["indexed"],
+                    "failed": entry["failed"],
+                    "retried": entry["retried"],
+                    "requests": entry["requests"],
+                    "seconds": round(elapsed, 3),
+                    "docs_per_second": round(entry["indexed"] / elapsed, 1),
+                }
+            return result
+
+    def totals(self):
+        totals = {"indexed": 0, "failed": 0, "retried": 0}
+        for entry in self.stats().values():
+            for field in totals:
+                totals[field] += entry[field]
+        return totals
+
+    def log_stats(self):
+        for key, entry in sorted(self.stats().items()):
+            logger.info(
+                f"Bulk {key}: {entry['indexed']} indexed, {entry['failed']} failed, "
+                f"{entry['retried']} retried in {entry['requests']} requests, "
+                f"{entry['docs_per_second']} docs/s"
+            )
+        logger.info(
+            f"Bulk writer settled at batch size {self.controller.batch_size}, "
+            f"concurrency {self.controller.concurrency}"
+        )
+
+    def _submit(self, batch):
+        with self._in_flight_cond:
+            while self._in_flight >= self.controller.concurrency:
+                self._in_flight_cond.wait()
+            self._in_flight += 1
+        try:
+            self._executor.submit(self._run, batch)
+        except Exception:
+            self._release()
+            raise
+
+    def _release(self):
+        with self._in_flight_cond:
+            self._in_flight -= 1
+            self._in_flight_cond.notify_all()
+
+    def _record(self, key, field, count=1, sent_at=None):
+        with self._stats_lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = {
+                    "indexed": 0,
+                    "failed": 0,
+                    "retried": 0,
+                    "requests": 0,
+                    "first_sent": sent_at or time.monotonic(),
+                    "last_done": 0.0,
+                }
+            entry[field] += count
+            entry["last_done"] = time.monotonic()
+
+    def _record_error(self, action, error):
+        if len(self.errors) < MAX_KEPT_ERRORS:
+            self.errors.append({"_index": action.get("_index"), "_id": action.get("_id"), "error": error})
+
+    @staticmethod
+    def _operations(batch):
+        operations = []
+        for action, _ in batch:
+            op_type = action.get("_op_type", "index")
+            header = {"_index": action["_index"]}
+            if action.get("_id") is not None:
+                header["_id"] = action["_id"]
+            operations.append({op_type: header})
+            if op_type != "delete":
+                operations.append(action.get("_source", {}))
+        return operations
+
+    def _run(self, batch):
+        try:
+            self._send_with_retries(batch)
+        except Exception as e:
+            logger.error(f"Bulk request failed: {e}")
+            for action, key in batch:
+                self._record(key, "failed")
+                self._record_error(action, str(e))
+        finally:
+            self._release()
+
+    def _send_with_retries(self, batch):
+        pending = batch
+        attempt = 0
+        while pending:
+            sent_at = time.monotonic()
+            for key in {key for _, key in pending}:
+                self._record(key, "requests", sent_at=sent_at)
+            try:
+                resp = self.es.bulk(operations=self._operations(pending))
+            except (ApiError, ConnectionTimeout) as e:
+                if isinstance(e, ApiError) and e.meta.status != 429:
+                    raise
+                rejected = pending
+            else:
+                latency = time.monotonic() - sent_at
+                rejected = []
+                for (action, key), item in zip(pending, resp["items"]):
+                    result = next(iter(item.values()))
+                    if result.get("status") == 429:
+                        rejected.append((action, key))
+                    elif result.get("error"):
+                        self._record(key, "failed")
+                        self._record_error(action, result["error"])
+                    else:
+                        self._record(key, "indexed")
+                if not rejected:
+                    self.controller.on_success(latency)
+                    return
+
+            self.controller.on_backpressure()
+            attempt += 1
+            if attempt > self.max_retries:
+                logger.error(f"Giving up on {len(rejected)} bulk items after {self.max_retries} retries")
+                for action, key in rejected:
+                    self._record(key, "failed")
+                    self._record_error(action, "rejected with 429")
+                return
+
+            for _, key in rejected:
+                self._record(key, "retried")
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+            time.sleep(delay * random.uniform(0.5, 1.0))
+            pending = rejected
@@ -0,0 +1,1097 @@
+"""
+Collector core: fetch Copilot data from GitHub and write it to Elasticsearch.
+
+Importing this module has no side effects (no log files or handlers, no
+exit on missing configuration), so worker processes, tools and tests can use the
+fetchers and writers directly; main.py is the command line entry point that
+configures logging, validates the environment and schedules the runs.
+
+- GitHubEnterpriseManager / GitHubOrganizationManager: GitHub API fetchers,
+- ElasticsearchManager: index setup and document writes,
+- collect_organization: one collection run for an organization or
+  standalone slug (seats, user metrics and derived indices, developer
+  activity, usage).
+"""
+
+import copy
+import json
+import logging
+import requests
+import os
+from elasticsearch import NotFoundError
+from datetime import datetime, timedelta
+from log_utils import SAMPLED, current_time
+import time
+import traceback
+from zoneinfo import ZoneInfo
+from create_user_summary import create_user_summaries
+from create_user_top_by_day import create_user_top_by_day
+from metrics_rollup import update_metrics_rollup
+from metrics_facts import write_facts
+from fetch_developer_activity import DEVELOPER_ACTIVITY_MODE, DeveloperActivityFetcher, last_stored_days
+from es_client import get_es_client, ensure_indexes
+from index_lifecycle import ensure_partitioned_index, write_index_for
+from doc_ids import key_scheme
+from bulk_writer import BulkWriter
+from snapshots import dict_save_to_json_file
+from run_cache import cached_listing
+from config import Paras, Indexes
+from transforms import DataSplitter, convert_metrics_to_usage, enrich_user_metrics
+from adoption_leaderboard import (
+    aggregate_documents,
+    aggregate_user_signals,
+    build_adoption_entries,
+    build_team_index,
+    windowed_user_signals,
+)
+from rescore_adoption import write_aggregates
+
+logger = logging.getLogger(__name__)
+
+
+def get_utc_offset():
+    tz_name = os.environ.get("TZ", "GMT")
+    try:
+        local_tz = ZoneInfo(tz_name)
+    except Exception:
+        local_tz = ZoneInfo("GMT")
+    now = datetime.now(local_tz)
+    offset_sec = now.utcoffset().total_seconds()
+    offset_hours = int(offset_sec // 3600)
+    offset_minutes = int((offset_sec % 3600) // 60)
+    offset_str = f"{offset_hours:+03}:{abs(offset_minutes):02}"
+    return offset_str
+
+
+def github_api_request_handler(url, error_return_value=[]):
+    logger.info(f"Requesting URL: {url}")
+    headers = {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {Paras.github_pat}",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+    
+    try:
+        response = requests.get(url, headers=headers)
+        logger.debug(f"Response status code: {response.status_code}")
+        
+        if response.status_code != 200:
+            logger.error(f"HTTP {response.status_code} error for URL: {url}")
+            logger.error(f"Response text: {response.text}")
+            return error_return_value
+        
+        data = response.json()
+        logger.debug(f"Successfully received data from: {url}")
+        
+        if isinstance(data, dict) and data.get("status", "200") != "200":
+            logger.error(f"Request failed reason: {data}")
+            return error_return_value
+        return data
+        
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Request exception for URL {url}: {e}")
+        return error_return_value
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON decode error for URL {url}: {e}")
+        return error_return_value
+
+
+def assign_position_in_tree(nodes):
+    # Create a dictionary with node id as key and node data as value
+    node_dict = {node["id"]: node for node in nodes}
+
+    # Create sets to store all node ids and child node ids
+    all_ids = set(node_dict.keys())
+    child_ids = set()
+
+    # Build parent-child relationships
+    for node in nodes:
+        parent = node.get("parent")
+        if parent and "id" in parent:
+            parent_id = parent["id"]
+            child_ids.add(node["id"])
+            # Add child node list to parent node
+            parent_node = node_dict.get(parent_id)
+            if parent_node:
+                parent_node.setdefault("children", []).append(node["id"])
+
+    # Find root nodes (nodes that are not child nodes)
+    root_ids = all_ids - child_ids
+
+    # Mark the position of all nodes
+    for node_id in all_ids:
+        node = node_dict[node_id]
+        children = node.get("children", [])
+        if not children:
+            node["position_in_tree"] = "leaf_team"
+        elif node_id in root_ids:
+            node["position_in_tree"] = "root_team"
+        else:
+            node["position_in_tree"] = "trunk_team"
+
+    return nodes
+
+
+class GitHubEnterpriseManager:
+
+    # Question: Teams under the same Enterprise can be duplicated in different orgs, so isn't there a problem with the API like this?
+    # https://docs.github.com/en/enterprise-cloud@latest/rest/copilot/copilot-usage?apiVersion=2022-11-28#get-a-summary-of-copilot-usage-for-an-enterprise-team
+
+    def __init__(self, token, enterprise_slug, save_to_json=True):
+        self.token = token
+        self.enterprise_slug = enterprise_slug
+        self.headers = {
+            "Accept": "application/vnd.github+json",
+            "Authorization": f"Bearer {self.token}",
+        }
+        self.url = "https://api.github.com/graphql"
+        self.orgs = self._fetch_all_organizations(save_to_json=save_to_json)
+        self.orgs_slugs = [org["login"] for org in self.orgs]
+        self.github_organization_managers = {
+            orgs_slug: GitHubOrganizationManager(self.token, orgs_slug)
+            for orgs_slug in self.orgs_slugs
+        }
+        logger.info(
+            f"Initialized GitHubEnterpriseManager for enterprise: {enterprise_slug}"
+        )
+
+    def _fetch_all_organizations(self, save_to_json=False):
+
+        # GraphQL query
+        query = (
+            """
+        {
+            enterprise(slug: "%s") {
+                organizations(first: 100) {
+                    nodes {
+                        login
+                        name
+                        description
+                        email
+                        isVerified
+                        location
+                        websiteUrl
+                        createdAt
+                        updatedAt
+                        membersWithRole {
+                            totalCount
+                        }
+                        teams {
+                            totalCount
+                        }
+                        repositories {
+                            totalCount
+                        }
+                    }
+                }
+            }
+        }
+        """
+            % self.enterprise_slug
+        )
+
+        # Send POST request
+        logger.info(
+            f"Fetching all organizations for enterprise: {self.enterprise_slug}"
+        )
+        response = requests.post(self.url, json={"query": query}, headers=self.headers)
+
+        # Check response status code
+        if response.status_code == 200:
+            data = response.json()
+            # print(data)
+            if "errors" in data:
+                print(f'query failed, error message: {data["errors"][0]["message"]}')
+                return {}
+            all_orgs = (
+                data["data"]
+                .get("enterprise", {})
+                .get("organizations", {})
+                .get("nodes", [])
+            )
+
+            dict_save_to_json_file(
+                all_orgs,
+                f"{self.enterprise_slug}_all_organizations",
+                save_to_json=save_to_json,
+                artifact="organizations",
+            )
+            logger.info(f"Fetched {len(all_orgs)} organizations")
+            return all_orgs
+        else:
+            print(f"request failed, error code: {response.status_code}")
+            logger.error(f"Request failed with status code: {response.status_code}")
+            return {}
+
+
+class GitHubOrganizationManager:
+
+    def __init__(self, organization_slug, save_to_json=True, is_standalone=False):
+        self.slug_type = "Standalone" if is_standalone else "Organization"
+        self.api_type = "enterprises" if is_standalone else "orgs"
+        self.organization_slug = organization_slug
+        self.teams = self._fetch_all_teams(save_to_json=save_to_json)
+        self.utc_offset = get_utc_offset()
+        logger.info(
+            f"Initialized GitHubOrganizationManager for {self.slug_type}: {organization_slug}"
+        )
+
+    def get_copilot_usages(
+        self,
+        team_slug="all",
+        save_to_json=True,
+        position_in_tree="leaf_team",
+        usage_or_metrics="metrics",
+    ):
+        urls = {
+            self.organization_slug,
+            (
+                position_in_tree,
+                f"https://api.github.com/{self.api_type}/{self.organization_slug}/copilot/{usage_or_metrics}",
+            ),
+        }
+        if team_slug:
+            if team_slug != "all":
+                urls = {
+                    team_slug: (
+                        position_in_tree,
+                        f"https://api.github.com/{self.api_type}/{self.organization_slug}/team/{team_slug}/copilot/{usage_or_metrics}",
+                    )
+                }
+            else:
+                if self.teams:
+                    logger.info(
+                        f"Fetching Copilot usages for all teams, team count: {len(self.teams)}"
+                    )
+                    urls = {
+                        team["slug"]: (
+                            team["position_in_tree"],
+                            f"https://api.github.com/{self.api_type}/{self.organization_slug}/team/{team['slug']}/copilot/{usage_or_metrics}",
+                        )
+                        for team in self.teams
+                    }
+
+                    # add root team in case teams are too small
+                    urls.update(
+                        {
+                            "no-team": (
+                                "root_team",
+                                f"https://api.github.com/{self.api_type}/{self.organization_slug}/copilot/{usage_or_metrics}",
+                            )
+                        }
+                    )
+                else:
+                    logger.info(
+                        f"No teams found for {self.slug_type}: {self.organization_slug}, fetching {self.slug_type} usage. mock team slug: no-team. strongly recommend to create teams for the {self.slug_type} to get more accurate data."
+                    )
+                    urls = {
+                        "no-team": (
+                            "root_team",
+                            f"https://api.github.com/{self.api_type}/{self.organization_slug}/copilot/{usage_or_metrics}",
+                        )
+                    }
+
+        datas = {}
+        logger.info(
+            f"Fetching Copilot usages for {self.slug_type}: {self.organization_slug}, team: {team_slug}"
+        )
+        for _team_slug, position_in_tree_and_url in urls.items():
+            position_in_tree, url = position_in_tree_and_url
+            data = github_api_request_handler(url, error_return_value={})
+            dict_save_to_json_file(
+                data,
+                f"{self.organization_slug}_{_team_slug}_copilot_metrics",
+                save_to_json=save_to_json,
+                artifact="copilot_metrics",
+            )
+            data = convert_metrics_to_usage(data)
+            dict_save_to_json_file(
+                data,
+                f"{self.organization_slug}_{_team_slug}_copilot_usage",
+                save_to_json=save_to_json,
+                artifact="copilot_usage",
+            )
+            datas[_team_slug] = {
+                "position_in_tree": position_in_tree,
+                "copilot_usage_data": data,
+            }
+            logger.info(f"Fetched Copilot usage for team: {_team_slug}")
+
+        if team_slug == "all":
+            dict_save_to_json_file(
+                datas,
+                f"{self.organization_slug}_all_teams_copilot_usage",
+                save_to_json=save_to_json,
+                artifact="copilot_usage",
+            )
+
+        return datas
+
+    def get_seat_info_settings_standalone(self, save_to_json=True):
+        # only for Standalone
+        # todo: no API for Standalone, need to caculate the data from other APIs
+        url = f"https://api.github.com/{self.api_type}/{self.organization_slug}/copilot/billing/seats"
+        data_seats = github_api_request_handler(url, error_return_value={})
+        if not data_seats:
+            return data_seats
+
+        data = {
+            "seat_management_setting": "assign_selected",
+            "public_code_suggestions": "allow",
+            "ide_chat": "enabled",
+            "cli": "enabled",
+            "plan_type": "business",
+            "seat_total": data_seats.get("total_seats", 0),
+            "seat_added_this_cycle": 0,  # caculated
+            "seat_pending_invitation": 0,  # always 0
+            "seat_pending_cancellation": 0,  # caculated
+            "seat_active_this_cycle": 0,  # caculated
+            "seat_inactive_this_cycle": 0,
+        }
+
+        for data_seat in data_seats.get("seats", []):
+            # format: 2024-07-03T03:02:57+08:00
+            seat_created_at = data_seat.get("created_at")
+            if seat_created_at:
+                created_date = datetime.strptime(seat_created_at, "%Y-%m-%dT%H:%M:%S%z")
+                start_of_yesterday = datetime.now(created_date.tzinfo).replace(
+                    hour=0, minute=0, second=0, microsecond=0
+                ) - timedelta(days=1)
+                if created_date >= start_of_yesterday:
+                    data["seat_added_this_cycle"] += 1
+
+            seat_pending_cancellation_date = data_seat.get("pending_cancellation_date")
+            if seat_pending_cancellation_date:
+                data["seat_pending_cancellation"] += 1
+
+            seat_last_activity_at = data_seat.get("last_activity_at")
+            if seat_last_activity_at:
+                last_activity_date = datetime.strptime(
+                    seat_last_activity_at, "%Y-%m-%dT%H:%M:%S%z"
+                )
+                start_of_yesterday = datetime.now(last_activity_date.tzinfo).replace(
+                    hour=0, minute=0, second=0, microsecond=0
+                ) - timedelta(days=1)
+                if last_activity_date >= start_of_yesterday:
+                    data["seat_active_this_cycle"] += 1
+
+        data["seat_inactive_this_cycle"] = (
+            data["seat_total"] - data["seat_active_this_cycle"]
+        )
+
+        # Inject organization_slug and today's date in the format 2024-12-15, and a hash value based on these two values
+        data["organization_slug"] = self.organization_slug
+        data["day"] = current_time()[:10]
+        data["unique_hash"] = key_scheme(Indexes.index_seat_info).id(data)
+
+        dict_save_to_json_file(
+            data,
+            f"{self.organization_slug}_seat_info_settings",
+            save_to_json=save_to_json,
+            artifact="seat_info",
+        )
+        logger.info(
+            f"Fetching seat info settings for {self.slug_type}: {self.organization_slug}"
+        )
+        return data
+
+    def get_seat_info_settings(self, save_to_json=True):
+        # only for organization
+        url = f"https://api.github.com/{self.api_type}/{self.organization_slug}/copilot/billing"
+        data = github_api_request_handler(url, error_return_value={})
+        if not data:
+            return data
+        # sample
+        # {
+        #     "seat_breakdown": {
+        #         "total": 36,
+        #         "added_this_cycle": 2,
+        #         "pending_invitation": 0,
+        #         "pending_cancellation": 36,
+        #         "active_this_cycle": 30,
+        #         "inactive_this_cycle": 6
+        #     },
+        #     "seat_management_setting": "assign_selected",
+        #     "public_code_suggestions": "allow",
+        #     "ide_chat": "enabled",
+        #     "cli": "enabled",
+        #     "plan_type": "business"
+        # }
+        # Needs to be converted to the following format
+        # {
+        #     "seat_management_setting": "assign_selected",
+        #     "public_code_suggestions": "allow",
+        #     "ide_chat": "enabled",
+        #     "cli": "enabled",
+        #     "plan_type": "business",
+        #     "seat_total": 36,
+        #     "seat_added_this_cycle": 2,
+        #     "seat_pending_invitation": 0,
+        #     "seat_pending_cancellation": 36,
+        #     "seat_active_this_cycle": 30,
+        #     "seat_inactive_this_cycle": 6,
+        #     "organization_slug": "CopilotNext",
+        #     "day": "2024-12-15"
+        # }
+
+        seat_breakdown = data.get("seat_breakdown", {})
+        for k, v in seat_breakdown.items():
+            data[f"seat_{k}"] = v
+        data.pop("seat_breakdown", None)
+
+        # Inject organization_slug and today's date in the format 2024-12-15, and a hash value based on these two values
+        data["organization_slug"] = self.organization_slug
+        data["day"] = current_time()[:10]
+        data["unique_hash"] = key_scheme(Indexes.index_seat_info).id(data)
+
+        dict_save_to_json_file(
+            data,
+            f"{self.organization_slug}_seat_info_settings",
+            save_to_json=save_to_json,
+            artifact="seat_info",
+        )
+        logger.info(
+            f"Fetching seat info settings for {self.slug_type}: {self.organization_slug}"
+        )
+        return data
+
+    def get_seat_assignments(self, save_to_json=True):
+        url = f"https://api.github.com/{self.api_type}/{self.organization_slug}/copilot/billing/seats"
+        datas = []
+        seat_key = key_scheme(Indexes.index_seat_assignments)
+        page = 1
+        per_page = 50
+        while True:
+            paginated_url = f"{url}?page={page}&per_page={per_page}"
+            data = github_api_request_handler(paginated_url, error_return_value={})
+            seats = data.get("seats", [])
+            logger.info(f"Current page seats count: {len(seats)}")
+            if not seats:
+                break
+            for seat in seats:
+                if not seat.get("assignee"):
+                    continue
+                # assignee sub dict
+                seat["assignee_login"] = seat.get("assignee", {}).get("login")
+                # if organization_slug is CopilotNext, then assignee_login
+                if self.organization_slug == "CopilotNext":
+                    seat["assignee_login"] = "".join(
+                        [chr(ord(c) + 1) for c in seat["assignee_login"]]
+                    )
+
+                seat["assignee_html_url"] = seat.get("assignee", {}).get("html_url")
+                seat.pop("assignee", None)
+
+                # assigning_team sub dict
+                seat["assignee_team_slug"] = seat.get("assigning_team", {}).get(
+                    "slug", "no-team"
+                )
+                seat["assignee_team_html_url"] = seat.get("assigning_team", {}).get(
+                    "html_url"
+                )
+                seat.pop("assigning_team", None)
+
+                seat["organization_slug"] = self.organization_slug
+                # seat['day'] = current_time()[:10] # 2025-04-02T08:00:00+08:00 seat['updated_at'][:10]
+                seat["day"] = datetime.now(
+                    datetime.strptime(seat["updated_at"], "%Y-%m-%dT%H:%M:%S%z").tzinfo
+                ).strftime("%Y-%m-%d %H:%M:%S.%f")[:10]
+                seat["unique_hash"] = seat_key.id(seat)
+
+                last_activity_at = seat.get(
+                    "last_activity_at"
+                )  # 2025-04-02T00:22:35+08:00
+                if last_activity_at:
+                    last_activity_date = datetime.strptime(
+                        last_activity_at, "%Y-%m-%dT%H:%M:%S%z"
+                    )
+                    days_since_last_activity = (
+                        datetime.now(last_activity_date.tzinfo) - last_activity_date
+                    ).days
+                    # Create updated_at_date with the same timezone as last_activity_date
+                    updated_at_date = datetime.now(last_activity_date.tzinfo)
+                    is_active_today = (
+                        1
+                        if (last_activity_date.date() == updated_at_date.date())
+                        else 0
+                    )
+                    seat["is_active_today"] = is_active_today
+                else:
+                    days_since_last_activity = -1
+                    seat["is_active_today"] = 0
+                seat["days_since_last_activity"] = days_since_last_activity
+                datas.append(seat)
+            page += 1
+
+        dict_save_to_json_file(
+            datas,
+            f"{self.organization_slug}_seat_assignments",
+            save_to_json=save_to_json,
+            artifact="seat_assignments",
+        )
+        logger.info(
+            f"Fetching seat assignments for {self.slug_type}: {self.organization_slug}"
+        )
+        return datas
+
+    def _fetch_all_teams(self, save_to_json=True):
+        # Teams under the same org are essentially at the same level because the URL does not reflect the nested relationship, so team names cannot be duplicated
+        # Listed once per run (see run_cache) and copied, since the tree is built in place;
+        # the snapshot is still kept every run
+        teams = copy.deepcopy(cached_listing(("teams", self.api_type, self.organization_slug), self._list_teams))
+
+        teams = self._add_fullpath_slug(teams)
+        teams = assign_position_in_tree(teams)
+        dict_save_to_json_file(
+            teams,
+            f"{self.organization_slug}_all_teams",
+            save_to_json=save_to_json,
+            artifact="teams",
+        )
+        logger.info(
+            f"Fetching all teams for {self.slug_type}: {self.organization_slug}"
+        )
+
+        return teams
+
+    def _list_teams(self):
+        url = f"https://api.github.com/{self.api_type}/{self.organization_slug}/teams"
+        teams = []
+        page = 1
+        per_page = 50
+        while True:
+            paginated_url = f"{url}?page={page}&per_page={per_page}"
+            page_teams = github_api_request_handler(
+                paginated_url, error_return_value=[]
+            )
+            logger.info(f"Current page teams count: {len(page_teams)}")
+            # if credential is expired, the return value is:
+            # {'message': 'Bad credentials', 'documentation_url': 'https://docs.github.com/rest', 'status': '401'}
+            if isinstance(page_teams, dict) and page_teams.get("status") == "401":
+                logger.error(
+                    f"Bad credentials for {self.slug_type}: {self.organization_slug}"
+                )
+                return []
+            if not page_teams:
+                break
+            teams.extend(page_teams)
+            page += 1
+        return teams
+
+    def get_copilot_user_metrics(self, save_to_json=True):
+        """
+        Fetch Copilot user metrics for the last 28 days from the Enterprise API
+        Uses the /copilot/metrics/reports/users-28-day/latest endpoint
+        The API returns download links which contain the actual user metrics JSON data
+        """
+        # If a local metrics file is provided (for troubleshooting/demo), use it directly
+        local_path = os.getenv("LOCAL_USER_METRICS_FILE")
+        if local_path and os.path.exists(local_path):
+            logger.info(f"Using LOCAL_USER_METRICS_FILE instead of download links: {local_path}")
+            records = []
+            try:
+                with open(local_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            rec = json.loads(line)
+                        except json.JSONDecodeError as e:
+                            logger.error(f"Failed to parse line as JSON, skipping. Error: {e}")
+                            continue
+
+                        rec = enrich_user_metrics(
+                            rec,
+                            self.organization_slug,
+                            self.slug_type,
+                            self.utc_offset,
+                            current_time(),
+                            top_values=False,
+                        )
+
+                        records.append(rec)
+                logger.info(
+                    f"Loaded {len(records)} user metrics records from LOCAL_USER_METRICS_FILE"
+                )
+            except Exception as e:
+                logger.error(
+                    f"Error reading LOCAL_USER_METRICS_FILE {local_path}: {e}"
+                )
+                records = []
+
+            dict_save_to_json_file(
+                records,
+                f"{self.organization_slug}_copilot_user_metrics_local",
+                save_to_json=save_to_json,
+                artifact="user_metrics",
+            )
+            return records
+
+        url = f"https://api.github.com/{self.api_type}/{self.organization_slug}/copilot/metrics/reports/users-28-day/latest"
+        
+        logger.info(f"Fetching user metrics download links from: {url}")
+        api_response = github_api_request_handler(url, error_return_value={})
+        
+        if not api_response or 'download_links' not in api_response:
+            logger.warning("No download links received from user metrics API")
+            return []
+        
+        download_links = api_response.get('download_links', [])
+        logger.info(f"Found {len(download_links)} download links for user metrics")
+        
+        processed_data = []
+        current_time_str = current_time()
+        
+        # Process each download link to get the actual user metrics data
+        for i, download_link in enumerate(download_links, 1):
+            try:
+                logger.info(f"Downloading user metrics data from link {i}/{len(download_links)}")
+                
+                # Download JSON data from the link with better error handling
+                try:
+                    logger.info(f"Requesting download link: {download_link}")
+                    # Do NOT send Authorization header to Azure Blob Storage
+                    headers = {
+                        "Accept": "application/json"
+                    }
+                    response = requests.get(download_link, headers=headers)
+                    
+                    logger.info(f"Download link {i} response status: {response.status_code}")
+                    logger.info(f"Download link {i} response headers: {dict(response.headers)}")
+                    logger.info(f"Download link {i} response content length: {len(response.content)}")
+                    
+                    if response.status_code != 200:
+                        logger.error(f"Download link {i} failed with status {response.status_code}: {response.text}")
+                        continue
+                    
+                    if not response.content:
+                        logger.warning(f"Download link {i} returned empty content")
+                        continue
+                    
+                    # Try to parse as JSON (handle NDJSON line-by-line)
+                    try:
+                        user_metrics_response = response.json()
+                    except json.JSONDecodeError as json_error:
+                        # Likely NDJSON (newline-delimited JSON), parse line-by-line
+                        logger.info(f"Download link {i} appears to be NDJSON, parsing line-by-line")
+                        user_metrics_response = []
+                        for line in response.text.splitlines():
+                            line = line.strip()
+                            if not line:
+                                continue
+                            try:
+                                user_metrics_response.append(json.loads(line))
+                            except json.JSONDecodeError as line_error:
+                                logger.error(f"Failed to parse NDJSON line: {line_error}")
+                                continue
+                        if not user_metrics_response:
+                            logger.error(f"Download link {i} returned non-parseable content. Original error: {json_error}")
+                            logger.error(f"Response content preview (first 500 chars): {response.text[:500]}")
+                            continue
+                    
+                except requests.exceptions.RequestException as req_error:
+                    logger.error(f"Request error for download link {i}: {req_error}")
+                    continue
+                
+                if not user_metrics_response:
+                    logger.warning(f"No data received from download link {i}")
+                    continue
+                
+                logger.info(f"Download link {i} response type: {type(user_metrics_response)}")
+                
+                # Handle different response types and format JSON properly
+                if isinstance(user_metrics_response, list):
+                    # If it's already an array, use it directly
+                    user_metrics_data = user_metrics_response
+                    logger.info(f"Download link {i} returned array with {len(user_metrics_data)} items")
+                elif isinstance(user_metrics_response, dict):
+                    # If it's a dict, wrap it in an array
+                    user_metrics_data = [user_metrics_response]
+                    logger.info(f"Download link {i} returned single object, wrapped in array")
+                else:
+                    # If it's neither dict nor list, try to format it
+                    logger.warning(f"Download link {i} returned unexpected type: {type(user_metrics_response)}")
+                    try:
+                        # Try to convert to string and parse again
+                        response_str = str(user_metrics_response)
+                        logger.info(f"Attempting to format response as JSON: {response_str[:200]}...")
+                        
+                        # If it looks like it might be JSON data, try to format it
+                        if response_str.strip().startswith('{') or response_str.strip().startswith('['):
+                            formatted_data = json.loads(response_str)
+                            if isinstance(formatted_data, list):
+                                user_metrics_data = formatted_data
+                            elif isinstance(formatted_data, dict):
+                                user_metrics_data = [formatted_data]
+                            else:
+                                logger.error(f"Formatted data is neither dict nor list: {type(formatted_data)}")
+                                continue
+                        else:
+                            logger.error(f"Response does not appear to be JSON format")
+                            continue
+                    except Exception as format_error:
+                        logger.error(f"Failed to format response from download link {i}: {format_error}")
+                        continue
+                
+                # Process each user metrics record
+                for user_data in user_metrics_data:
+                    if isinstance(user_data, dict):
+                        # Add organizational context, top values and the unique hash
+                        enriched_user_data = enrich_user_metrics(
+                            user_data,
+                            self.organization_slug,
+                            self.slug_type,
+                            self.utc_offset,
+                            current_time_str,
+                            download_link_index=i,
+                        )
+                        
+                        processed_data.append(enriched_user_data)
+                
+                logger.info(f"Processed {len(user_metrics_data)} user records from download link {i}")
+                
+            except Exception as e:
+                logger.error(f"Error processing download link {i}: {str(e)}")
+                continue
+        
+        # Save to JSON file for debugging/inspection
+        dict_save_to_json_file(
+            processed_data,
+            f"{self.organization_slug}_copilot_user_metrics",
+            save_to_json=save_to_json,
+            artifact="user_metrics",
+        )
+        
+        logger.info(f"Processed {len(processed_data)} total user metrics records for {self.slug_type}: {self.organization_slug}")
+        return processed_data
+
+    def _add_fullpath_slug(self, teams):
+        id_to_team = {team["id"]: team for team in teams}
+
+        for team in teams:
+            slugs = []
+            current_team = team
+            while current_team:
+                slugs.append(current_team["slug"])
+                parent = current_team.get("parent")
+                if parent and "id" in parent:
+                    current_team = id_to_team.get(parent["id"])
+                else:
+                    current_team = None
+            team["fullpath_slug"] = "/".join(reversed(slugs))
+
+        return teams
+
+
+class ElasticsearchManager:
+
+    def __init__(self, primary_key=Paras.primary_key):
+        self.primary_key = primary_key
+        # One client (and connection pool) per process, shared with the other stages
+        self.es = get_es_client()
+
+        self.check_and_create_indexes()
+
+    # Check if all indexes in the indexes are present, and if they don't, they are created based on the files in the mapping folder
+    # The check only hits Elasticsearch the first time per process
+    def check_and_create_indexes(self):
+        index_names = [
+            Indexes.__dict__[index_name]
+            for index_name in Indexes.__dict__
+            if index_name.startswith("index_")
+        ]
+        ensure_indexes(
+            [name for name in index_names if name not in Indexes.partitioned_indexes],
+            es=self.es,
+        )
+        for alias in Indexes.partitioned_indexes:
+            ensure_partitioned_index(alias, es=self.es)
+
+    def bulk_write_to_es(self, index_docs):
+        """
+        Upsert (index name, document) pairs with the adaptive bulk writer.
+
+        Each document ends up as with write_to_es (merged into an existing
+        document, created otherwise) without a get and a write per document.
+        """
+        last_updated_at = current_time()
+        timestamp = datetime.now().isoformat()
+        with BulkWriter(self.es) as writer:
+            for index_name, data in index_docs:
+                data["last_updated_at"] = last_updated_at
+                data["@timestamp"] = timestamp
+                writer.add(
+                    {
+                        "_op_type": "update",
+                        "_index": write_index_for(index_name, data, es=self.es),
+                        "_id": data.get(self.primary_key),
+                        "_source": {"doc": data, "doc_as_upsert": True},
+                    },
+                    stats_key=index_name,
+                )
+        writer.log_stats()
+        return writer.totals()
+
+    def write_to_es(self, index_name, data, update_condition=None):
+        last_updated_at = current_time()
+        data["last_updated_at"] = last_updated_at
+        # Add @timestamp for Grafana time-based filtering (ISO 8601 format)
+        data["@timestamp"] = datetime.now().isoformat()
+        doc_id = data.get(self.primary_key)
+        # Partitioned indexes are read through their alias but written to the monthly partition
+        index_name = write_index_for(index_name, data, es=self.es)
+        try:
+            # Get existing document
+            existing_doc = self.es.get(index=index_name, id=doc_id)
+
+            # Check update condition if provided
+            if update_condition:
+                should_preserve_fields = True
+                for field, value in update_condition.items():
+                    if (
+                        field not in existing_doc["_source"]
+                        or existing_doc["_source"][field] != value
+                    ):
+                        should_preserve_fields = False
+                        break
+
+                if should_preserve_fields:
+                    # Preserve fields listed in update_condition by copying their values from existing document
+                    for field in update_condition.keys():
+                        if field in existing_doc["_source"]:
+                            data[field] = existing_doc["_source"][field]
+                    logger.debug(
+                        f"[partial update] to [{index_name}]: {doc_id} - preserving fields: {list(update_condition.keys())}",
+                        extra=SAMPLED,
+                    )
+
+            # Always update document, possibly with some preserved fields
+            self.es.update(index=index_name, id=doc_id, doc=data)
+            logger.debug(f"[updated] to [{index_name}]: {doc_id}", extra=SAMPLED)
+            return "updated"
+        except NotFoundError:
+            self.es.index(index=index_name, id=doc_id, document=data)
+            logger.debug(f"[created] to [{index_name}]: {doc_id}", extra=SAMPLED)
+            return "created"
+
+    def write_many_to_es(self, index_name, docs, update_condition=None):
+        """write_to_es every doc and log one summary line for the batch."""
+        counts = {"created": 0, "updated": 0}
+        started = time.monotonic()
+        for data in docs:
+            counts[self.write_to_es(index_name, data, update_condition=update_condition)] += 1
+        logger.info(
+            f"Wrote {counts['created'] + counts['updated']} docs to {index_name} "
+            f"({counts['created']} created, {counts['updated']} updated) in {time.monotonic() - started:.1f}s"
+        )
+        return counts
+
+
+def collect_organization(organization_slug):
+    logger.info(
+        "=========================================================================================================="
+    )
+
+    # organization_slug 2 types:
+    # 1. Organization in a GHEC, like "YOUR_ORG_SLUG"
+    # 2. Standalone Slug, must be starts with "standalone:", like "standalone:YOUR_STANDALONE_SLUG"
+
+    is_standalone = True if organization_slug.startswith("standalone:") else False
+    slug_type = "Standalone" if is_standalone else "Organization"
+    organization_slug = organization_slug.replace("standalone:", "")
+
+    logger.info(f"Starting data processing for {slug_type}: {organization_slug}")
+    github_org_manager = GitHubOrganizationManager(
+        organization_slug, is_standalone=is_standalone
+    )
+    es_manager = ElasticsearchManager()
+
+    # Process seat info and settings
+    logger.info(
+        f"Processing Copilot seat info & settings for {slug_type}: {organization_slug}"
+    )
+    data_seat_info_settings = (
+        github_org_manager.get_seat_info_settings()
+        if not is_standalone
+        else github_org_manager.get_seat_info_settings_standalone()
+    )
+    if not data_seat_info_settings:
+        logger.warning(
+            f"No Copilot seat info & settings found for {slug_type}: {organization_slug}"
+        )
+    else:
+        es_manager.write_to_es(Indexes.index_seat_info, data_seat_info_settings)
+        logger.info(f"Data processing completed for {slug_type}: {organization_slug}")
+
+    # Process seat assignments
+    logger.info(
+        f"Processing Copilot seat assignments for {slug_type}: {organization_slug}"
+    )
+    data_seat_assignments = github_org_manager.get_seat_assignments()
+    if not data_seat_assignments:
+        logger.warning(
+            f"No Copilot seat assignments found for {slug_type}: {organization_slug}"
+        )
+    else:
+        es_manager.write_many_to_es(
+            Indexes.index_seat_assignments,
+            data_seat_assignments,
+            update_condition={"is_active_today": 1},
+        )
+        logger.info(f"Data processing completed for {slug_type}: {organization_slug}")
+
+    # Process user metrics data
+    logger.info(
+        f"Processing Copilot user metrics for {slug_type}: {organization_slug}"
+    )
+    try:
+        logger.info("Calling get_copilot_user_metrics()...")
+        user_metrics_data = github_org_manager.get_copilot_user_metrics()
+        logger.info(f"get_copilot_user_metrics() returned: {type(user_metrics_data)} with {len(user_metrics_data) if user_metrics_data else 0} items")
+        
+        if not user_metrics_data:
+            logger.warning(
+                f"No Copilot user metrics found for {slug_type}: {organization_slug}"
+            )
+        else:
+            logger.info(f"Writing {len(user_metrics_data)} user metrics to Elasticsearch...")
+            es_manager.write_many_to_es(Indexes.index_user_metrics, user_metrics_data)
+            # One flat doc per totals_by_* entry for breakdowns without nested aggregations
+            fact_count = write_facts(user_metrics_data, es=es_manager.es)
+            logger.info(f"Wrote {fact_count} user metrics facts to Elasticsearch")
+            # Per-user aggregates are kept so rescore_adoption.py can rebuild
+            # the leaderboards with other weights without re-fetching
+            user_teams = build_team_index(data_seat_assignments)
+            adoption_entries = []
+            adoption_aggregates = []
+            # The whole-report leaderboard (no window_days) keeps its legacy shape
+            # and ids, so panels that predate the windows stay current
+            all_signals = [aggregate_user_signals(user_metrics_data)] + windowed_user_signals(user_metrics_data)
+            for signals in all_signals:
+                adoption_entries.extend(
+                    build_adoption_entries(
+                        signals, organization_slug, slug_type, user_teams=user_teams
+                    )
+                )
+                adoption_aggregates.extend(
+                    aggregate_documents(signals, organization_slug, slug_type, user_teams)
+                )
+            if adoption_aggregates:
+                logger.info(
+                    f"Writing {len(adoption_aggregates)} adoption aggregates to Elasticsearch..."
+                )
+                write_aggregates(adoption_aggregates, es=es_manager.es)
+            if adoption_entries:
+                logger.info(
+                    f"Writing {len(adoption_entries)} adoption leaderboard entries to Elasticsearch..."
+                )
+                es_manager.write_many_to_es(Indexes.index_user_adoption, adoption_entries)
+            logger.info(f"Successfully processed {len(user_metrics_data)} user metrics records for {slug_type}: {organization_slug}")
+    except Exception as e:
+        logger.error(f"Failed to process user metrics for {slug_type} {organization_slug}: {e}")
+        logger.error(f"Full traceback: {traceback.format_exc()}")
+
+    # Create user summaries with aggregated top_model/language/feature
+    try:
+        logger.info("Creating user summaries with aggregated top values...")
+        create_user_summaries(es=es_manager.es)
+        logger.info("User summaries created successfully")
+    except Exception as e:
+        logger.error(f"Failed to create user summaries: {e}")
+        logger.error(f"Full traceback: {traceback.format_exc()}")
+
+    # Create top-by-day docs for drill-down time series panels
+    try:
+        logger.info("Creating user top-by-day documents for drill-down...")
+        create_user_top_by_day(
+            source_index=Indexes.index_user_metrics,
+            dest_index=os.getenv("INDEX_USER_METRICS_TOP_BY_DAY", "copilot_user_metrics_top_by_day"),
+            es=es_manager.es,
+        )
+        logger.info("User top-by-day documents created successfully")
+    except Exception as e:
+        logger.error(f"Failed to create user top-by-day documents: {e}")
+        logger.error(f"Full traceback: {traceback.format_exc()}")
+
+    # Roll up the user metrics per org/team/day for the dashboards
+    try:
+        logger.info("Updating the user metrics rollup...")
+        update_metrics_rollup(es=es_manager.es)
+        logger.info("User metrics rollup updated successfully")
+    except Exception as e:
+        logger.error(f"Failed to update the user metrics rollup: {e}")
+        logger.error(f"Full traceback: {traceback.format_exc()}")
+
+    # Process developer activity metrics (for comparison with Copilot metrics)
+    enable_developer_activity = os.getenv("ENABLE_DEVELOPER_ACTIVITY", "true").lower() == "true"
+    if enable_developer_activity:
+        logger.info(
+            f"Processing developer activity metrics for {slug_type}: {organization_slug}"
+        )
+        try:
+            dev_activity_fetcher = DeveloperActivityFetcher(
+                Paras.github_pat, organization_slug, is_standalone
+            )
+            days_back = int(os.getenv("DEVELOPER_ACTIVITY_DAYS_BACK", "28"))
+            if DEVELOPER_ACTIVITY_MODE == "daily":
+                # Only the days after the last one stored for each user
+                developer_activity_data = dev_activity_fetcher.fetch_daily_activity_for_members(
+                    days_back=days_back,
+                    last_days=last_stored_days(es_manager.es, organization_slug, Indexes.index_developer_activity),
+                )
+            else:
+                # Copilot seat holders are searched first
+                developer_activity_data = dev_activity_fetcher.fetch_developer_activity_for_members(
+                    days_back=days_back,
+                    priority_logins={
+                        seat.get("assignee_login") for seat in data_seat_assignments or [] if seat.get("assignee_login")
+                    },
+                )
+            
+            if not developer_activity_data:
+                logger.warning(
+                    f"No developer activity data found for {slug_type}: {organization_slug}"
+                )
+            else:
+                logger.info(f"Writing {len(developer_activity_data)} developer activity records to Elasticsearch...")
+                es_manager.write_many_to_es(Indexes.index_developer_activity, developer_activity_data)
+                logger.info(f"Successfully processed {len(developer_activity_data)} developer activity records")
+        except Exception as e:
+            logger.error(f"Failed to process developer activity for {slug_type} {organization_slug}: {e}")
+            logger.error(f"Full traceback: {traceback.format_exc()}")
+    else:
+        logger.info("Developer activity metrics collection is disabled (set ENABLE_DEVELOPER_ACTIVITY=true to enable)")
+
+    # Process usage data
+    copilot_usage_datas = github_org_manager.get_copilot_usages(team_slug="all")
+    logger.info(f"Processing Copilot usage data for {slug_type}: {organization_slug}")
+    for team_slug, data_with_position in copilot_usage_datas.items():
+        logger.info(f"Processing Copilot usage data for team: {team_slug}")
+
+        # Expand data
+        data = data_with_position.get("copilot_usage_data")
+        position_in_tree = data_with_position.get("position_in_tree")
+
+        # Check if there is data
+        if not data:
+            logger.warning(f"No Copilot usage data found for team: {team_slug}")
+            continue
+
+        data_splitter = DataSplitter(
+            data,
+            additional_properties={
+                "organization_slug": organization_slug,
+                "team_slug": team_slug,
+                "position_in_tree": position_in_tree,
+            },
+        )
+
+        # Stream total, breakdown and breakdown_chat docs straight to ES; the
+        # raw usage data was already saved by get_copilot_usages
+        totals = es_manager.bulk_write_to_es(data_splitter.iter_docs())
+        logger.info(
+            f"Wrote {totals['indexed']} usage documents for team: {team_slug} ({totals['failed']} failed)"
+        )
+
+        logger.info(f"Data processing completed for team: {team_slug}")
@@ -0,0 +1,74 @@
+"""
+Collector configuration read from the environment.
+
+Paras holds the runtime settings and Indexes the Elasticsearch index names.
+Importing this module has no side effects besides reading the environment, so
+tools that replay or rebuild data (rebuild_from_snapshots.py) can share the
+collector's settings without starting it.
+"""
+
+import os
+
+from log_utils import current_time
+
+
+class Paras:
+
+    @staticmethod
+    def date_str():
+        return current_time()[:10]
+
+    # Demo Mode
+    enable_demo_mode = os.getenv("ENABLE_DEMO_MODE", "false").lower() == "true"
+
+    # GitHub
+    github_pat = os.getenv("GITHUB_PAT")
+    organization_slugs = os.getenv("ORGANIZATION_SLUGS")
+
+    # ElasticSearch
+    primary_key = os.getenv("PRIMARY_KEY", "unique_hash")
+    elasticsearch_url = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
+    elasticsearch_user = os.getenv("ELASTICSEARCH_USER", None)
+    elasticsearch_pass = os.getenv("ELASTICSEARCH_PASS", None)
+
+    # Log path
+    log_path = os.getenv("LOG_PATH", "logs")
+
+    @staticmethod
+    def get_log_path():
+        return os.path.join(Paras.log_path, Paras.date_str())
+
+    # Execution interval HOURS
+    execution_interval = int(os.getenv("EXECUTION_INTERVAL", 6))
+
+
+class Indexes:
+    index_seat_info = os.getenv("INDEX_SEAT_INFO", "copilot_seat_info_settings")
+    index_seat_assignments = os.getenv(
+        "INDEX_SEAT_ASSIGNMENTS", "copilot_seat_assignments"
+    )
+    index_name_total = os.getenv("INDEX_NAME_TOTAL", "copilot_usage_total")
+    index_name_breakdown = os.getenv("INDEX_NAME_BREAKDOWN", "copilot_usage_breakdown")
+    index_name_breakdown_chat = os.getenv(
+        "INDEX_NAME_BREAKDOWN_CHAT", "copilot_usage_breakdown_chat"
+    )
+    index_user_metrics = os.getenv("INDEX_USER_METRICS", "copilot_user_metrics")
+    index_user_adoption = os.getenv("INDEX_USER_ADOPTION", "copilot_user_adoption")
+    index_user_adoption_aggregates = os.getenv(
+        "INDEX_USER_ADOPTION_AGGREGATES", "copilot_user_adoption_aggregates"
+    )
+    index_developer_activity = os.getenv("INDEX_DEVELOPER_ACTIVITY", "developer_activity")
+    index_user_metrics_rollup = os.getenv(
+        "INDEX_USER_METRICS_ROLLUP", "copilot_user_metrics_rollup"
+    )
+    index_user_metrics_facts = os.getenv(
+        "INDEX_USER_METRICS_FACTS", "copilot_user_metrics_facts"
+    )
+
+    # Aliases over monthly partitions managed by index templates and ILM, see index_lifecycle.py
+    partitioned_indexes = (
+        index_user_metrics,
+        index_name_breakdown,
+        index_developer_activity,
+        index_user_metrics_facts,
+    )
@@ -1,8 +1,9 @@
 curl -X PUT "$ELASTICSEARCH_URL/copilot_usage_total" -H 'Content-Type: application/json' -d @mapping/copilot_usage_total_mapping.json
-curl -X PUT "$ELASTICSEARCH_URL/copilot_usage_breakdown" -H 'Content-Type: application/json' -d @mapping/copilot_usage_breakdown_mapping.json
 curl -X PUT "$ELASTICSEARCH_URL/copilot_usage_breakdown_chat" -H 'Content-Type: application/json' -d @mapping/copilot_usage_breakdown_chat_mapping.json
 curl -X PUT "$ELASTICSEARCH_URL/copilot_seat_info_settings" -H 'Content-Type: application/json' -d @mapping/copilot_seat_info_settings_mapping.json
 curl -X PUT "$ELASTICSEARCH_URL/copilot_seat_assignments" -H 'Content-Type: application/json' -d @mapping/copilot_seat_assignments_mapping.json
 curl -X PUT "$ELASTICSEARCH_URL/copilot_user_adoption" -H 'Content-Type: application/json' -d @mapping/copilot_user_adoption_mapping.json
-curl -X PUT "$ELASTICSEARCH_URL/copilot_user_metrics" -H 'Content-Type: application/json' -d @mapping/copilot_user_metrics_mapping.json
-curl -X PUT "$ELASTICSEARCH_URL/developer_activity" -H 'Content-Type: application/json' -d @mapping/developer_activity_mapping.json
\ No newline at end of file
+curl -X PUT "$ELASTICSEARCH_URL/copilot_user_adoption_aggregates" -H 'Content-Type: application/json' -d @mapping/copilot_user_adoption_aggregates_mapping.json
+curl -X PUT "$ELASTICSEARCH_URL/copilot_user_metrics_rollup" -H 'Content-Type: application/json' -d @mapping/copilot_user_metrics_rollup_mapping.json
+# copilot_usage_breakdown, copilot_user_metrics, copilot_user_metrics_facts and developer_activity are monthly partitions behind aliases
+python3 index_lifecycle.py
\ No newline at end of file
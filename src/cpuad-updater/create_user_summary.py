@@ -1,114 +1,133 @@
 """
 Script to create aggregated user summary with overall top_model, top_language, top_feature
+
+The most frequent value of each field per user is computed by Elasticsearch:
+a composite aggregation pages through every user_login and a size-1 terms
+sub-aggregation per field returns its modal value. The work on this side grows
+with the number of users, not with the number of user/day documents.
 """
 import os
-from elasticsearch import Elasticsearch
-from collections import Counter
 import logging
+from datetime import datetime, timezone
+
+from bulk_writer import BulkWriter
+from es_client import get_es_client, ensure_index
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - [%(levelname)s] - %(message)s')
 logger = logging.getLogger(__name__)
 
-def get_es_client():
-    """Initialize Elasticsearch client"""
-    # es_host = os.getenv("ELASTICSEARCH_HOST", "elasticsearch")
-    # es_port = int(os.getenv("ELASTICSEARCH_PORT", "9200"))
-    # es_url = f"http://{es_host}:{es_port}"
-    es_url = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
-    
-    es_user = os.getenv("ELASTICSEARCH_USER")
-    es_password = os.getenv("ELASTICSEARCH_PASS")
-    
-    if es_user and es_password:
-        es = Elasticsearch([es_url], http_auth=(es_user, es_password))
-        logger.info(f"Connecting to Elasticsearch at {es_url} with authentication")
-    else:
-        es = Elasticsearch([es_url])
-        logger.info("Using Elasticsearch without authentication")
-    
-    return es
-
-def create_user_summaries():
-    """Aggregate user metrics and create summary documents"""
-    es = get_es_client()
-    
-    # Get all user metrics
-    query = {
-        "size": 10000,
-        "query": {"match_all": {}}
+SOURCE_INDEX = os.getenv('INDEX_USER_METRICS', 'copilot_user_metrics')
+SUMMARY_INDEX = os.getenv('INDEX_USER_METRICS_SUMMARY', 'copilot_user_metrics_summary')
+# Users per composite aggregation page
+PAGE_SIZE = int(os.getenv('USER_SUMMARY_PAGE_SIZE', '1000'))
+
+# Summary field -> field in the user metrics documents
+SUMMARY_FIELDS = {
+    'top_model': 'top_model',
+    'top_language': 'top_language',
+    'top_feature': 'top_feature',
+    'organization_slug': 'organization_slug',
+}
+
+
+def resolve_aggregatable_field(es, index, field):
+    """
+    Return `field` or `field.keyword`, whichever can be aggregated on.
+
+    Dynamically mapped strings (the v1 mapping does not declare top_*) are
+    text with a keyword sub-field; the v2 mapping declares them as keyword.
+    """
+    caps = es.field_caps(index=index, fields=[field, f'{field}.keyword']).get('fields', {})
+    for candidate in (field, f'{field}.keyword'):
+        if any(cap.get('aggregatable') for cap in caps.get(candidate, {}).values()):
+            return candidate
+    return None
+
+
+def iter_user_buckets(es, index, user_field, fields, page_size=PAGE_SIZE):
+    """Yield one composite bucket per user, with a size-1 terms agg per field."""
+    aggs = {
+        name: {'terms': {'field': field, 'size': 1}}
+        for name, field in fields.items()
     }
-    
-    response = es.search(index="copilot_user_metrics", body=query)
-    
-    # Group by user
-    user_data = {}
-    for hit in response['hits']['hits']:
-        doc = hit['_source']
-        user_login = doc.get('user_login')
-        
-        if user_login not in user_data:
-            user_data[user_login] = {
-                'models': [],
-                'languages': [],
-                'features': [],
-                'organization_slug': doc.get('organization_slug')
-            }
-        
-        if doc.get('top_model'):
-            user_data[user_login]['models'].append(doc['top_model'])
-        if doc.get('top_language'):
-            user_data[user_login]['languages'].append(doc['top_language'])
-        if doc.get('top_feature'):
-            user_data[user_login]['features'].append(doc['top_feature'])
-    
-    # Calculate most frequent values and write to new index
-    summary_index = "copilot_user_metrics_summary"
-    
+    after_key = None
+    while True:
+        composite = {
+            'size': page_size,
+            'sources': [{'user_login': {'terms': {'field': user_field}}}],
+        }
+        if after_key:
+            composite['after'] = after_key
+        response = es.search(
+            index=index,
+            size=0,
+            aggs={'users': {'composite': composite, 'aggs': aggs}},
+        )
+        users = response['aggregations']['users']
+        yield from users['buckets']
+
+        after_key = users.get('after_key')
+        if not after_key or len(users['buckets']) < page_size:
+            return
+
+
+def _top_value(bucket, name, default='unknown'):
+    terms = bucket.get(name, {}).get('buckets', [])
+    return terms[0]['key'] if terms else default
+
+
+def create_user_summaries(es=None):
+    """Aggregate user metrics and create summary documents"""
+    es = es or get_es_client()
+
+    user_field = resolve_aggregatable_field(es, SOURCE_INDEX, 'user_login')
+    if not user_field:
+        logger.warning(f"No aggregatable user_login in {SOURCE_INDEX}, skipping user summaries")
+        return 0
+
+    fields = {}
+    for name, source_field in SUMMARY_FIELDS.items():
+        field = resolve_aggregatable_field(es, SOURCE_INDEX, source_field)
+        if field:
+            fields[name] = field
+        else:
+            logger.info(f"Field {source_field} not present in {SOURCE_INDEX}, using 'unknown'")
+
     # Create index if it doesn't exist
-    if not es.indices.exists(index=summary_index):
-        es.indices.create(index=summary_index, body={
-            "mappings": {
-                "properties": {
-                    "user_login": {"type": "keyword"},
-                    "top_model": {"type": "keyword"},
-                    "top_language": {"type": "keyword"},
-                    "top_feature": {"type": "keyword"},
-                    "organization_slug": {"type": "keyword"},
-                    "@timestamp": {"type": "date"}
-                }
+    ensure_index(SUMMARY_INDEX, body={
+        "mappings": {
+            "properties": {
+                "user_login": {"type": "keyword"},
+                "top_model": {"type": "keyword"},
+                "top_language": {"type": "keyword"},
+                "top_feature": {"type": "keyword"},
+                "organization_slug": {"type": "keyword"},
+                "@timestamp": {"type": "date"}
             }
-        })
-        logger.info(f"Created index: {summary_index}")
-    
-    # Write summary documents
-    for user_login, data in user_data.items():
-        # Get most common values
-        top_model = Counter(data['models']).most_common(1)[0][0] if data['models'] else 'unknown'
-        top_language = Counter(data['languages']).most_common(1)[0][0] if data['languages'] else 'unknown'
-        top_feature = Counter(data['features']).most_common(1)[0][0] if data['features'] else 'unknown'
-        
-        from datetime import datetime
-        doc = {
-            'user_login': user_login,
-            'top_model': top_model,
-            'top_language': top_language,
-            'top_feature': top_feature,
-            'organization_slug': data['organization_slug'],
-            '@timestamp': datetime.utcnow().isoformat()
         }
-        
-        # Use user_login as document ID to enable updates
-        es.index(index=summary_index, id=user_login, body=doc)
-        logger.info(f"Updated summary for user: {user_login}")
-    
-    logger.info(f"Created/updated {len(user_data)} user summary documents")
-    return len(user_data)
+    }, es=es)
+
+    timestamp = datetime.now(timezone.utc).isoformat()
+    with BulkWriter(es) as writer:
+        for bucket in iter_user_buckets(es, SOURCE_INDEX, user_field, fields):
+            user_login = bucket['key']['user_login']
+            doc = {
+                'user_login': user_login,
+                'top_model': _top_value(bucket, 'top_model'),
+                'top_language': _top_value(bucket, 'top_language'),
+                'top_feature': _top_value(bucket, 'top_feature'),
+                'organization_slug': _top_value(bucket, 'organization_slug', default=None),
+                '@timestamp': timestamp,
+            }
+            # Use user_login as document ID to enable updates
+            writer.add({'_index': SUMMARY_INDEX, '_id': user_login, '_source': doc})
+
+    writer.log_stats()
+    count = writer.totals()['indexed']
+    logger.info(f"Created/updated {count} user summary documents")
+    return count
+
 
 if __name__ == "__main__":
     count = create_user_summaries()
     logger.info(f"Total user summaries created: {count}")
-    
-    logger.info(f"Created/updated {len(user_data)} user summaries")
-
-if __name__ == "__main__":
-    create_user_summaries()
@@ -11,16 +11,29 @@ We compute an internal activity score to select the top item:
     score = code_generation_activity_count + user_initiated_interaction_count + code_acceptance_activity_count
 
 But we do NOT persist the score in the destination document (only the labels).
+
+Runs are incremental: the highest source `@timestamp` processed is stored as a
+checkpoint in the `_meta` of the destination index mapping, and the next run
+only reads source docs written since then (through a point-in-time with
+search_after). Pass full_rebuild=True, set TOP_BY_DAY_FULL_REBUILD=true or run
+this script with --full to reprocess everything; full passes use the sliced
+parallel scan from parallel_scan.py.
 """
 
 from __future__ import annotations
 
 import os
+import argparse
 import logging
-from typing import Any, Iterable
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Iterable, Iterator
 
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+
+from bulk_writer import BulkWriter
+from es_client import get_es_client, ensure_index
+from parallel_scan import open_point_in_time, close_point_in_time, sliced_scan
 
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - [%(levelname)s] - %(message)s")
@@ -29,31 +42,16 @@ logger = logging.getLogger(__name__)
 
 DEFAULT_SOURCE_INDEX = os.getenv("INDEX_USER_METRICS", "copilot_user_metrics")
 DEFAULT_DEST_INDEX = os.getenv("INDEX_USER_METRICS_TOP_BY_DAY", "copilot_user_metrics_top_by_day")
+FULL_REBUILD = os.getenv("TOP_BY_DAY_FULL_REBUILD", "false").lower() == "true"
 
-
-def get_es_client() -> Elasticsearch:
-    # es_host = os.getenv("ELASTICSEARCH_HOST", "elasticsearch")
-    # es_port = int(os.getenv("ELASTICSEARCH_PORT", "9200"))
-    # es_url = f"http://{es_host}:{es_port}"
-    es_url = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
-
-    es_user = os.getenv("ELASTICSEARCH_USER")
-    es_password = os.getenv("ELASTICSEARCH_PASS")
-
-    if es_user and es_password:
-        logger.info(f"Connecting to Elasticsearch at {es_url} with authentication")
-        return Elasticsearch([es_url], basic_auth=(es_user, es_password))
-
-    logger.info(f"Connecting to Elasticsearch at {es_url} without authentication")
-    return Elasticsearch([es_url])
+CHECKPOINT_META_KEY = "top_by_day_checkpoint"
+PAGE_SIZE = 500
+PIT_KEEP_ALIVE = "2m"
 
 
 def ensure_dest_index(es: Elasticsearch, index_name: str) -> None:
-    if es.indices.exists(index=index_name):
-        return
-
-    es.indices.create(
-        index=index_name,
+    ensure_index(
+        index_name,
         body={
             "mappings": {
                 "properties": {
@@ -69,8 +67,8 @@ def ensure_dest_index(es: Elasticsearch, index_name: str) -> None:
                 }
             }
         },
+        es=es,
     )
-    logger.info(f"Created index: {index_name}")
 
 
 def _safe_int(value: Any) -> int:
@@ -140,60 +138,149 @@ def build_top_doc(source_doc: dict[str, Any]) -> dict[str, Any] | None:
     }
 
 
-def create_user_top_by_day(source_index: str = DEFAULT_SOURCE_INDEX, dest_index: str = DEFAULT_DEST_INDEX) -> int:
-    es = get_es_client()
-    ensure_dest_index(es, dest_index)
-
-    query = {
-        "sort": [{"day": "asc"}],
-        "query": {"match_all": {}},
-    }
-
-    # Use a scroll to handle larger datasets.
-    page_size = 500
-    resp = es.search(index=source_index, body={**query, "size": page_size}, scroll="2m")
-    scroll_id = resp.get("_scroll_id")
-    hits = resp.get("hits", {}).get("hits", [])
-
-    total_written = 0
-
-    def flush(actions: list[dict[str, Any]]) -> int:
-        if not actions:
-            return 0
-        ok, _ = bulk(es, actions, raise_on_error=False, request_timeout=60)
-        return int(ok)
-
-    actions: list[dict[str, Any]] = []
-
-    while hits:
-        for hit in hits:
-            source_doc = hit.get("_source", {})
-            doc = build_top_doc(source_doc)
-            if doc is None:
-                continue
-            doc_id = f"{doc.get('user_login')}|{doc.get('day')}"
-            actions.append({"_op_type": "index", "_index": dest_index, "_id": doc_id, "_source": doc})
+def top_by_day_action(source_doc: dict[str, Any], dest_index: str) -> dict[str, Any] | None:
+    doc = build_top_doc(source_doc)
+    if doc is None:
+        return None
+    doc_id = f"{doc.get('user_login')}|{doc.get('day')}"
+    return {"_op_type": "index", "_index": dest_index, "_id": doc_id, "_source": doc}
 
-            if len(actions) >= 2000:
-                total_written += flush(actions)
-                actions = []
 
-        resp = es.scroll(scroll_id=scroll_id, scroll="2m")
-        scroll_id = resp.get("_scroll_id")
-        hits = resp.get("hits", {}).get("hits", [])
+def max_source_timestamp(es: Elasticsearch, pit_id: str) -> int | None:
+    resp = es.search(
+        pit={"id": pit_id},
+        size=0,
+        aggs={"max_timestamp": {"max": {"field": "@timestamp"}}},
+    )
+    value = resp["aggregations"]["max_timestamp"].get("value")
+    return int(value) if value is not None else None
+
+
+def read_checkpoint(
+    es: Elasticsearch, dest_index: str, source_index: str, meta_key: str = CHECKPOINT_META_KEY
+) -> int | None:
+    """Return the last processed source @timestamp (epoch millis), if any."""
+    mappings = es.indices.get_mapping(index=dest_index)
+    for index_mapping in mappings.values():
+        checkpoint = index_mapping.get("mappings", {}).get("_meta", {}).get(meta_key)
+        if checkpoint and checkpoint.get("source_index") == source_index:
+            return checkpoint.get("timestamp")
+    return None
+
+
+def write_checkpoint(
+    es: Elasticsearch, dest_index: str, source_index: str, timestamp: int, meta_key: str = CHECKPOINT_META_KEY
+) -> None:
+    es.indices.put_mapping(
+        index=dest_index,
+        meta={
+            meta_key: {
+                "source_index": source_index,
+                "timestamp": timestamp,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }
+        },
+    )
 
-    if actions:
-        total_written += flush(actions)
 
+def iter_source_hits(
+    es: Elasticsearch,
+    source_index: str,
+    since: int,
+    page_size: int = PAGE_SIZE,
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield source docs written at or after `since` in @timestamp order.
+
+    Each hit carries its sort values; hit["sort"][0] is its @timestamp in epoch
+    millis. Re-reading the boundary millisecond is harmless, writes are
+    idempotent.
+    """
+    query = {"range": {"@timestamp": {"gte": since, "format": "epoch_millis"}}}
+    sort = [
+        {"@timestamp": {"order": "asc", "unmapped_type": "date"}},
+        {"_shard_doc": "asc"},
+    ]
+
+    pit_id = es.open_point_in_time(index=source_index, keep_alive=PIT_KEEP_ALIVE)["id"]
     try:
-        if scroll_id:
-            es.clear_scroll(scroll_id=scroll_id)
-    except Exception:
-        pass
+        search_after = None
+        while True:
+            resp = es.search(
+                pit={"id": pit_id, "keep_alive": PIT_KEEP_ALIVE},
+                query=query,
+                sort=sort,
+                size=page_size,
+                search_after=search_after,
+            )
+            pit_id = resp.get("pit_id", pit_id)
+            hits = resp.get("hits", {}).get("hits", [])
+            if not hits:
+                return
+            yield from hits
+            search_after = hits[-1]["sort"]
+    finally:
+        try:
+            es.close_point_in_time(id=pit_id)
+        except Exception:
+            pass
+
+
+def create_user_top_by_day(
+    source_index: str = DEFAULT_SOURCE_INDEX,
+    dest_index: str = DEFAULT_DEST_INDEX,
+    es: Elasticsearch | None = None,
+    full_rebuild: bool = FULL_REBUILD,
+) -> int:
+    es = es or get_es_client()
+    ensure_dest_index(es, dest_index)
 
+    since = None if full_rebuild else read_checkpoint(es, dest_index, source_index)
+    if since is None:
+        logger.info(f"Rebuilding all top-by-day docs in {dest_index} from {source_index}")
+    else:
+        logger.info(f"Updating top-by-day docs in {dest_index} from {source_index} docs written since {since}")
+
+    checkpoint = since
+    with BulkWriter(es) as writer:
+        if since is None:
+            # Full pass: parallel sliced scan of one point-in-time; the checkpoint
+            # is the newest @timestamp in that same snapshot
+            pit_id = open_point_in_time(es, source_index)
+            try:
+                checkpoint = max_source_timestamp(es, pit_id)
+                sliced_scan(
+                    es,
+                    source_index,
+                    partial(top_by_day_action, dest_index=dest_index),
+                    writer,
+                    pit_id=pit_id,
+                )
+            finally:
+                close_point_in_time(es, pit_id)
+        else:
+            for hit in iter_source_hits(es, source_index, since=since):
+                checkpoint = max(checkpoint, hit["sort"][0])
+                action = top_by_day_action(hit.get("_source", {}), dest_index)
+                if action is not None:
+                    writer.add(action)
+
+    writer.log_stats()
+    totals = writer.totals()
+    if totals["failed"]:
+        logger.warning(
+            f"{totals['failed']} top-by-day docs failed, keeping the previous checkpoint so they are retried"
+        )
+    elif checkpoint is not None and checkpoint != since:
+        write_checkpoint(es, dest_index, source_index, checkpoint)
+
+    total_written = totals["indexed"]
     logger.info(f"Created/updated {total_written} top-by-day docs in {dest_index}")
     return total_written
 
 
 if __name__ == "__main__":
-    create_user_top_by_day()
+    parser = argparse.ArgumentParser(description="Create/update the user top-by-day index")
+    parser.add_argument("--full", action="store_true", help="Ignore the checkpoint and reprocess every source doc")
+    args = parser.parse_args()
+    create_user_top_by_day(full_rebuild=args.full or FULL_REBUILD)
@@ -0,0 +1,211 @@
+"""
+Document ids for the collector's Elasticsearch indices.
+
+Every document is written with a deterministic id (stored as `unique_hash`)
+derived from the properties that identify it, so re-running the collector
+updates documents in place instead of duplicating them.
+
+Each index declares its key properties once in KEY_PROPERTIES. key_scheme()
+returns a KeyScheme for it, with a key extractor compiled for those properties
+that ids single documents or whole batches. The hash function is selected with
+DOC_ID_HASH:
+
+- sha256 (default): the ids existing deployments already have,
+- blake2b: 128-bit BLAKE2b from hashlib, faster than SHA-256 on 64-bit CPUs,
+- xxh3: 128-bit XXH3, non-cryptographic and much faster (needs `xxhash`).
+
+After changing DOC_ID_HASH or the key properties of an index, re-key the
+documents that are already stored with rekey_index.py.
+"""
+
+import os
+import hashlib
+from operator import itemgetter
+
+try:
+    import xxhash
+except ImportError:  # optional, only needed for DOC_ID_HASH=xxh3
+    xxhash = None
+
+DOC_ID_HASH = os.getenv("DOC_ID_HASH", "sha256").lower()
+
+KEY_PROPERTIES = {
+    os.getenv("INDEX_SEAT_INFO", "copilot_seat_info_settings"): ("organization_slug", "day"),
+    os.getenv("INDEX_SEAT_ASSIGNMENTS", "copilot_seat_assignments"): (
+        "organization_slug",
+        "assignee_login",
+        "day",
+    ),
+    os.getenv("INDEX_NAME_TOTAL", "copilot_usage_total"): ("organization_slug", "team_slug", "day"),
+    os.getenv("INDEX_NAME_BREAKDOWN", "copilot_usage_breakdown"): (
+        "organization_slug",
+        "team_slug",
+        "day",
+        "language",
+        "editor",
+        "model",
+    ),
+    os.getenv("INDEX_NAME_BREAKDOWN_CHAT", "copilot_usage_breakdown_chat"): (
+        "organization_slug",
+        "team_slug",
+        "day",
+        "editor",
+        "model",
+    ),
+    os.getenv("INDEX_USER_METRICS", "copilot_user_metrics"): ("organization_slug", "user_login", "day"),
+    os.getenv("INDEX_DEVELOPER_ACTIVITY", "developer_activity"): (
+        "organization_slug",
+        "user_login",
+        "report_start_day",
+        "report_end_day",
+    ),
+    os.getenv("INDEX_USER_ADOPTION_AGGREGATES", "copilot_user_adoption_aggregates"): (
+        "organization_slug",
+        "user_login",
+        "report_start_day",
+        "report_end_day",
+        "window_days",
+    ),
+    os.getenv("INDEX_USER_METRICS_ROLLUP", "copilot_user_metrics_rollup"): (
+        "organization_slug",
+        "team_slug",
+        "day",
+        "dimension_kind",
+        "dimension_value",
+    ),
+    os.getenv("INDEX_USER_METRICS_FACTS", "copilot_user_metrics_facts"): (
+        "organization_slug",
+        "user_login",
+        "day",
+        "dimension_kind",
+        "ide",
+        "feature",
+        "language",
+        "model",
+    ),
+}
+
+
+def _sha256(key):
+    return hashlib.sha256(key).hexdigest()
+
+
+def _blake2b(key):
+    return hashlib.blake2b(key, digest_size=16).hexdigest()
+
+
+HASH_FUNCTIONS = {"sha256": _sha256, "blake2b": _blake2b}
+if xxhash is not None:
+    HASH_FUNCTIONS["xxh3"] = xxhash.xxh3_128_hexdigest
+
+
+def get_hash_function(name=None):
+    name = (name or DOC_ID_HASH).lower()
+    if name not in HASH_FUNCTIONS:
+        hint = " (install the xxhash package)" if name == "xxh3" else ""
+        raise ValueError(
+            f"Unknown document id hash '{name}'{hint}, expected one of {', '.join(HASH_FUNCTIONS)}"
+        )
+    return HASH_FUNCTIONS[name]
+
+
+def _to_str(value):
+    return "" if value is None else str(value)
+
+
+def compile_key_extractor(key_properties, prefix=""):
+    """
+    Build data -> key string for `key_properties`.
+
+    The key is the str() of every property ("" when missing or None) joined
+    with "-", after `prefix`. Documents that hold every property as a string,
+    the common case, are handled by one itemgetter call and one join.
+    """
+    key_properties = tuple(key_properties)
+    if not key_properties:
+        return lambda data: prefix
+    getter = itemgetter(*key_properties)
+    single = len(key_properties) == 1
+
+    def slow_key(data):
+        return prefix + "-".join([_to_str(data.get(key_property)) for key_property in key_properties])
+
+    def key(data):
+        try:
+            values = getter(data)
+        except KeyError:
+            return slow_key(data)
+        if single:
+            values = (values,)
+        try:
+            return prefix + "-".join(values)
+        except TypeError:
+            return prefix + "-".join(map(_to_str, values))
+
+    return key
+
+
+class KeyScheme:
+    """The key properties of one kind of document and the hash applied to them."""
+
+    def __init__(self, key_properties, hash_name=None, prefix=""):
+        self.key_properties = tuple(key_properties)
+        self.hash_name = (hash_name or DOC_ID_HASH).lower()
+        self.prefix = prefix
+        self._hash = get_hash_function(self.hash_name)
+        self._key = compile_key_extractor(self.key_properties, prefix)
+
+    def key(self, data):
+        return self._key(data)
+
+    def id(self, data):
+        return self._hash(self._key(data).encode())
+
+    def ids(self, docs):
+        key, hash_function = self._key, self._hash
+        return [hash_function(key(doc).encode()) for doc in docs]
+
+    def assign(self, docs, field="unique_hash"):
+        """Set `field` of every doc in the list `docs` to its id."""
+        for doc, doc_id in zip(docs, self.ids(docs)):
+            doc[field] = doc_id
+        return docs
+
+    def has_key(self, data):
+        """Whether `data` holds every key property, i.e. is keyed by this scheme."""
+        return all(data.get(key_property) is not None for key_property in self.key_properties)
+
+    def bind(self, constants):
+        """
+        Scheme for documents whose leading key properties have the values in
+        `constants`. Those are turned into the key prefix once, instead of per
+        document.
+        """
+        bound = 0
+        while bound < len(self.key_properties) - 1 and self.key_properties[bound] in constants:
+            bound += 1
+        prefix = self.prefix + "".join(
+            _to_str(constants.get(key_property)) + "-" for key_property in self.key_properties[:bound]
+        )
+        return KeyScheme(self.key_properties[bound:], self.hash_name, prefix)
+
+    def describe(self):
+        return {"key_properties": list(self.key_properties), "hash": self.hash_name}
+
+
+_schemes = {}
+
+
+def key_scheme(index_name, hash_name=None):
+    """The (cached) KeyScheme of `index_name` from KEY_PROPERTIES."""
+    cache_key = (index_name, hash_name)
+    if cache_key not in _schemes:
+        if index_name not in KEY_PROPERTIES:
+            raise KeyError(f"No document key declared for index {index_name}")
+        _schemes[cache_key] = KeyScheme(KEY_PROPERTIES[index_name], hash_name)
+    return _schemes[cache_key]
+
+
+def generate_unique_hash(data, key_properties=[]):
+    """Id from ad-hoc key properties, for documents without a fixed KEY_PROPERTIES entry."""
+    return get_hash_function()("-".join([_to_str(data.get(key_property)) for key_property in key_properties]).encode())
@@ -0,0 +1,186 @@
+"""
+Shared Elasticsearch client and one-time index bootstrap.
+
+Every stage of the collector (ingestion in collector.py, user summaries, top-by-day
+drill-down) talks to the same cluster. Instead of each stage building its own
+client and re-running the ping loop and `indices.exists` checks, they all go
+through this module:
+
+- get_es_client() returns one client per process, backed by a single
+  connection pool.
+- Request bodies are gzip-compressed when ELASTICSEARCH_HTTP_COMPRESS is set;
+  bulk bodies of nested user-metrics documents are large, repetitive JSON.
+- wait_for_elasticsearch() runs the ping loop at most once per process.
+- ensure_index() creates an index the first time it is requested and
+  remembers it, so later stages and later organizations skip the round trip.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+from elasticsearch import Elasticsearch, BadRequestError
+
+logger = logging.getLogger(__name__)
+
+MAPPING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mapping")
+# v1: mapping/<index>_mapping.json, concrete index named after the index
+# v2: mapping/v2/<index>_mapping.json, concrete index <index>-v2 behind an alias
+MAPPING_VERSION = os.getenv("INDEX_MAPPING_VERSION", "v1")
+HTTP_COMPRESS = os.getenv("ELASTICSEARCH_HTTP_COMPRESS", "false").lower() in ("1", "true", "yes")
+
+_client = None
+_client_lock = threading.Lock()
+
+_es_ready = False
+_bootstrap_lock = threading.Lock()
+_bootstrapped_indexes = set()
+
+
+def create_es_client(http_compress=None):
+    """Build a new client from the environment; most callers want get_es_client()."""
+    if http_compress is None:
+        http_compress = HTTP_COMPRESS
+    es_url = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
+    es_user = os.getenv("ELASTICSEARCH_USER")
+    es_password = os.getenv("ELASTICSEARCH_PASS")
+
+    options = {
+        "hosts": es_url,
+        "max_retries": 3,
+        "retry_on_timeout": True,
+        "request_timeout": 60,
+        "connections_per_node": int(
+            os.getenv("ELASTICSEARCH_CONNECTIONS_PER_NODE", "10")
+        ),
+        "http_compress": http_compress,
+    }
+
+    if es_user and es_password:
+        logger.info(f"Connecting to Elasticsearch at {es_url} with authentication")
+        options["basic_auth"] = (es_user, es_password)
+    else:
+        logger.info(f"Connecting to Elasticsearch at {es_url} without authentication")
+
+    return Elasticsearch(**options)
+
+
+def get_es_client():
+    """Return the process-wide Elasticsearch client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_es_client()
+    return _client
+
+
+def wait_for_elasticsearch(es=None, attempts=30, delay=5):
+    """Ping Elasticsearch until it answers. Only the first call per process waits."""
+    global _es_ready
+    if _es_ready:
+        return True
+
+    es = es or get_es_client()
+    with _bootstrap_lock:
+        if _es_ready:
+            return True
+        for _ in range(attempts):
+            if es.ping():
+                logger.info("Elasticsearch is up and running")
+                _es_ready = True
+                return True
+            logger.warning("Elasticsearch is not responding, retrying...")
+            time.sleep(delay)
+
+    logger.error(f"Elasticsearch did not respond after {attempts} attempts")
+    return False
+
+
+def load_mapping(index_name, version=None):
+    version = version or MAPPING_VERSION
+    mapping_dir = MAPPING_DIR if version == "v1" else os.path.join(MAPPING_DIR, version)
+    mapping_file = os.path.join(mapping_dir, f"{index_name}_mapping.json")
+    with open(mapping_file, "r") as f:
+        return json.load(f)
+
+
+def versioned_index_name(index_name, version=None):
+    """Concrete index holding `index_name` for a mapping version (v1 uses the plain name)."""
+    version = version or MAPPING_VERSION
+    return index_name if version == "v1" else f"{index_name}-{version}"
+
+
+def ensure_index(index_name, body=None, es=None):
+    """
+    Create `index_name` if it does not exist yet.
+
+    The body defaults to mapping/<index_name>_mapping.json. The result is cached
+    for the lifetime of the process, so repeated calls are free.
+    """
+    if index_name in _bootstrapped_indexes:
+        return
+
+    es = es or get_es_client()
+    with _bootstrap_lock:
+        if index_name in _bootstrapped_indexes:
+            return
+
+        if es.indices.exists(index=index_name):
+            logger.info(f"Index already exists: {index_name}")
+        else:
+            if body is None:
+                body = load_mapping(index_name)
+            try:
+                es.indices.create(index=index_name, body=body)
+                logger.info(f"Created index: {index_name}")
+            except BadRequestError as e:
+                # Another worker created it between the exists check and the create
+                if e.error != "resource_already_exists_exception":
+                    raise
+                logger.info(f"Index already exists: {index_name}")
+
+        _bootstrapped_indexes.add(index_name)
+
+
+def forget_index(index_name):
+    """Drop `index_name` from the bootstrap cache, e.g. after deleting it."""
+    with _bootstrap_lock:
+        _bootstrapped_indexes.discard(index_name)
+
+
+def ensure_managed_index(index_name, es=None):
+    """
+    Make sure the mapping-managed index `index_name` can be read and written.
+
+    From v2 on, the data lives in a versioned concrete index and `index_name` is
+    an alias to it, so a later mapping change can be rolled out with
+    reindex_mappings.py without renaming anything readers use.
+    """
+    if MAPPING_VERSION == "v1":
+        ensure_index(index_name, es=es)
+        return
+
+    es = es or get_es_client()
+    if index_name in _bootstrapped_indexes:
+        return
+    if es.indices.exists(index=index_name):
+        logger.info(f"Index already exists: {index_name}")
+        with _bootstrap_lock:
+            _bootstrapped_indexes.add(index_name)
+        return
+
+    body = {**load_mapping(index_name), "aliases": {index_name: {}}}
+    ensure_index(versioned_index_name(index_name), body=body, es=es)
+    with _bootstrap_lock:
+        _bootstrapped_indexes.add(index_name)
+
+
+def ensure_indexes(index_names, es=None):
+    """Wait for the cluster once, then make sure every index in `index_names` exists."""
+    es = es or get_es_client()
+    wait_for_elasticsearch(es)
+    for index_name in index_names:
+        ensure_managed_index(index_name, es=es)
@@ -10,17 +10,145 @@ with GitHub Copilot usage metrics. This includes:
 
 These metrics can be visualized alongside Copilot metrics to understand
 the relationship between Copilot usage and overall developer productivity.
+
+Two backends produce the same records (DEVELOPER_ACTIVITY_BACKEND):
+
+- search (default): the REST search API, eight calls per member against the
+  30 requests/minute search limit,
+- graphql: the contributionsCollection of each member, scoped to the
+  organization, with DEVELOPER_ACTIVITY_GRAPHQL_BATCH_SIZE members aliased
+  into one query. Commits, PRs opened, reviews and issues opened are GitHub's
+  contribution totals; merged PRs and closed issues come from a few
+  organization-wide merged:/closed: searches over the period, so they count
+  what was merged/closed in it, like the search backend. Comment counts are
+  not part of the contributions and stay 0. Standalone enterprises have no organization to
+  scope by and always use the search backend.
+
+Both produce one record per member for the last DEVELOPER_ACTIVITY_DAYS_BACK
+days, stamped with today's day. DEVELOPER_ACTIVITY_MODE=daily instead writes
+one record per member and day (period_days 1, report_start_day =
+report_end_day = day) from the contribution calendar and the dated
+contributions of contributionsCollection, so the series lines up with the
+per-day Copilot user metrics. It is incremental: each member is only fetched
+from the last day already stored for them (re-fetched, it may have been
+partial) on, up to a year back (the longest contributionsCollection range),
+in queries of at most DAILY_CHUNK_DAYS days, see last_stored_days(). Days are UTC days; merged PRs and closed issues are
+dated by the day they were merged/closed, whenever they were opened, from
+organization-wide merged:/closed: searches.
 """
 
 import json
+import logging
 import requests
 import os
-import hashlib
-from datetime import datetime, timedelta
-from log_utils import configure_logger, current_time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, time, timedelta, timezone
+from doc_ids import key_scheme
+from log_utils import SAMPLED, current_time
+from run_cache import cached_listing
+from search_scheduler import HIGH_PRIORITY, NORMAL_PRIORITY, Progress, get_search_scheduler
+from snapshots import dict_save_to_json_file
 from zoneinfo import ZoneInfo
 
-logger = configure_logger(log_path=os.getenv("LOG_PATH", "logs"))
+logger = logging.getLogger(__name__)
+
+DEVELOPER_ACTIVITY_INDEX = os.getenv("INDEX_DEVELOPER_ACTIVITY", "developer_activity")
+DEVELOPER_ACTIVITY_BACKEND = os.getenv("DEVELOPER_ACTIVITY_BACKEND", "search").lower()
+DEVELOPER_ACTIVITY_MODE = os.getenv("DEVELOPER_ACTIVITY_MODE", "period").lower()
+GRAPHQL_BATCH_SIZE = int(os.getenv("DEVELOPER_ACTIVITY_GRAPHQL_BATCH_SIZE", "25"))
+DEVELOPER_ACTIVITY_WORKERS = int(os.getenv("DEVELOPER_ACTIVITY_WORKERS", "4"))
+# Commit search plus seven issue/PR searches per member with the search backend
+SEARCHES_PER_MEMBER = 8
+# Results a search returns at most, whatever its total_count
+SEARCH_RESULT_LIMIT = 1000
+# Longest range of one contributionsCollection, in days
+MAX_DAYS_BACK = 365
+# Days of one per-day query: a commit contribution node is one repository and
+# day, and only the first 100 of each repository are read
+DAILY_CHUNK_DAYS = 100
+
+# Node fields of the per-day contribution connections that are paged past
+# their first 100 nodes (see fetch_remaining_pages), by connection
+DAILY_CONNECTION_NODES = {
+    "pullRequestContributions": "occurredAt",
+    "pullRequestReviewContributions": "occurredAt",
+    "issueContributions": "occurredAt",
+}
+PAGE_INFO = "totalCount pageInfo { hasNextPage endCursor }"
+
+
+def _connections(connection_nodes, after=""):
+    return "\n".join(
+        f"      {connection}(first: 100{after}) {{ {PAGE_INFO} nodes {{ {nodes} }} }}"
+        for connection, nodes in connection_nodes.items()
+    )
+
+
+# Fields read for every aliased user
+CONTRIBUTIONS_FIELDS = """
+    login
+    contributionsCollection(organizationID: $organizationId, from: $from, to: $to) {
+      totalCommitContributions
+      totalPullRequestContributions
+      totalPullRequestReviewContributions
+      totalIssueContributions
+      commitContributionsByRepository(maxRepositories: 100) { repository { name } }
+    }
+"""
+
+
+def build_connection_page_query(connection, nodes):
+    """A query of the next page (after $after) of one contribution connection of $login."""
+    return (
+        "query($login: String!, $organizationId: ID, $from: DateTime, $to: DateTime, $after: String) {\n"
+        "  user(login: $login) {\n"
+        "    contributionsCollection(organizationID: $organizationId, from: $from, to: $to) {\n"
+        f"{_connections({connection: nodes}, ', after: $after')}\n"
+        "    }\n"
+        "  }\n"
+        "}"
+    )
+
+
+def build_contributions_query(count):
+    """A query aliasing `count` users (u0, u1, ...) with variables $login0, $login1, ..."""
+    logins = ", ".join(f"$login{i}: String!" for i in range(count))
+    users = "\n".join(f"  u{i}: user(login: $login{i}) {{{CONTRIBUTIONS_FIELDS}  }}" for i in range(count))
+    return f"query($organizationId: ID, $from: DateTime, $to: DateTime, {logins}) {{\n{users}\n}}"
+
+
+def contribution_metrics(user, closures=None):
+    """
+    (commit, PR, issue) metrics of one aliased user, shaped like the search backend's.
+
+    The merged PRs and closed issues are summed from `closures`, the user's
+    {day: {"prs_merged": n, "issues_closed": n}} of the period.
+    """
+    collection = user["contributionsCollection"]
+    repos = [
+        entry["repository"]["name"]
+        for entry in collection.get("commitContributionsByRepository") or []
+        if entry.get("repository")
+    ]
+    closed = (closures or {}).values()
+    commit_metrics = {
+        "commit_count": collection.get("totalCommitContributions", 0),
+        "repos_contributed": len(repos),
+        "repos_list": repos,
+    }
+    pr_metrics = {
+        "prs_opened": collection.get("totalPullRequestContributions", 0),
+        "prs_merged": sum(day["prs_merged"] for day in closed),
+        "prs_reviewed": collection.get("totalPullRequestReviewContributions", 0),
+        "pr_comments": 0,
+        "prs_closed": 0,
+    }
+    issue_metrics = {
+        "issues_opened": collection.get("totalIssueContributions", 0),
+        "issues_closed": sum(day["issues_closed"] for day in closed),
+        "issue_comments": 0,
+    }
+    return commit_metrics, pr_metrics, issue_metrics
 
 
 def get_utc_offset():
@@ -38,14 +166,143 @@ def get_utc_offset():
     return offset_str
 
 
-def generate_unique_hash(data, key_properties):
-    """Generate a unique hash based on specified properties."""
-    key_elements = []
-    for key_property in key_properties:
-        value = data.get(key_property)
-        key_elements.append(str(value) if value is not None else "")
-    key_string = "-".join(key_elements)
-    return hashlib.sha256(key_string.encode()).hexdigest()
+
+# Per-day variant: every alias has its own $from<i>/$to<i>, since each member
+# is fetched from their own last stored day
+DAILY_CONTRIBUTIONS_FIELDS = f"""
+    login
+    contributionsCollection(organizationID: $organizationId, from: $from, to: $to) {{
+      contributionCalendar {{ weeks {{ contributionDays {{ date contributionCount }} }} }}
+      commitContributionsByRepository(maxRepositories: 100) {{
+        repository {{ name }}
+        contributions(first: 100) {{ totalCount nodes {{ occurredAt commitCount }} }}
+      }}
+{_connections(DAILY_CONNECTION_NODES)}
+    }}
+"""
+
+
+def build_daily_contributions_query(count):
+    """Like build_contributions_query, with $from<i>/$to<i> per alias."""
+    declarations = ", ".join(f"$login{i}: String!, $from{i}: DateTime, $to{i}: DateTime" for i in range(count))
+    users = "\n".join(
+        f"  u{i}: user(login: $login{i}) {{"
+        + DAILY_CONTRIBUTIONS_FIELDS.replace("$from", f"$from{i}").replace("$to", f"$to{i}")
+        + "  }"
+        for i in range(count)
+    )
+    return f"query($organizationId: ID, {declarations}) {{\n{users}\n}}"
+
+
+def _nodes(collection, connection):
+    return [node for node in (collection.get(connection) or {}).get("nodes") or [] if node]
+
+
+def daily_chunks(first_day, last_day, until):
+    """[(from, to)] of first_day..last_day (up to `until` on last_day) in ranges of DAILY_CHUNK_DAYS days."""
+    chunks = []
+    day = first_day
+    while day <= last_day:
+        chunk_end = min(day + timedelta(days=DAILY_CHUNK_DAYS - 1), last_day)
+        to = until if chunk_end == last_day else datetime.combine(chunk_end, time.max, tzinfo=timezone.utc)
+        chunks.append(
+            (datetime.combine(day, time.min, tzinfo=timezone.utc).isoformat(), to.isoformat(timespec="seconds"))
+        )
+        day = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def daily_contribution_counts(user, closures=None, days=None):
+    """
+    {day: counters} of one aliased user of build_daily_contributions_query.
+
+    The merged PRs and closed issues are not part of the contributions; they
+    are added from `closures`, {day: {"prs_merged": n, "issues_closed": n}}.
+    Pass the `days` of a previous range of the same user to add to them.
+    """
+    collection = user["contributionsCollection"]
+    days = {} if days is None else days
+
+    def counters(day):
+        return days.setdefault(
+            day,
+            {
+                "commit_count": 0,
+                "repos": set(),
+                "prs_opened": 0,
+                "prs_merged": 0,
+                "prs_reviewed": 0,
+                "issues_opened": 0,
+                "issues_closed": 0,
+                "calendar_contributions": 0,
+            },
+        )
+
+    calendar = collection.get("contributionCalendar") or {}
+    for week in calendar.get("weeks") or []:
+        for calendar_day in week.get("contributionDays") or []:
+            counters(calendar_day["date"])["calendar_contributions"] = calendar_day.get("contributionCount", 0)
+    for entry in collection.get("commitContributionsByRepository") or []:
+        repo_name = (entry.get("repository") or {}).get("name")
+        contributions = _nodes(entry, "contributions")
+        total = (entry.get("contributions") or {}).get("totalCount", 0)
+        if total > len(contributions):
+            logger.warning(
+                f"Only {len(contributions)} of {total} commit days of {user.get('login')} in {repo_name} fetched"
+            )
+        for node in contributions:
+            day = counters(node["occurredAt"][:10])
+            day["commit_count"] += node.get("commitCount", 0)
+            if repo_name:
+                day["repos"].add(repo_name)
+    for node in _nodes(collection, "pullRequestContributions"):
+        counters(node["occurredAt"][:10])["prs_opened"] += 1
+    for node in _nodes(collection, "pullRequestReviewContributions"):
+        counters(node["occurredAt"][:10])["prs_reviewed"] += 1
+    for node in _nodes(collection, "issueContributions"):
+        counters(node["occurredAt"][:10])["issues_opened"] += 1
+    for day, closed in (closures or {}).items():
+        for counter, count in closed.items():
+            counters(day)[counter] += count
+    return days
+
+
+def last_stored_days(es, organization_slug, index_name=DEVELOPER_ACTIVITY_INDEX):
+    """{login: latest day (date)} of the per-day records stored for `organization_slug`."""
+    query = {
+        "bool": {
+            "filter": [
+                {"term": {"organization_slug": organization_slug}},
+                {"term": {"period_days": 1}},
+            ]
+        }
+    }
+    last_days = {}
+    after_key = None
+    while True:
+        composite = {"size": 1000, "sources": [{"user_login": {"terms": {"field": "user_login"}}}]}
+        if after_key:
+            composite["after"] = after_key
+        resp = es.search(
+            index=index_name,
+            size=0,
+            query=query,
+            aggs={
+                "users": {
+                    "composite": composite,
+                    "aggs": {"last_day": {"max": {"field": "day", "format": "yyyy-MM-dd"}}},
+                }
+            },
+        )
+        result = resp["aggregations"]["users"]
+        for bucket in result["buckets"]:
+            last_day = bucket["last_day"].get("value_as_string")
+            if last_day:
+                last_days[bucket["key"]["user_login"]] = date.fromisoformat(last_day)
+
+        after_key = result.get("after_key")
+        if not after_key or len(result["buckets"]) < composite["size"]:
+            return last_days
 
 
 class DeveloperActivityFetcher:
@@ -76,10 +333,10 @@ class DeveloperActivityFetcher:
         if error_return_value is None:
             error_return_value = []
         
-        logger.info(f"REST API request: {url}")
+        logger.debug(f"REST API request: {url}", extra=SAMPLED)
         try:
             response = requests.get(url, headers=self.headers)
-            logger.info(f"Response status code: {response.status_code}")
+            logger.debug(f"Response status code: {response.status_code}", extra=SAMPLED)
             
             if response.status_code != 200:
                 logger.error(f"HTTP {response.status_code} error: {response.text}")
@@ -90,8 +347,13 @@ class DeveloperActivityFetcher:
             logger.error(f"Request failed: {e}")
             return error_return_value
 
-    def _make_graphql_request(self, query, variables=None):
-        """Make a GraphQL request to GitHub."""
+    def _make_graphql_request(self, query, variables=None, allow_partial=False):
+        """
+        Make a GraphQL request to GitHub.
+
+        With `allow_partial`, data returned next to errors (for example an
+        aliased user that does not exist) is kept and the errors are logged.
+        """
         payload = {"query": query}
         if variables:
             payload["variables"] = variables
@@ -101,6 +363,9 @@ class DeveloperActivityFetcher:
             if response.status_code == 200:
                 data = response.json()
                 if "errors" in data:
+                    if allow_partial and data.get("data"):
+                        logger.warning(f"GraphQL errors: {data['errors']}")
+                        return data["data"]
                     logger.error(f"GraphQL errors: {data['errors']}")
                     return None
                 return data.get("data")
@@ -112,7 +377,10 @@ class DeveloperActivityFetcher:
             return None
 
     def get_organization_members(self):
-        """Get all members of the organization."""
+        """Get all members of the organization (once per run, see run_cache)."""
+        return cached_listing(("members", self.api_type, self.organization_slug), self._fetch_organization_members)
+
+    def _fetch_organization_members(self):
         members = []
         page = 1
         per_page = 100
@@ -134,7 +402,10 @@ class DeveloperActivityFetcher:
         return members
 
     def get_organization_repos(self):
-        """Get all repositories in the organization."""
+        """Get all repositories in the organization (once per run, see run_cache)."""
+        return cached_listing(("repos", self.api_type, self.organization_slug), self._fetch_organization_repos)
+
+    def _fetch_organization_repos(self):
         repos = []
         page = 1
         per_page = 100
@@ -155,18 +426,70 @@ class DeveloperActivityFetcher:
         logger.info(f"Found {len(repos)} repositories")
         return repos
 
-    def get_user_commits(self, user_login, since_date, until_date, repos=None):
+    def _search_count(self, query, priority=NORMAL_PRIORITY):
+        """total_count of an issue/PR search, paced by the search scheduler; raises when it fails."""
+        url = f"https://api.github.com/search/issues?q={query}&per_page=1"
+        logger.debug(f"Search request: {url}", extra=SAMPLED)
+        response = get_search_scheduler().get(url, self.headers, priority)
+        if response.status_code != 200:
+            raise RuntimeError(f"search failed with HTTP {response.status_code}: {query}")
+        return response.json().get("total_count", 0)
+
+    def _search_closed_days(self, kind, qualifier, first_day, last_day):
+        """
+        [(author, UTC day)] of the `kind` ("pr" or "issue") of the organization
+        `qualifier` ("merged" or "closed") between the days.
+
+        Ranges with more results than a search returns are split in halves;
+        raises when a search fails.
+        """
+        query = f"org:{self.organization_slug} is:{kind} {qualifier}:{first_day}..{last_day}"
+        items = []
+        page = 1
+        while True:
+            url = f"https://api.github.com/search/issues?q={query}&per_page=100&page={page}"
+            logger.debug(f"Search request: {url}", extra=SAMPLED)
+            response = get_search_scheduler().get(url, self.headers)
+            if response.status_code != 200:
+                raise RuntimeError(f"search failed with HTTP {response.status_code}: {query}")
+            data = response.json()
+            total = data.get("total_count", 0)
+            if page == 1 and total > SEARCH_RESULT_LIMIT:
+                if first_day < last_day:
+                    middle = first_day + (last_day - first_day) // 2
+                    return self._search_closed_days(kind, qualifier, first_day, middle) + self._search_closed_days(
+                        kind, qualifier, middle + timedelta(days=1), last_day
+                    )
+                logger.warning(f"Only {SEARCH_RESULT_LIMIT} of {total} results can be read for {query}")
+            items.extend(data.get("items") or [])
+            if not data.get("items") or len(items) >= min(total, SEARCH_RESULT_LIMIT):
+                break
+            page += 1
+        closed = []
+        for item in items:
+            # A merged PR is closed when it is merged
+            closed_at = (item.get("pull_request") or {}).get("merged_at") or item.get("closed_at")
+            author = (item.get("user") or {}).get("login")
+            if closed_at and author:
+                closed.append((author, closed_at[:10]))
+        return closed
+
+    def get_daily_closures(self, first_day, last_day):
+        """{login: {day: {"prs_merged": n, "issues_closed": n}}} of the organization between the days."""
+        closures = {}
+        for kind, qualifier, counter in (("pr", "merged", "prs_merged"), ("issue", "closed", "issues_closed")):
+            for author, day in self._search_closed_days(kind, qualifier, first_day, last_day):
+                day_counts = closures.setdefault(author, {}).setdefault(day, {"prs_merged": 0, "issues_closed": 0})
+                day_counts[counter] += 1
+        return closures
+
+    def get_user_commits(self, user_login, since_date, until_date, priority=NORMAL_PRIORITY):
         """
         Get commit activity for a user across organization repositories.
         
         Uses the search API to find commits by author within the date range.
         """
-        if repos is None:
-            repos = self.get_organization_repos()
-        
         total_commits = 0
-        additions = 0
-        deletions = 0
         repos_contributed = set()
         
         # Use search API for commits by this author in the org
@@ -179,21 +502,17 @@ class DeveloperActivityFetcher:
         headers = self.headers.copy()
         headers["Accept"] = "application/vnd.github.cloak-preview+json"
         
-        try:
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-                total_commits = data.get("total_count", 0)
-                
-                # Get details from items
-                for item in data.get("items", []):
-                    repo_name = item.get("repository", {}).get("name")
-                    if repo_name:
-                        repos_contributed.add(repo_name)
-            else:
-                logger.warning(f"Commit search failed for {user_login}: {response.status_code}")
-        except Exception as e:
-            logger.error(f"Error fetching commits for {user_login}: {e}")
+        response = get_search_scheduler().get(url, headers, priority)
+        if response.status_code != 200:
+            raise RuntimeError(f"commit search failed with HTTP {response.status_code}")
+        data = response.json()
+        total_commits = data.get("total_count", 0)
+        
+        # Get details from items
+        for item in data.get("items", []):
+            repo_name = item.get("repository", {}).get("name")
+            if repo_name:
+                repos_contributed.add(repo_name)
         
         return {
             "commit_count": total_commits,
@@ -201,7 +520,7 @@ class DeveloperActivityFetcher:
             "repos_list": list(repos_contributed)
         }
 
-    def get_user_pull_requests(self, user_login, since_date, until_date):
+    def get_user_pull_requests(self, user_login, since_date, until_date, priority=NORMAL_PRIORITY):
         """
         Get pull request activity for a user.
         
@@ -219,32 +538,28 @@ class DeveloperActivityFetcher:
         }
         
         # PRs opened by user
-        query = f"org:{self.organization_slug} author:{user_login} created:{since_str}..{until_str} is:pr"
-        url = f"https://api.github.com/search/issues?q={query}&per_page=1"
-        data = self._make_rest_request(url, {})
-        metrics["prs_opened"] = data.get("total_count", 0)
+        metrics["prs_opened"] = self._search_count(
+            f"org:{self.organization_slug} author:{user_login} created:{since_str}..{until_str} is:pr", priority
+        )
         
         # PRs merged by user (authored and merged)
-        query = f"org:{self.organization_slug} author:{user_login} merged:{since_str}..{until_str} is:pr"
-        url = f"https://api.github.com/search/issues?q={query}&per_page=1"
-        data = self._make_rest_request(url, {})
-        metrics["prs_merged"] = data.get("total_count", 0)
+        metrics["prs_merged"] = self._search_count(
+            f"org:{self.organization_slug} author:{user_login} merged:{since_str}..{until_str} is:pr", priority
+        )
         
         # PRs reviewed by user (using reviewed-by)
-        query = f"org:{self.organization_slug} reviewed-by:{user_login} created:{since_str}..{until_str} is:pr"
-        url = f"https://api.github.com/search/issues?q={query}&per_page=1"
-        data = self._make_rest_request(url, {})
-        metrics["prs_reviewed"] = data.get("total_count", 0)
+        metrics["prs_reviewed"] = self._search_count(
+            f"org:{self.organization_slug} reviewed-by:{user_login} created:{since_str}..{until_str} is:pr", priority
+        )
         
         # PRs where user commented
-        query = f"org:{self.organization_slug} commenter:{user_login} created:{since_str}..{until_str} is:pr"
-        url = f"https://api.github.com/search/issues?q={query}&per_page=1"
-        data = self._make_rest_request(url, {})
-        metrics["pr_comments"] = data.get("total_count", 0)
+        metrics["pr_comments"] = self._search_count(
+            f"org:{self.organization_slug} commenter:{user_login} created:{since_str}..{until_str} is:pr", priority
+        )
         
         return metrics
 
-    def get_user_issues(self, user_login, since_date, until_date):
+    def get_user_issues(self, user_login, since_date, until_date, priority=NORMAL_PRIORITY):
         """
         Get issue activity for a user.
         
@@ -260,26 +575,265 @@ class DeveloperActivityFetcher:
         }
         
         # Issues opened by user
-        query = f"org:{self.organization_slug} author:{user_login} created:{since_str}..{until_str} is:issue"
-        url = f"https://api.github.com/search/issues?q={query}&per_page=1"
-        data = self._make_rest_request(url, {})
-        metrics["issues_opened"] = data.get("total_count", 0)
+        metrics["issues_opened"] = self._search_count(
+            f"org:{self.organization_slug} author:{user_login} created:{since_str}..{until_str} is:issue", priority
+        )
         
         # Issues closed by user
-        query = f"org:{self.organization_slug} author:{user_login} closed:{since_str}..{until_str} is:issue"
-        url = f"https://api.github.com/search/issues?q={query}&per_page=1"
-        data = self._make_rest_request(url, {})
-        metrics["issues_closed"] = data.get("total_count", 0)
+        metrics["issues_closed"] = self._search_count(
+            f"org:{self.organization_slug} author:{user_login} closed:{since_str}..{until_str} is:issue", priority
+        )
         
         # Issues where user commented
-        query = f"org:{self.organization_slug} commenter:{user_login} created:{since_str}..{until_str} is:issue"
-        url = f"https://api.github.com/search/issues?q={query}&per_page=1"
-        data = self._make_rest_request(url, {})
-        metrics["issue_comments"] = data.get("total_count", 0)
+        metrics["issue_comments"] = self._search_count(
+            f"org:{self.organization_slug} commenter:{user_login} created:{since_str}..{until_str} is:issue", priority
+        )
         
         return metrics
 
-    def fetch_developer_activity_for_members(self, members=None, days_back=28, save_to_json=True):
+    def get_organization_id(self):
+        """GraphQL node id of the organization, used to scope contributions to it."""
+        data = self._make_graphql_request(
+            "query($login: String!) { organization(login: $login) { id } }",
+            {"login": self.organization_slug},
+        )
+        organization = (data or {}).get("organization")
+        return organization.get("id") if organization else None
+
+    def _query_aliased_users(self, members, build_query, variables, alias_variables):
+        """
+        {login: user data} of `members`, queried with one aliased GraphQL query.
+
+        build_query(count) declares $<name><i> for every name returned by
+        alias_variables(member) (at least "login") next to the shared
+        `variables`. Members GitHub does not know are left out. A batch that
+        fails as a whole is retried in halves, so one bad login or an
+        oversized query only costs the members it affects.
+        """
+        if not members:
+            return {}
+        batch_variables = dict(variables)
+        for i, member in enumerate(members):
+            for name, value in alias_variables(member).items():
+                batch_variables[f"{name}{i}"] = value
+        logger.debug(f"GraphQL contributions request for {len(members)} members", extra=SAMPLED)
+        data = self._make_graphql_request(build_query(len(members)), batch_variables, allow_partial=True)
+
+        if data is None:
+            if len(members) == 1:
+                logger.error(f"Failed to fetch contributions for {members[0]}")
+                return {}
+            middle = len(members) // 2
+            results = self._query_aliased_users(members[:middle], build_query, variables, alias_variables)
+            results.update(self._query_aliased_users(members[middle:], build_query, variables, alias_variables))
+            return results
+
+        results = {}
+        for i, member in enumerate(members):
+            user = data.get(f"u{i}")
+            if not user or not user.get("contributionsCollection"):
+                logger.warning(f"No contributions returned for {member}")
+                continue
+            results[member] = user
+        return results
+
+    def fetch_remaining_pages(self, member, user, connection_nodes, variables):
+        """
+        Append the nodes past the first page of each connection of `connection_nodes`
+        to the contributionsCollection of `user`, one query per page of 100.
+
+        `variables` are the $organizationId, $from and $to the user was queried
+        with. A page that fails leaves the connection short, which is logged.
+        """
+        collection = user["contributionsCollection"]
+        for connection, nodes in connection_nodes.items():
+            page = collection.get(connection)
+            if not page:
+                continue
+            fetched = page.setdefault("nodes", [])
+            page_info = page.get("pageInfo") or {}
+            while page_info.get("hasNextPage"):
+                data = self._make_graphql_request(
+                    build_connection_page_query(connection, nodes),
+                    {**variables, "login": member, "after": page_info.get("endCursor")},
+                )
+                next_page = (((data or {}).get("user") or {}).get("contributionsCollection") or {}).get(connection)
+                if not next_page:
+                    logger.warning(
+                        f"Only {len(fetched)} of {page.get('totalCount')} {connection} fetched for {member}"
+                    )
+                    break
+                fetched.extend(next_page.get("nodes") or [])
+                page_info = next_page.get("pageInfo") or {}
+
+    def get_contributions_batch(self, members, since_date, until_date, organization_id, closures=None):
+        """
+        Contribution metrics of several members with one aliased GraphQL query.
+
+        `closures` are the get_daily_closures() of the period. Returns
+        {login: (commit_metrics, pr_metrics, issue_metrics)}.
+        """
+        variables = {
+            "organizationId": organization_id,
+            "from": since_date.astimezone().isoformat(timespec="seconds"),
+            "to": until_date.astimezone().isoformat(timespec="seconds"),
+        }
+        users = self._query_aliased_users(
+            members, build_contributions_query, variables, lambda member: {"login": member}
+        )
+        closures = closures or {}
+        return {member: contribution_metrics(user, closures.get(member)) for member, user in users.items()}
+
+    def _fetch_member_activity(self, member, since_date, until_date, priority):
+        logger.debug(f"Fetching activity for member: {member}", extra=SAMPLED)
+        return (
+            self.get_user_commits(member, since_date, until_date, priority),
+            self.get_user_pull_requests(member, since_date, until_date, priority),
+            self.get_user_issues(member, since_date, until_date, priority),
+        )
+
+    def _search_activity(self, members, since_date, until_date, priority_logins=None):
+        """
+        Yield (member, metrics) from the REST search API.
+
+        Members are processed by DEVELOPER_ACTIVITY_WORKERS threads while the
+        shared search scheduler keeps the calls within the search rate limit;
+        the calls of `priority_logins` are served first. Members whose searches
+        fail even after the rate limit retries are left out, not recorded as 0.
+        """
+        priority_logins = priority_logins or set()
+        scheduler = get_search_scheduler()
+        progress = Progress(len(members), f"Developer activity of {self.organization_slug}")
+        logger.info(
+            f"Searching activity of {len(members)} members ({len(priority_logins & set(members))} prioritized) "
+            f"with {DEVELOPER_ACTIVITY_WORKERS} workers at {60 / scheduler.interval:.0f} searches/min, "
+            f"at least {len(members) * SEARCHES_PER_MEMBER * scheduler.interval / 60:.1f} min"
+        )
+        # Prioritized members are also submitted first
+        ordered = sorted(members, key=lambda member: member not in priority_logins)
+        with ThreadPoolExecutor(max_workers=max(1, DEVELOPER_ACTIVITY_WORKERS)) as pool:
+            futures = {
+                member: pool.submit(
+                    self._fetch_member_activity,
+                    member,
+                    since_date,
+                    until_date,
+                    HIGH_PRIORITY if member in priority_logins else NORMAL_PRIORITY,
+                )
+                for member in ordered
+            }
+            for future in as_completed(futures.values()):
+                progress.advance()
+            for member, future in futures.items():
+                try:
+                    yield member, future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching activity for {member}: {e}")
+        scheduler.log_stats()
+
+    def _graphql_activity(self, members, since_date, until_date, organization_id):
+        """
+        Yield (member, metrics) from batched contributionsCollection queries.
+
+        The merged PRs and closed issues are searched for the whole
+        organization first, with the same dates as the search backend; nothing
+        is yielded when those searches fail.
+        """
+        try:
+            closures = self.get_daily_closures(since_date.date(), until_date.date())
+        except Exception as e:
+            logger.error(f"Error searching merged PRs and closed issues, developer activity not updated: {e}")
+            return
+        batch_size = max(1, GRAPHQL_BATCH_SIZE)
+        for start in range(0, len(members), batch_size):
+            batch = members[start:start + batch_size]
+            try:
+                results = self.get_contributions_batch(batch, since_date, until_date, organization_id, closures)
+            except Exception as e:
+                logger.error(f"Error fetching contributions for {len(batch)} members: {e}")
+                continue
+            for member in batch:
+                if member in results:
+                    yield member, results[member]
+
+    def _resolve_backend(self, backend):
+        """The backend to use and, for graphql, the organization node id."""
+        backend = (backend or DEVELOPER_ACTIVITY_BACKEND).lower()
+        if backend not in ("search", "graphql"):
+            logger.warning(f"Unknown developer activity backend '{backend}', using search")
+            return "search", None
+        if backend == "search":
+            return backend, None
+        if self.is_standalone:
+            logger.info("The graphql backend needs an organization, using search for the enterprise")
+            return "search", None
+        organization_id = self.get_organization_id()
+        if not organization_id:
+            logger.warning(f"Could not resolve the id of {self.organization_slug}, using the search backend")
+            return "search", None
+        return backend, organization_id
+
+    def build_activity_record(self, member, metrics, since_date, until_date, days_back, last_updated_at):
+        """The developer activity record of one member for the period."""
+        commit_metrics, pr_metrics, issue_metrics = metrics
+
+        # Calculate aggregate scores
+        total_contributions = (
+            commit_metrics.get("commit_count", 0) +
+            pr_metrics.get("prs_opened", 0) +
+            pr_metrics.get("prs_merged", 0) +
+            pr_metrics.get("prs_reviewed", 0) +
+            issue_metrics.get("issues_opened", 0)
+        )
+        
+        code_review_activity = (
+            pr_metrics.get("prs_reviewed", 0) +
+            pr_metrics.get("pr_comments", 0)
+        )
+        
+        # Create record for this user (aggregated for the period)
+        return {
+            "user_login": member,
+            "organization_slug": self.organization_slug,
+            "slug_type": self.slug_type,
+            "day": until_date.strftime("%Y-%m-%d"),
+            "report_start_day": since_date.strftime("%Y-%m-%d"),
+            "report_end_day": until_date.strftime("%Y-%m-%d"),
+            "period_days": days_back,
+            
+            # Commit metrics
+            "commit_count": commit_metrics.get("commit_count", 0),
+            "repos_contributed": commit_metrics.get("repos_contributed", 0),
+            
+            # PR metrics
+            "prs_opened": pr_metrics.get("prs_opened", 0),
+            "prs_merged": pr_metrics.get("prs_merged", 0),
+            "prs_reviewed": pr_metrics.get("prs_reviewed", 0),
+            "pr_comments": pr_metrics.get("pr_comments", 0),
+            "prs_closed": pr_metrics.get("prs_closed", 0),
+            
+            # Issue metrics  
+            "issues_opened": issue_metrics.get("issues_opened", 0),
+            "issues_closed": issue_metrics.get("issues_closed", 0),
+            "issue_comments": issue_metrics.get("issue_comments", 0),
+            
+            # Aggregate metrics
+            "total_contributions": total_contributions,
+            "code_review_activity": code_review_activity,
+            
+            # Calculated rates (per day)
+            "commits_per_day": round(commit_metrics.get("commit_count", 0) / days_back, 2),
+            "prs_per_day": round(pr_metrics.get("prs_opened", 0) / days_back, 2),
+            "reviews_per_day": round(pr_metrics.get("prs_reviewed", 0) / days_back, 2),
+            
+            # Metadata
+            "last_updated_at": last_updated_at,
+            "utc_offset": self.utc_offset,
+        }
+
+    def fetch_developer_activity_for_members(
+        self, members=None, days_back=28, save_to_json=True, backend=None, priority_logins=None
+    ):
         """
         Fetch comprehensive developer activity metrics for all organization members.
         
@@ -287,6 +841,9 @@ class DeveloperActivityFetcher:
             members: Optional list of member logins. If None, fetches all org members.
             days_back: Number of days to look back for activity (default: 28 to match Copilot metrics)
             save_to_json: Whether to save results to JSON file
+            backend: "search" or "graphql" (default: DEVELOPER_ACTIVITY_BACKEND)
+            priority_logins: Optional set of logins (e.g. Copilot seat holders)
+                whose searches go first
             
         Returns:
             List of developer activity records, one per user per day
@@ -304,97 +861,180 @@ class DeveloperActivityFetcher:
         
         logger.info(f"Fetching developer activity for {len(members)} members from {since_date.date()} to {until_date.date()}")
         
+        backend, organization_id = self._resolve_backend(backend)
+        logger.info(f"Using the {backend} backend for developer activity")
+        if backend == "graphql":
+            activity = self._graphql_activity(members, since_date, until_date, organization_id)
+        else:
+            activity = self._search_activity(members, since_date, until_date, set(priority_logins or ()))
+
         all_records = []
         current_time_str = current_time()
+
+        for member, metrics in activity:
+            record = self.build_activity_record(
+                member, metrics, since_date, until_date, days_back, current_time_str
+            )
+            all_records.append(record)
+            logger.debug(
+                f"Processed activity for {member}: {record['total_contributions']} total contributions",
+                extra=SAMPLED,
+            )
         
-        for member in members:
-            logger.info(f"Fetching activity for member: {member}")
-            
-            try:
-                # Get all metrics for this user
-                commit_metrics = self.get_user_commits(member, since_date, until_date)
-                pr_metrics = self.get_user_pull_requests(member, since_date, until_date)
-                issue_metrics = self.get_user_issues(member, since_date, until_date)
-                
-                # Calculate aggregate scores
-                total_contributions = (
-                    commit_metrics.get("commit_count", 0) +
-                    pr_metrics.get("prs_opened", 0) +
-                    pr_metrics.get("prs_merged", 0) +
-                    pr_metrics.get("prs_reviewed", 0) +
-                    issue_metrics.get("issues_opened", 0)
-                )
-                
-                code_review_activity = (
-                    pr_metrics.get("prs_reviewed", 0) +
-                    pr_metrics.get("pr_comments", 0)
-                )
-                
-                # Create record for this user (aggregated for the period)
-                record = {
-                    "user_login": member,
-                    "organization_slug": self.organization_slug,
-                    "slug_type": self.slug_type,
-                    "day": until_date.strftime("%Y-%m-%d"),
-                    "report_start_day": since_date.strftime("%Y-%m-%d"),
-                    "report_end_day": until_date.strftime("%Y-%m-%d"),
-                    "period_days": days_back,
-                    
-                    # Commit metrics
-                    "commit_count": commit_metrics.get("commit_count", 0),
-                    "repos_contributed": commit_metrics.get("repos_contributed", 0),
-                    
-                    # PR metrics
-                    "prs_opened": pr_metrics.get("prs_opened", 0),
-                    "prs_merged": pr_metrics.get("prs_merged", 0),
-                    "prs_reviewed": pr_metrics.get("prs_reviewed", 0),
-                    "pr_comments": pr_metrics.get("pr_comments", 0),
-                    "prs_closed": pr_metrics.get("prs_closed", 0),
-                    
-                    # Issue metrics  
-                    "issues_opened": issue_metrics.get("issues_opened", 0),
-                    "issues_closed": issue_metrics.get("issues_closed", 0),
-                    "issue_comments": issue_metrics.get("issue_comments", 0),
-                    
-                    # Aggregate metrics
-                    "total_contributions": total_contributions,
-                    "code_review_activity": code_review_activity,
-                    
-                    # Calculated rates (per day)
-                    "commits_per_day": round(commit_metrics.get("commit_count", 0) / days_back, 2),
-                    "prs_per_day": round(pr_metrics.get("prs_opened", 0) / days_back, 2),
-                    "reviews_per_day": round(pr_metrics.get("prs_reviewed", 0) / days_back, 2),
-                    
-                    # Metadata
-                    "last_updated_at": current_time_str,
-                    "utc_offset": self.utc_offset,
-                }
-                
-                # Generate unique hash
-                record["unique_hash"] = generate_unique_hash(
-                    record,
-                    key_properties=["organization_slug", "user_login", "report_start_day", "report_end_day"]
-                )
-                
-                all_records.append(record)
-                logger.info(f"Processed activity for {member}: {total_contributions} total contributions")
-                
-            except Exception as e:
-                logger.error(f"Error fetching activity for {member}: {e}")
-                continue
-        
+        # Unique hashes for the whole batch
+        key_scheme(DEVELOPER_ACTIVITY_INDEX).assign(all_records)
+
         # Save to JSON if requested
         if save_to_json and all_records:
-            from main import dict_save_to_json_file
             dict_save_to_json_file(
                 all_records,
-                f"{self.organization_slug}_developer_activity"
+                f"{self.organization_slug}_developer_activity",
+                artifact="developer_activity",
             )
         
         logger.info(f"Fetched developer activity for {len(all_records)} members")
         return all_records
 
 
+    def fetch_daily_activity_for_members(self, members=None, days_back=28, last_days=None, save_to_json=True):
+        """
+        Fetch per-day developer activity records (see DEVELOPER_ACTIVITY_MODE).
+
+        Args:
+            members: Optional list of member logins. If None, fetches all org members.
+            days_back: Days fetched for members without stored records
+            last_days: {login: last stored day}, see last_stored_days(); members
+                in it are fetched from that day on, at most MAX_DAYS_BACK days back
+            save_to_json: Whether to save results to JSON file
+
+        Returns:
+            List of developer activity records, one per user per day. Falls back
+            to fetch_developer_activity_for_members for standalone enterprises.
+        """
+        organization_id = None if self.is_standalone else self.get_organization_id()
+        if not organization_id:
+            logger.warning(
+                f"Per-day activity needs the organization id of {self.organization_slug}, "
+                "fetching period records instead"
+            )
+            return self.fetch_developer_activity_for_members(members, days_back, save_to_json)
+
+        if members is None:
+            members = self.get_organization_members()
+        if not members:
+            logger.warning("No members found for developer activity fetching")
+            return []
+
+        last_days = last_days or {}
+        today = datetime.now(timezone.utc).date()
+        window_start = today - timedelta(days=days_back - 1)
+        earliest = today - timedelta(days=MAX_DAYS_BACK - 1)
+        starts = {member: max(earliest, min(last_days.get(member, window_start), today)) for member in members}
+        truncated = sum(1 for member in members if member in last_days and last_days[member] < earliest)
+        if truncated:
+            logger.warning(
+                f"{truncated} members were last stored more than {MAX_DAYS_BACK} days ago, "
+                f"fetching them from {earliest} on"
+            )
+        logger.info(
+            f"Fetching per-day developer activity for {len(members)} members up to {today} "
+            f"({sum(1 for member in members if member in last_days)} incremental)"
+        )
+
+        # Merged PRs and closed issues are dated by their merge/close day, not
+        # the day they were opened, so they come from dated searches. Without
+        # them the re-fetched days would be stored with partial counts.
+        try:
+            closures = self.get_daily_closures(min(starts.values()), today)
+        except Exception as e:
+            logger.error(f"Error searching merged PRs and closed issues, per-day activity not updated: {e}")
+            return []
+
+        # Longer ranges are fetched in chunks, see DAILY_CHUNK_DAYS
+        until = datetime.now(timezone.utc)
+        chunks = {member: daily_chunks(starts[member], today, until) for member in members}
+        counts = {}
+        fetched_chunks = dict.fromkeys(members, 0)
+        batch_size = max(1, GRAPHQL_BATCH_SIZE)
+        for chunk in range(max(len(member_chunks) for member_chunks in chunks.values())):
+            chunk_members = [member for member in members if chunk < len(chunks[member])]
+
+            def alias_variables(member):
+                since, to = chunks[member][chunk]
+                return {"login": member, "from": since, "to": to}
+
+            for start in range(0, len(chunk_members), batch_size):
+                batch = chunk_members[start:start + batch_size]
+                try:
+                    users = self._query_aliased_users(
+                        batch,
+                        build_daily_contributions_query,
+                        {"organizationId": organization_id},
+                        alias_variables,
+                    )
+                except Exception as e:
+                    logger.error(f"Error fetching contributions for {len(batch)} members: {e}")
+                    continue
+                for member, user in users.items():
+                    self.fetch_remaining_pages(
+                        member, user, DAILY_CONNECTION_NODES, {"organizationId": organization_id, **alias_variables(member)}
+                    )
+                    # The closures are added once, with the first chunk
+                    counts[member] = daily_contribution_counts(
+                        user, closures.get(member) if chunk == 0 else None, counts.get(member)
+                    )
+                    fetched_chunks[member] += 1
+
+        all_records = []
+        current_time_str = current_time()
+        for member in members:
+            # A member with a failed chunk would be stored with zeros for its days
+            if fetched_chunks[member] < len(chunks[member]):
+                if fetched_chunks[member]:
+                    logger.error(f"Contributions of {member} only partly fetched, not updated")
+                continue
+            all_records.extend(self.build_daily_records(member, counts[member], starts[member], today, current_time_str))
+
+        key_scheme(DEVELOPER_ACTIVITY_INDEX).assign(all_records)
+
+        if save_to_json and all_records:
+            dict_save_to_json_file(
+                all_records,
+                f"{self.organization_slug}_developer_activity",
+                artifact="developer_activity",
+            )
+
+        logger.info(f"Fetched {len(all_records)} per-day developer activity records for {len(members)} members")
+        return all_records
+
+    def build_daily_records(self, member, counts, first_day, last_day, last_updated_at):
+        """One record per day of [first_day, last_day], days without contributions included."""
+        records = []
+        day = first_day
+        while day <= last_day:
+            day_counts = counts.get(day.isoformat(), {})
+            metrics = (
+                {
+                    "commit_count": day_counts.get("commit_count", 0),
+                    "repos_contributed": len(day_counts.get("repos", ())),
+                },
+                {
+                    "prs_opened": day_counts.get("prs_opened", 0),
+                    "prs_merged": day_counts.get("prs_merged", 0),
+                    "prs_reviewed": day_counts.get("prs_reviewed", 0),
+                },
+                {
+                    "issues_opened": day_counts.get("issues_opened", 0),
+                    "issues_closed": day_counts.get("issues_closed", 0),
+                },
+            )
+            record = self.build_activity_record(member, metrics, day, day, 1, last_updated_at)
+            record["calendar_contributions"] = day_counts.get("calendar_contributions", 0)
+            records.append(record)
+            day += timedelta(days=1)
+        return records
+
+
 def fetch_developer_activity(token, organization_slug, is_standalone=False, days_back=28):
     """
     Convenience function to fetch developer activity metrics.
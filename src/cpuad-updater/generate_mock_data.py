@@ -12,12 +12,11 @@ Usage:
 This will populate Elasticsearch with realistic data patterns.
 """
 
-import json
 import random
-import hashlib
 import os
 from datetime import datetime, timedelta
-from elasticsearch import Elasticsearch
+
+from doc_ids import KeyScheme, key_scheme
 
 # Configuration
 ORGANIZATION_SLUG = "acme-corp"
@@ -32,6 +31,7 @@ COPILOT_ADOPTION_DAYS_AGO = 70  # 10 weeks ago - allows seeing full 8-week ramp-
 ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
 INDEX_USER_METRICS = os.getenv("INDEX_USER_METRICS", "copilot_user_metrics")
 INDEX_DEVELOPER_ACTIVITY = os.getenv("INDEX_DEVELOPER_ACTIVITY", "developer_activity")
+INDEX_USER_METRICS_FACTS = os.getenv("INDEX_USER_METRICS_FACTS", "copilot_user_metrics_facts")
 
 # Developer personas with different productivity profiles
 # Based on GitHub's research:
@@ -102,14 +102,9 @@ MODELS = ["gpt-4o", "gpt-4o-mini", "claude-3.5-sonnet", "o1-preview"]
 FEATURES = ["code_completion", "chat_panel_ask_mode", "chat_panel_agent_mode", "inline_chat", "agent_edit"]
 
 
-def generate_unique_hash(data, key_properties):
-    """Generate a unique hash based on specified properties."""
-    key_elements = []
-    for key_property in key_properties:
-        value = data.get(key_property)
-        key_elements.append(str(value) if value is not None else "")
-    key_string = "-".join(key_elements)
-    return hashlib.sha256(key_string.encode()).hexdigest()
+USER_METRICS_KEY = key_scheme(INDEX_USER_METRICS)
+# Mock developer activity is generated per day instead of per report period
+DAILY_ACTIVITY_KEY = KeyScheme(["organization_slug", "user_login", "day"])
 
 
 def generate_developer_name(index):
@@ -321,6 +316,7 @@ def generate_copilot_metrics_for_day(developer, date, copilot_adoption_date):
         "organization_slug": ORGANIZATION_SLUG,
         "slug_type": SLUG_TYPE,
         "last_updated_at": datetime.now().isoformat(),
+        "@timestamp": datetime.now().isoformat(),
         "utc_offset": "+00:00",
         "user_initiated_interaction_count": interactions,
         "code_generation_activity_count": code_gen,
@@ -340,9 +336,7 @@ def generate_copilot_metrics_for_day(developer, date, copilot_adoption_date):
         "top_feature": "code_completion",
     }
     
-    record["unique_hash"] = generate_unique_hash(
-        record, ["organization_slug", "user_login", "day"]
-    )
+    record["unique_hash"] = USER_METRICS_KEY.id(record)
     
     return record
 
@@ -400,6 +394,7 @@ def generate_developer_activity_for_day(developer, date, copilot_adoption_date):
         "organization_slug": ORGANIZATION_SLUG,
         "slug_type": SLUG_TYPE,
         "last_updated_at": datetime.now().isoformat(),
+        "@timestamp": datetime.now().isoformat(),
         "utc_offset": "+00:00",
         "commit_count": commits,
         "repos_contributed": repos_contributed,
@@ -422,9 +417,7 @@ def generate_developer_activity_for_day(developer, date, copilot_adoption_date):
         "seniority": developer["seniority"],
     }
     
-    record["unique_hash"] = generate_unique_hash(
-        record, ["organization_slug", "user_login", "day"]
-    )
+    record["unique_hash"] = DAILY_ACTIVITY_KEY.id(record)
     
     return record
 
@@ -491,111 +484,77 @@ def generate_all_mock_data():
 
 
 def load_to_elasticsearch(copilot_metrics, developer_activity):
-    """Load generated data into Elasticsearch using requests (HTTP API)."""
-    import requests
+    """Load generated data into Elasticsearch with the adaptive bulk writer."""
+    from bulk_writer import BulkWriter
+    from es_client import get_es_client
+    from metrics_facts import fact_documents
+    from index_lifecycle import (
+        drop_partitioned_index,
+        ensure_partitioned_index,
+        write_index_for,
+    )
     
     print(f"\nConnecting to Elasticsearch at {ELASTICSEARCH_URL}...")
     
+    es = get_es_client()
+    
     # Check connection
     try:
-        response = requests.get(f"{ELASTICSEARCH_URL}/_cluster/health")
-        if response.status_code != 200:
-            print(f"ERROR: Cannot connect to Elasticsearch: {response.text}")
-            return False
-        print("Connected successfully!")
-    except requests.exceptions.ConnectionError as e:
+        health = es.cluster.health()
+        print(f"Connected successfully! Cluster status: {health['status']}")
+    except Exception as e:
         print(f"ERROR: Cannot connect to Elasticsearch: {e}")
         return False
     
-    headers = {"Content-Type": "application/json"}
+    # Delete and recreate indexes: both are aliases over monthly partitions
+    def reset_partitioned_index(index_name):
+        """Delete existing partitions and reinstall the index template."""
+        drop_partitioned_index(index_name, es=es)
+        ensure_partitioned_index(index_name, es=es)
+        print(f"  Reset partitioned index: {index_name}")
     
-    # Delete and recreate indexes with proper mappings
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    def ensure_index_with_mapping(index_name, mapping_file):
-        """Delete index if exists and create with proper mapping."""
-        mapping_path = os.path.join(script_dir, "mapping", mapping_file)
-        
-        # Delete existing index
-        delete_response = requests.delete(f"{ELASTICSEARCH_URL}/{index_name}")
-        if delete_response.status_code == 200:
-            print(f"  Deleted existing index: {index_name}")
-        
-        # Create with mapping
-        if os.path.exists(mapping_path):
-            with open(mapping_path, 'r') as f:
-                mapping = f.read()
-            create_response = requests.put(
-                f"{ELASTICSEARCH_URL}/{index_name}",
-                headers=headers,
-                data=mapping
+    print("\nSetting up indexes with proper mappings...")
+    reset_partitioned_index(INDEX_USER_METRICS)
+    reset_partitioned_index(INDEX_DEVELOPER_ACTIVITY)
+    reset_partitioned_index(INDEX_USER_METRICS_FACTS)
+    
+    def bulk_index(writer, index_name, records):
+        """Queue records for `index_name`; the writer batches and retries them."""
+        for record in records:
+            writer.add(
+                {
+                    "_index": write_index_for(index_name, record, es=es),
+                    "_id": record["unique_hash"],
+                    "_source": record,
+                },
+                stats_key=index_name,
             )
-            if create_response.status_code in [200, 201]:
-                print(f"  Created index with mapping: {index_name}")
-            else:
-                print(f"  Warning: Could not create index {index_name}: {create_response.text[:100]}")
-        else:
-            print(f"  Warning: Mapping file not found: {mapping_path}")
     
-    print("\nSetting up indexes with proper mappings...")
-    ensure_index_with_mapping(INDEX_USER_METRICS, "copilot_user_metrics_mapping.json")
-    ensure_index_with_mapping(INDEX_DEVELOPER_ACTIVITY, "developer_activity_mapping.json")
-    
-    def bulk_index(index_name, records, batch_size=500):
-        """Bulk index records using the _bulk API."""
-        total = len(records)
-        indexed = 0
-        errors = 0
-        
-        for i in range(0, total, batch_size):
-            batch = records[i:i + batch_size]
-            bulk_body = ""
-            
-            for record in batch:
-                # Action line
-                action = json.dumps({"index": {"_index": index_name, "_id": record["unique_hash"]}})
-                # Document line
-                doc = json.dumps(record)
-                bulk_body += f"{action}\n{doc}\n"
-            
-            try:
-                response = requests.post(
-                    f"{ELASTICSEARCH_URL}/_bulk",
-                    headers=headers,
-                    data=bulk_body
-                )
-                
-                if response.status_code in [200, 201]:
-                    result = response.json()
-                    batch_errors = sum(1 for item in result.get("items", []) if item.get("index", {}).get("error"))
-                    errors += batch_errors
-                    indexed += len(batch) - batch_errors
-                else:
-                    print(f"  Bulk request failed: {response.status_code} - {response.text[:200]}")
-                    errors += len(batch)
-                    
-            except Exception as e:
-                print(f"  Error in bulk request: {e}")
-                errors += len(batch)
-            
-            print(f"  Progress: {min(i + batch_size, total)}/{total} records")
+    with BulkWriter(es) as writer:
+        print(f"\nLoading {len(copilot_metrics)} Copilot metrics records...")
+        bulk_index(writer, INDEX_USER_METRICS, copilot_metrics)
         
-        return indexed, errors
-    
-    # Load Copilot metrics
-    print(f"\nLoading {len(copilot_metrics)} Copilot metrics records...")
-    indexed, errors = bulk_index(INDEX_USER_METRICS, copilot_metrics)
-    print(f"  Completed: {indexed} indexed, {errors} errors")
+        print(f"\nLoading {len(developer_activity)} developer activity records...")
+        bulk_index(writer, INDEX_DEVELOPER_ACTIVITY, developer_activity)
+
+        print("\nLoading user metrics facts...")
+        bulk_index(writer, INDEX_USER_METRICS_FACTS, [
+            fact for record in copilot_metrics for fact in fact_documents(record)
+        ])
     
-    # Load developer activity
-    print(f"\nLoading {len(developer_activity)} developer activity records...")
-    indexed, errors = bulk_index(INDEX_DEVELOPER_ACTIVITY, developer_activity)
-    print(f"  Completed: {indexed} indexed, {errors} errors")
+    for index_name, stats in writer.stats().items():
+        print(
+            f"  {index_name}: {stats['indexed']} indexed, {stats['failed']} errors, "
+            f"{stats['retried']} retried, {stats['docs_per_second']} docs/s"
+        )
     
     # Refresh indices
     print("\nRefreshing indices...")
-    requests.post(f"{ELASTICSEARCH_URL}/{INDEX_USER_METRICS}/_refresh")
-    requests.post(f"{ELASTICSEARCH_URL}/{INDEX_DEVELOPER_ACTIVITY}/_refresh")
+    es.indices.refresh(index=f"{INDEX_USER_METRICS},{INDEX_DEVELOPER_ACTIVITY},{INDEX_USER_METRICS_FACTS}")
+
+    print("\nBuilding the user metrics rollup...")
+    from metrics_rollup import update_metrics_rollup
+    update_metrics_rollup(es=es, full_rebuild=True)
     
     print("\n✅ All data loaded successfully!")
     return True
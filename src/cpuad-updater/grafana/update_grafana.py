@@ -278,10 +278,12 @@ def add_grafana_data_sources(grafana_token, max_retries=3, retry_interval=5):
     headers = get_grafana_headers(grafana_token)
 
     # Data sources to add
+    # user metrics, user metrics facts, usage breakdown and developer activity are aliases over monthly
+    # partitions (see index_lifecycle.py), so Grafana always queries the alias
     data_sources = [
         {
             "name": "elasticsearch-breakdown",
-            "index": "copilot_usage_breakdown",
+            "index": os.getenv("INDEX_NAME_BREAKDOWN", "copilot_usage_breakdown"),
         },
         {
             "name": "elasticsearch-breakdown-chat",
@@ -301,12 +303,20 @@ def add_grafana_data_sources(grafana_token, max_retries=3, retry_interval=5):
         },
         {
             "name": "elasticsearch-user-metrics",
-            "index": "copilot_user_metrics",
+            "index": os.getenv("INDEX_USER_METRICS", "copilot_user_metrics"),
         },
         {
             "name": "elasticsearch-user-metrics-top-by-day",
             "index": os.getenv("INDEX_USER_METRICS_TOP_BY_DAY", "copilot_user_metrics_top_by_day"),
         },
+        {
+            "name": "elasticsearch-user-metrics-rollup",
+            "index": os.getenv("INDEX_USER_METRICS_ROLLUP", "copilot_user_metrics_rollup"),
+        },
+        {
+            "name": "elasticsearch-user-metrics-facts",
+            "index": os.getenv("INDEX_USER_METRICS_FACTS", "copilot_user_metrics_facts"),
+        },
         {
             "name": "elasticsearch-user-metrics-summary",
             "index": "copilot_user_metrics_summary",
@@ -0,0 +1,221 @@
+"""
+Time-partitioned indices behind aliases, managed by index templates and ILM.
+
+The high-volume indices (user metrics, usage breakdown, developer activity)
+are stored as one concrete index per month:
+
+    copilot_user_metrics               <- alias, used for every read
+      copilot_user_metrics-2025.03     <- concrete monthly partitions
+      copilot_user_metrics-2025.04
+
+Each partition is created from a composable index template built from
+mapping/<alias>_mapping.json. The template attaches the read alias and an ILM
+policy that force-merges a month once it can no longer receive updates and
+optionally deletes it after a retention period.
+
+Documents are written with their `unique_hash` as id and updated in place on
+every run (the GitHub reports cover the last 28 days), so the partition a
+document lives in is derived from its `day` instead of using a rollover write
+alias. The same document therefore always lands in the same partition.
+
+With INDEX_MAPPING_VERSION=v2 the partitions are named <alias>-v2-YYYY.MM and
+come from mapping/v2/. If a concrete index already exists under the alias name
+(deployments created before partitioning), it is used as-is until it is
+migrated with reindex_mappings.py.
+"""
+
+import os
+import re
+import logging
+import threading
+from datetime import datetime, timezone
+
+from es_client import (
+    MAPPING_VERSION,
+    get_es_client,
+    ensure_index,
+    forget_index,
+    load_mapping,
+)
+
+logger = logging.getLogger(__name__)
+
+ILM_POLICY_NAME = os.getenv("ILM_POLICY_NAME", "cpuad-monthly-partitions")
+# Partitions are keyed by month and updated for up to 28 days after the month ends
+ILM_FORCE_MERGE_AFTER = os.getenv("ILM_FORCE_MERGE_AFTER", "62d")
+# Empty keeps partitions forever
+ILM_DELETE_AFTER = os.getenv("ILM_DELETE_AFTER", "")
+
+_lock = threading.Lock()
+# alias -> True when partitioned, False when a legacy concrete index is in place
+_partitioned = {}
+
+
+def partition_suffix(day=None):
+    """Return the monthly suffix (YYYY.MM) for a YYYY-MM-DD day string."""
+    if day:
+        return f"{day[:4]}.{day[5:7]}"
+    return datetime.now(timezone.utc).strftime("%Y.%m")
+
+
+def partition_prefix(alias, version=None):
+    version = version or MAPPING_VERSION
+    return f"{alias}-" if version == "v1" else f"{alias}-{version}-"
+
+
+def partition_index_name(alias, day=None, version=None):
+    return f"{partition_prefix(alias, version)}{partition_suffix(day)}"
+
+
+def template_name(alias, version=None):
+    version = version or MAPPING_VERSION
+    return f"{alias}-template" if version == "v1" else f"{alias}-{version}-template"
+
+
+def build_ilm_policy():
+    phases = {
+        "hot": {
+            "min_age": "0ms",
+            "actions": {"set_priority": {"priority": 100}},
+        },
+        "warm": {
+            "min_age": ILM_FORCE_MERGE_AFTER,
+            "actions": {
+                "forcemerge": {"max_num_segments": 1},
+                "set_priority": {"priority": 50},
+            },
+        },
+    }
+    if ILM_DELETE_AFTER:
+        phases["delete"] = {
+            "min_age": ILM_DELETE_AFTER,
+            "actions": {"delete": {}},
+        }
+    return {"phases": phases}
+
+
+def build_index_template(alias, mapping, policy_name=ILM_POLICY_NAME, version=None):
+    version = version or MAPPING_VERSION
+    settings = dict(mapping.get("settings", {}))
+    settings["index.lifecycle.name"] = policy_name
+    return {
+        "index_patterns": [f"{partition_prefix(alias, version)}*"],
+        # <alias>-* also matches <alias>-v2-*, the newer version has to win
+        "priority": 100 * int(version.lstrip("v")),
+        "template": {
+            "settings": settings,
+            "mappings": mapping.get("mappings", {}),
+            "aliases": {alias: {}},
+        },
+        "meta": {"managed_by": "cpuad-updater", "alias": alias, "mapping_version": version},
+    }
+
+
+def ensure_ilm_policy(es=None):
+    es = es or get_es_client()
+    es.ilm.put_lifecycle(name=ILM_POLICY_NAME, policy=build_ilm_policy())
+    logger.info(f"ILM policy is up to date: {ILM_POLICY_NAME}")
+
+
+def install_index_template(alias, version=None, es=None):
+    es = es or get_es_client()
+    ensure_ilm_policy(es)
+    template = build_index_template(
+        alias, load_mapping(alias, version), version=version
+    )
+    es.indices.put_index_template(name=template_name(alias, version), **template)
+    logger.info(f"Index template is up to date: {template_name(alias, version)}")
+
+
+def ensure_partitioned_index(alias, es=None):
+    """
+    Install the ILM policy and index template for `alias`, once per process.
+
+    Returns True when writes should go to monthly partitions, False when a
+    legacy concrete index named `alias` is still in place.
+    """
+    if alias in _partitioned:
+        return _partitioned[alias]
+
+    es = es or get_es_client()
+    with _lock:
+        if alias in _partitioned:
+            return _partitioned[alias]
+
+        if es.indices.exists(index=alias) and not es.indices.exists_alias(name=alias):
+            logger.warning(
+                f"Index {alias} is a concrete index, not an alias. Writing to it directly; "
+                f"run reindex_mappings.py to migrate it to monthly partitions."
+            )
+            _partitioned[alias] = False
+            return False
+
+        install_index_template(alias, es=es)
+        _partitioned[alias] = True
+        return True
+
+
+def ensure_partition(alias, day=None, es=None, version=None):
+    """Create the monthly partition of `alias` for `day` if needed and return its name."""
+    index_name = partition_index_name(alias, day, version)
+    suffix = partition_suffix(day)
+    month_start = datetime.strptime(suffix, "%Y.%m").replace(tzinfo=timezone.utc)
+    ensure_index(
+        index_name,
+        body={
+            # The template provides mappings, aliases and the ILM policy; age the
+            # partition from the month it holds, not from when it was created
+            "settings": {
+                "index.lifecycle.origination_date": int(month_start.timestamp() * 1000)
+            }
+        },
+        es=es,
+    )
+    return index_name
+
+
+def write_index_for(alias, doc, es=None):
+    """Return the concrete index a document for `alias` should be written to."""
+    if not _partitioned.get(alias):
+        return alias
+    return ensure_partition(alias, doc.get("day"), es=es)
+
+
+def list_partitions(alias, es=None, version=None):
+    """The monthly partitions of `alias` of one mapping version (default MAPPING_VERSION)."""
+    es = es or get_es_client()
+    prefix = partition_prefix(alias, version)
+    # <alias>-* also matches the partitions of other versions (<alias>-v2-YYYY.MM)
+    pattern = re.compile(re.escape(prefix) + r"\d{4}\.\d{2}")
+    return sorted(
+        index
+        for index in es.indices.get(index=f"{prefix}*", expand_wildcards="open,closed")
+        if pattern.fullmatch(index)
+    )
+
+
+def drop_partitioned_index(alias, es=None):
+    """Delete the partitions of `alias` of MAPPING_VERSION (and a legacy concrete index of that name)."""
+    es = es or get_es_client()
+    names = list_partitions(alias, es=es)
+    if es.indices.exists(index=alias) and not es.indices.exists_alias(name=alias):
+        names.append(alias)
+    for name in names:
+        es.indices.delete(index=name)
+        forget_index(name)
+        logger.info(f"Deleted index: {name}")
+    with _lock:
+        _partitioned.pop(alias, None)
+
+
+if __name__ == "__main__":
+    from es_client import wait_for_elasticsearch
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - [%(levelname)s] - %(message)s")
+    wait_for_elasticsearch()
+    for alias in (
+        os.getenv("INDEX_USER_METRICS", "copilot_user_metrics"),
+        os.getenv("INDEX_NAME_BREAKDOWN", "copilot_usage_breakdown"),
+        os.getenv("INDEX_DEVELOPER_ACTIVITY", "developer_activity"),
+    ):
+        ensure_partitioned_index(alias)
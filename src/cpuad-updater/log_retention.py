@@ -0,0 +1,217 @@
+"""
+Retention for the LOG_PATH/<date>/ tree of logs and snapshots.
+
+Every day the collector starts a new LOG_PATH/<date>/ folder with its log file
+and the snapshots of that day (see snapshots.py), and nothing removed them. The
+retention pass:
+
+1. compacts every finished day folder (older than today and without a log file
+   that is still open) into LOG_PATH/archive/<date>.zip, storing snapshots
+   that are already compressed as they are and deflating the rest, with a
+   LOG_PATH/archive/<date>.index.json listing the files inside (name, size,
+   compressed size and modification time),
+2. deletes archives older than LOG_RETENTION_DAYS, when it is set,
+3. deletes the oldest archives until all of them fit in LOG_RETENTION_MAX_MB.
+
+The collector runs it on a background thread after every collection cycle
+(start_retention); run this script to apply it by hand. rebuild_from_snapshots.py
+reads the archived days as well as the folders.
+
+Configuration:
+
+- LOG_RETENTION_DAYS: days of archives to keep, 0 keeps them forever (default 0);
+  deleted days can no longer be replayed by rebuild_from_snapshots.py,
+- LOG_RETENTION_MAX_MB: size budget of the archives, 0 for no budget (default 0),
+- LOG_RETENTION_ENABLED: set to false to keep the day folders as they are.
+"""
+
+import os
+import json
+import shutil
+import logging
+import zipfile
+import argparse
+import threading
+from datetime import date, datetime, timedelta
+
+from log_utils import open_log_files
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - [%(levelname)s] - %(message)s")
+logger = logging.getLogger(__name__)
+
+LOG_PATH = os.getenv("LOG_PATH", "logs")
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "0"))
+LOG_RETENTION_MAX_MB = float(os.getenv("LOG_RETENTION_MAX_MB", "0"))
+LOG_RETENTION_ENABLED = os.getenv("LOG_RETENTION_ENABLED", "true").lower() == "true"
+
+ARCHIVE_DIR = "archive"
+# Already compressed, deflating them again only costs CPU
+STORED_SUFFIXES = (".gz", ".zst")
+
+
+def _parse_day(name):
+    try:
+        return date.fromisoformat(name)
+    except ValueError:
+        return None
+
+
+def archive_dir(log_path):
+    return os.path.join(log_path, ARCHIVE_DIR)
+
+
+def archive_path(log_path, day):
+    return os.path.join(archive_dir(log_path), f"{day.isoformat()}.zip")
+
+
+def day_folders(log_path):
+    """(date, path) of the day folders under `log_path`, oldest first."""
+    if not os.path.isdir(log_path):
+        return []
+    folders = []
+    for name in os.listdir(log_path):
+        day = _parse_day(name)
+        path = os.path.join(log_path, name)
+        if day is not None and os.path.isdir(path):
+            folders.append((day, path))
+    return sorted(folders)
+
+
+def archives(log_path):
+    """(date, path) of the day archives under `log_path`, oldest first."""
+    directory = archive_dir(log_path)
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for name in os.listdir(directory):
+        if name.endswith(".zip"):
+            day = _parse_day(name[: -len(".zip")])
+            if day is not None:
+                found.append((day, os.path.join(directory, name)))
+    return sorted(found)
+
+
+def finished_folders(log_path, today=None):
+    """Day folders that are no longer written to: older than today, no open log file."""
+    today = today or date.today()
+    open_dirs = {os.path.dirname(path) for path in open_log_files()}
+    return [
+        (day, path)
+        for day, path in day_folders(log_path)
+        if day < today and os.path.abspath(path) not in open_dirs
+    ]
+
+
+def compact_day(log_path, day, folder):
+    """Archive one day folder into <day>.zip plus <day>.index.json and remove it."""
+    os.makedirs(archive_dir(log_path), exist_ok=True)
+    target = archive_path(log_path, day)
+    tmp_target = target + ".tmp"
+    entries = []
+    # A day compacted before (folder recreated by a late snapshot) keeps its files
+    existing = zipfile.ZipFile(target) if os.path.exists(target) else None
+    try:
+        with zipfile.ZipFile(tmp_target, "w") as archive:
+            names = set()
+            for root, _, files in os.walk(folder):
+                for file_name in sorted(files):
+                    path = os.path.join(root, file_name)
+                    name = os.path.relpath(path, folder)
+                    compression = zipfile.ZIP_STORED if name.endswith(STORED_SUFFIXES) else zipfile.ZIP_DEFLATED
+                    archive.write(path, name, compress_type=compression)
+                    names.add(name)
+            if existing is not None:
+                for info in existing.infolist():
+                    if info.filename not in names:
+                        archive.writestr(info, existing.read(info.filename), compress_type=info.compress_type)
+            for info in archive.infolist():
+                entries.append(
+                    {
+                        "name": info.filename,
+                        "size": info.file_size,
+                        "compressed_size": info.compress_size,
+                        "modified": datetime(*info.date_time).isoformat(),
+                    }
+                )
+    finally:
+        if existing is not None:
+            existing.close()
+    os.replace(tmp_target, target)
+
+    index = {"day": day.isoformat(), "archive": os.path.basename(target), "files": entries}
+    with open(os.path.join(archive_dir(log_path), f"{day.isoformat()}.index.json"), "w", encoding="utf8") as f:
+        json.dump(index, f, indent=2)
+    shutil.rmtree(folder)
+    return target
+
+
+def delete_archive(path):
+    os.remove(path)
+    index_path = path[: -len(".zip")] + ".index.json"
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+
+def prune_archives(log_path, retention_days=LOG_RETENTION_DAYS, max_mb=LOG_RETENTION_MAX_MB, today=None):
+    """Delete archives past the age and size budget; returns how many were deleted."""
+    today = today or date.today()
+    deleted = 0
+    remaining = []
+    for day, path in archives(log_path):
+        if retention_days and day < today - timedelta(days=retention_days):
+            delete_archive(path)
+            deleted += 1
+        else:
+            remaining.append((day, path))
+
+    if max_mb:
+        budget = max_mb * 1024 * 1024
+        total = sum(os.path.getsize(path) for _, path in remaining)
+        # Oldest first, never the newest archive
+        while total > budget and len(remaining) > 1:
+            _, path = remaining.pop(0)
+            total -= os.path.getsize(path)
+            delete_archive(path)
+            deleted += 1
+    return deleted
+
+
+def run_retention(log_path=LOG_PATH, retention_days=LOG_RETENTION_DAYS, max_mb=LOG_RETENTION_MAX_MB):
+    """Compact the finished day folders and prune the archives."""
+    compacted = 0
+    for day, folder in finished_folders(log_path):
+        try:
+            compact_day(log_path, day, folder)
+            compacted += 1
+        except Exception as e:
+            logger.error(f"Failed to compact {folder}: {e}")
+    deleted = prune_archives(log_path, retention_days, max_mb)
+    if compacted or deleted:
+        logger.info(f"Log retention: compacted {compacted} day folders, deleted {deleted} archives in {log_path}")
+    return compacted, deleted
+
+
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def start_retention(log_path=LOG_PATH):
+    """Run the retention pass on a background thread, unless one is still running."""
+    global _thread
+    if not LOG_RETENTION_ENABLED:
+        return None
+    with _thread_lock:
+        if _thread is not None and _thread.is_alive():
+            return _thread
+        _thread = threading.Thread(target=run_retention, args=(log_path,), name="log-retention", daemon=True)
+        _thread.start()
+        return _thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact finished log/snapshot day folders and prune old archives")
+    parser.add_argument("--log-path", default=LOG_PATH)
+    parser.add_argument("--retention-days", type=int, default=LOG_RETENTION_DAYS)
+    parser.add_argument("--max-mb", type=float, default=LOG_RETENTION_MAX_MB)
+    args = parser.parse_args()
+    run_retention(args.log_path, args.retention_days, args.max_mb)
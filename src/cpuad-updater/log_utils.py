@@ -1,5 +1,9 @@
 import os
+import queue
+import atexit
 import logging
+import threading
+import logging.handlers
 from datetime import datetime
 
 
@@ -9,36 +13,110 @@ def current_time():
 
 """
 Log utilities
+
+configure_logger() routes every logger of the process (main's and the
+logging.getLogger(__name__) ones of the other modules) through a QueueHandler
+on the root logger. A QueueListener thread writes the records to the console
+and to LOG_PATH/<date>/<date>.log, so callers never wait on file or terminal
+I/O. The handlers are set up on the first call only; later calls return the
+same logger.
+
+- LOG_LEVEL: level of the collector's logs (default INFO),
+- LOG_SAMPLE_EVERY: of the per-document records logged with extra=SAMPLED,
+  keep one in every N (default 100, 1 keeps all, 0 drops them),
+- LOG_LEVEL_ELASTICSEARCH: level of the Elasticsearch client (default WARNING).
 """
 log_format = "%(asctime)s - [%(levelname)s] - %(message)s"
 logging.basicConfig(level=logging.INFO, format=log_format)
 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+# The Elasticsearch client logs every request at INFO
+LOG_LEVEL_ELASTICSEARCH = os.getenv("LOG_LEVEL_ELASTICSEARCH", "WARNING").upper()
 
-def configure_logger(log_path="logs", with_date_folder=True):
+# Pass as extra= for per-document records that SamplingFilter thins out
+SAMPLED = {"sampled": True}
+
+_listener = None
+_setup_lock = threading.Lock()
 
-    if with_date_folder:
-        log_path = os.path.join(log_path, current_time()[:10])
 
-    # Get whether to enable debug
-    debug = True
+class SamplingFilter(logging.Filter):
+    """Keep one in every `every` records marked with extra=SAMPLED; others pass."""
 
-    if not os.path.exists(log_path):
-        os.makedirs(log_path)
+    def __init__(self, every=LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = every
+        self._seen = 0
+        self._lock = threading.Lock()
 
-    log_file_name = f"{log_path}/{datetime.now().strftime('%Y-%m-%d')}.log"
-    file_handler = logging.FileHandler(log_file_name, mode="a")
-    file_handler.setLevel(logging.INFO)
-    file_formatter = logging.Formatter(log_format)
-    file_handler.setFormatter(file_formatter)
+    def filter(self, record):
+        if not getattr(record, "sampled", False):
+            return True
+        if self.every <= 0:
+            return False
+        with self._lock:
+            self._seen += 1
+            return (self._seen - 1) % self.every == 0
+
+
+def configure_logger(log_path="logs", with_date_folder=True):
+    global _listener
 
     logger = logging.getLogger(__name__)
-    logger.setLevel(logging.INFO if not debug else logging.DEBUG)
-    # logger.setLevel(logging.INFO)
-    logger.addHandler(file_handler)
+    with _setup_lock:
+        if _listener is not None:
+            return logger
+
+        if with_date_folder:
+            log_path = os.path.join(log_path, current_time()[:10])
+
+        if not os.path.exists(log_path):
+            os.makedirs(log_path)
+
+        formatter = logging.Formatter(log_format)
+        log_file_name = f"{log_path}/{datetime.now().strftime('%Y-%m-%d')}.log"
+        file_handler = logging.FileHandler(log_file_name, mode="a")
+        file_handler.setFormatter(formatter)
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter())
+
+        # Replace the console handler of logging.basicConfig, so each record is
+        # formatted and written exactly once, by the listener thread
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(LOG_LEVEL)
+        logging.getLogger("elastic_transport").setLevel(LOG_LEVEL_ELASTICSEARCH)
+        logger.setLevel(logging.NOTSET)
+
+        _listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler)
+        _listener.start()
+        atexit.register(_listener.stop)
 
     return logger
 
 
+def open_log_files():
+    """Absolute paths of the files that logging currently writes to."""
+    handlers = list(_listener.handlers) if _listener is not None else []
+    loggers = [logging.getLogger()] + [
+        entry for entry in logging.Logger.manager.loggerDict.values() if isinstance(entry, logging.Logger)
+    ]
+    for entry in loggers:
+        handlers.extend(entry.handlers)
+    return {
+        os.path.abspath(handler.baseFilename)
+        for handler in handlers
+        if isinstance(handler, logging.FileHandler)
+    }
+
+
 if __name__ == "__main__":
     logger = configure_logger()
     logger.info("test")
@@ -0,0 +1,155 @@
+"""
+Flat per-dimension fact index for the user metrics breakdowns.
+
+Source index: copilot_user_metrics (one doc per user/day, totals_by_* arrays)
+Dest index:   copilot_user_metrics_facts (one doc per user/day/dimension values)
+
+Each entry of the totals_by_ide, totals_by_feature, totals_by_language_feature,
+totals_by_language_model and totals_by_model_feature arrays becomes a small
+document of its own, with `dimension_kind` naming the array and the values in
+plain keyword fields (ide, feature, language, model). Breakdowns by language,
+model or IDE are then ordinary terms aggregations, filtered on dimension_kind,
+instead of nested aggregations over hidden sub-documents.
+
+The index is partitioned by month like the user metrics (see
+index_lifecycle.py). Facts are written next to the user metrics on every
+ingest; run this script (with --full for the whole history) to backfill them
+from copilot_user_metrics with the sliced parallel scan.
+"""
+
+import os
+import argparse
+import logging
+
+from bulk_writer import BulkWriter
+from doc_ids import key_scheme
+from es_client import get_es_client
+from index_lifecycle import ensure_partitioned_index, write_index_for
+from parallel_scan import sliced_scan
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - [%(levelname)s] - %(message)s")
+logger = logging.getLogger(__name__)
+
+SOURCE_INDEX = os.getenv("INDEX_USER_METRICS", "copilot_user_metrics")
+FACTS_INDEX = os.getenv("INDEX_USER_METRICS_FACTS", "copilot_user_metrics_facts")
+
+# dimension_kind -> (totals_by_* array, dimension fields of its entries)
+FACT_DIMENSIONS = {
+    "ide": ("totals_by_ide", ("ide",)),
+    "feature": ("totals_by_feature", ("feature",)),
+    "language_feature": ("totals_by_language_feature", ("language", "feature")),
+    "language_model": ("totals_by_language_model", ("language", "model")),
+    "model_feature": ("totals_by_model_feature", ("model", "feature")),
+}
+COUNTER_FIELDS = (
+    "user_initiated_interaction_count",
+    "code_generation_activity_count",
+    "code_acceptance_activity_count",
+    "loc_suggested_to_add_sum",
+    "loc_suggested_to_delete_sum",
+    "loc_added_sum",
+    "loc_deleted_sum",
+)
+
+
+def fact_documents(record):
+    """Fact docs for one user metrics record (one per totals_by_* entry)."""
+    day = record.get("day")
+    user_login = record.get("user_login")
+    if not day or not user_login:
+        return []
+
+    base = {
+        "organization_slug": record.get("organization_slug"),
+        "slug_type": record.get("slug_type"),
+        "user_login": user_login,
+        "day": day,
+        "report_start_day": record.get("report_start_day"),
+        "report_end_day": record.get("report_end_day"),
+    }
+    documents = []
+    for kind, (array_field, dimension_fields) in FACT_DIMENSIONS.items():
+        for entry in record.get(array_field) or []:
+            document = {**base, "dimension_kind": kind}
+            for field in dimension_fields:
+                document[field] = entry.get(field) or "unknown"
+            for field in COUNTER_FIELDS:
+                if field in entry:
+                    document[field] = entry[field]
+            documents.append(document)
+    return key_scheme(FACTS_INDEX).assign(documents)
+
+
+def unrouted_fact_actions(record):
+    """
+    Bulk actions for the fact docs of one user metrics record, without _index.
+
+    The backfill's scan transform: it needs no Elasticsearch client, so it can
+    run in a process pool (SCAN_USE_PROCESSES), and the partitions are
+    resolved by the PartitionRouter of the parent process.
+    """
+    return [{"_id": document["unique_hash"], "_source": document} for document in fact_documents(record)]
+
+
+def fact_actions(record, es=None):
+    """Bulk actions for the fact docs of one user metrics record."""
+    actions = unrouted_fact_actions(record)
+    for action in actions:
+        action["_index"] = write_index_for(FACTS_INDEX, action["_source"], es=es)
+    return actions
+
+
+class PartitionRouter:
+    """Writer wrapper setting the _index of each action to the partition of its day."""
+
+    def __init__(self, writer, alias, es=None):
+        self.writer = writer
+        self.alias = alias
+        self.es = es
+
+    def add(self, action, stats_key=None):
+        action["_index"] = write_index_for(self.alias, action["_source"], es=self.es)
+        self.writer.add(action, stats_key=stats_key)
+
+
+def write_facts(records, es=None, writer=None):
+    """Write the fact docs of user metrics `records`; returns how many were queued."""
+    es = es or get_es_client()
+    ensure_partitioned_index(FACTS_INDEX, es=es)
+    if writer is not None:
+        count = 0
+        for record in records:
+            for action in fact_actions(record, es=es):
+                writer.add(action, stats_key=FACTS_INDEX)
+                count += 1
+        return count
+
+    with BulkWriter(es) as writer:
+        count = write_facts(records, es=es, writer=writer)
+    writer.log_stats()
+    return count
+
+
+def backfill_facts(es=None, since=None):
+    """Rebuild the facts of every user metrics doc (or those with a day >= `since`)."""
+    es = es or get_es_client()
+    ensure_partitioned_index(FACTS_INDEX, es=es)
+    query = {"range": {"day": {"gte": since}}} if since else None
+    with BulkWriter(es) as writer:
+        totals = sliced_scan(
+            es, SOURCE_INDEX, unrouted_fact_actions, PartitionRouter(writer, FACTS_INDEX, es=es), query=query
+        )
+    writer.log_stats()
+    logger.info(
+        f"Wrote {writer.totals()['indexed']} facts to {FACTS_INDEX} from {totals['scanned']} {SOURCE_INDEX} docs"
+    )
+    return writer.totals()["indexed"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the user metrics fact index")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--full", action="store_true", help="Rebuild the facts of every user metrics doc")
+    group.add_argument("--since", help="Rebuild the facts of user metrics days on or after YYYY-MM-DD")
+    args = parser.parse_args()
+    backfill_facts(since=args.since)
@@ -0,0 +1,321 @@
+"""
+Pre-aggregated org/team/day rollup of copilot_user_metrics for dashboards.
+
+Source index: copilot_user_metrics (one doc per user/day)
+Dest index:   copilot_user_metrics_rollup (one doc per org/team/day/dimension value)
+
+Every rollup doc holds the summed counters and the number of distinct active
+users of one (organization_slug, team_slug, day). `dimension_kind` "total"
+covers all activity; with ROLLUP_DIMENSIONS (default language, model, ide,
+feature) there is also one doc per value of each dimension, summed from the
+matching totals_by_* arrays. Panels can then run plain sum/terms aggregations
+over a few docs per day instead of nested aggregations over every user/day.
+
+Users are joined to teams through the seat assignments of their org stored
+for the same day, so a team change does not move the history of its users;
+days without stored assignments use the latest ones. Users without a seat
+are counted under "no-team". Since a user belongs to one team per day,
+summing the team docs of a day gives the org totals, active users included.
+
+Updates are incremental: the highest source `@timestamp` processed is kept as
+a checkpoint in the `_meta` of the rollup index (as for the top-by-day index),
+and each run only recomputes the (org, day) pairs that received source docs
+since then. Those days are recomputed from all of their source docs and docs
+of theirs that are no longer produced are deleted. Set ROLLUP_FULL_REBUILD=true
+or pass --full to recompute every day.
+"""
+
+import os
+import argparse
+import logging
+from collections import defaultdict
+
+from bulk_writer import BulkWriter
+from doc_ids import key_scheme
+from es_client import get_es_client, ensure_managed_index
+from adoption_leaderboard import NO_TEAM, build_team_index
+from create_user_top_by_day import max_source_timestamp, read_checkpoint, write_checkpoint
+from parallel_scan import open_point_in_time, close_point_in_time, iter_slice
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - [%(levelname)s] - %(message)s")
+logger = logging.getLogger(__name__)
+
+SOURCE_INDEX = os.getenv("INDEX_USER_METRICS", "copilot_user_metrics")
+ROLLUP_INDEX = os.getenv("INDEX_USER_METRICS_ROLLUP", "copilot_user_metrics_rollup")
+SEAT_ASSIGNMENTS_INDEX = os.getenv("INDEX_SEAT_ASSIGNMENTS", "copilot_seat_assignments")
+FULL_REBUILD = os.getenv("ROLLUP_FULL_REBUILD", "false").lower() == "true"
+
+CHECKPOINT_META_KEY = "rollup_checkpoint"
+# (org, day) pairs recomputed per source read
+DAYS_PER_BATCH = 7
+PAGE_SIZE = 1000
+TOTAL = "total"
+
+# Dimension kind -> (totals_by_* array, key field of its entries)
+DIMENSIONS = {
+    "language": ("totals_by_language_model", "language"),
+    "model": ("totals_by_language_model", "model"),
+    "ide": ("totals_by_ide", "ide"),
+    "feature": ("totals_by_feature", "feature"),
+}
+ROLLUP_DIMENSIONS = [
+    kind.strip()
+    for kind in os.getenv("ROLLUP_DIMENSIONS", ",".join(DIMENSIONS)).split(",")
+    if kind.strip() in DIMENSIONS
+]
+
+COUNTER_FIELDS = (
+    "user_initiated_interaction_count",
+    "code_generation_activity_count",
+    "code_acceptance_activity_count",
+    "loc_suggested_to_add_sum",
+    "loc_suggested_to_delete_sum",
+    "loc_added_sum",
+    "loc_deleted_sum",
+)
+
+
+def _safe_int(value):
+    try:
+        return int(value or 0)
+    except Exception:
+        return 0
+
+
+class _Bucket:
+    __slots__ = ("counters", "users", "agent_users", "chat_users")
+
+    def __init__(self):
+        self.counters = dict.fromkeys(COUNTER_FIELDS, 0)
+        self.users = set()
+        self.agent_users = set()
+        self.chat_users = set()
+
+    def add(self, entry, user_login):
+        for field in COUNTER_FIELDS:
+            self.counters[field] += _safe_int(entry.get(field))
+        self.users.add(user_login)
+
+
+def rollup_documents(records, user_teams, dimensions=None, teams_by_day=None):
+    """
+    Rollup docs for user metrics records.
+
+    `records` must hold every source doc of the days they cover, otherwise the
+    counters of those days would be partial. Users are joined to teams with
+    teams_by_day[day] (login -> team slug) when it has the day, with
+    `user_teams` otherwise.
+    """
+    teams_by_day = teams_by_day or {}
+    dimensions = ROLLUP_DIMENSIONS if dimensions is None else dimensions
+    buckets = defaultdict(_Bucket)
+    slug_types = {}
+    for record in records:
+        day = record.get("day")
+        user_login = record.get("user_login")
+        if not day or not user_login:
+            continue
+        organization_slug = record.get("organization_slug")
+        slug_types.setdefault(organization_slug, record.get("slug_type"))
+        teams = teams_by_day.get(day[:10], user_teams)
+        base = (organization_slug, teams.get(user_login, NO_TEAM), day[:10])
+
+        total = buckets[base + (TOTAL, TOTAL)]
+        total.add(record, user_login)
+        if record.get("used_agent"):
+            total.agent_users.add(user_login)
+        if record.get("used_chat"):
+            total.chat_users.add(user_login)
+
+        for kind in dimensions:
+            array_field, key_field = DIMENSIONS[kind]
+            for entry in record.get(array_field) or []:
+                buckets[base + (kind, entry.get(key_field) or "unknown")].add(entry, user_login)
+
+    documents = []
+    for (organization_slug, team_slug, day, kind, value), bucket in buckets.items():
+        document = {
+            "organization_slug": organization_slug,
+            "slug_type": slug_types.get(organization_slug),
+            "team_slug": team_slug,
+            "day": day,
+            "dimension_kind": kind,
+            "dimension_value": value,
+            **bucket.counters,
+            "active_users": len(bucket.users),
+        }
+        if kind == TOTAL:
+            document["agent_users"] = len(bucket.agent_users)
+            document["chat_users"] = len(bucket.chat_users)
+        documents.append(document)
+    return key_scheme(ROLLUP_INDEX).assign(documents)
+
+
+def _iter_query(es, index, query):
+    """Yield the _source of every doc of `index` matching `query`."""
+    pit_id = open_point_in_time(es, index)
+    try:
+        for hits in iter_slice(es, pit_id, 0, 1, query=query, page_size=PAGE_SIZE):
+            for hit in hits:
+                yield hit["_source"]
+    finally:
+        close_point_in_time(es, pit_id)
+
+
+def load_user_teams(es, organization_slug):
+    """login -> team slug from the latest seat assignments of `organization_slug`."""
+    org_query = {"term": {"organization_slug": organization_slug}}
+    resp = es.search(
+        index=SEAT_ASSIGNMENTS_INDEX,
+        size=0,
+        query=org_query,
+        aggs={"latest": {"max": {"field": "day", "format": "yyyy-MM-dd"}}},
+    )
+    latest = resp["aggregations"]["latest"].get("value_as_string")
+    if not latest:
+        return {}
+    query = {"bool": {"filter": [org_query, {"term": {"day": latest}}]}}
+    return build_team_index(_iter_query(es, SEAT_ASSIGNMENTS_INDEX, query))
+
+
+def load_teams_by_day(es, organization_slug, days):
+    """{day: login -> team slug} from the seat assignments of `organization_slug` stored for `days`."""
+    query = {
+        "bool": {
+            "filter": [
+                {"term": {"organization_slug": organization_slug}},
+                {"terms": {"day": days}},
+            ]
+        }
+    }
+    seats_by_day = defaultdict(list)
+    for seat in _iter_query(es, SEAT_ASSIGNMENTS_INDEX, query):
+        if seat.get("day"):
+            seats_by_day[seat["day"][:10]].append(seat)
+    return {day: build_team_index(seats) for day, seats in seats_by_day.items()}
+
+
+def changed_days(es, pit_id, since=None):
+    """{organization_slug: [day, ...]} of source docs written at or after `since`."""
+    if since is None:
+        query = {"match_all": {}}
+    else:
+        query = {"range": {"@timestamp": {"gte": since, "format": "epoch_millis"}}}
+
+    days = defaultdict(list)
+    after_key = None
+    while True:
+        composite = {
+            "size": PAGE_SIZE,
+            "sources": [
+                {"organization_slug": {"terms": {"field": "organization_slug"}}},
+                {"day": {"date_histogram": {"field": "day", "calendar_interval": "1d", "format": "yyyy-MM-dd"}}},
+            ],
+        }
+        if after_key:
+            composite["after"] = after_key
+        resp = es.search(pit={"id": pit_id}, size=0, query=query, aggs={"days": {"composite": composite}})
+        result = resp["aggregations"]["days"]
+        for bucket in result["buckets"]:
+            days[bucket["key"]["organization_slug"]].append(bucket["key"]["day"])
+
+        after_key = result.get("after_key")
+        if not after_key or len(result["buckets"]) < PAGE_SIZE:
+            return days
+
+
+def rollup_days(es, writer, organization_slug, days, user_teams):
+    """
+    Recompute the rollup docs of `days` of one org; returns the ids written.
+
+    `user_teams` (the latest seat assignments) is used for the days without
+    seat assignments of their own.
+    """
+    query = {
+        "bool": {
+            "filter": [
+                {"term": {"organization_slug": organization_slug}},
+                {"terms": {"day": days}},
+            ]
+        }
+    }
+    documents = rollup_documents(
+        _iter_query(es, SOURCE_INDEX, query),
+        user_teams,
+        teams_by_day=load_teams_by_day(es, organization_slug, days),
+    )
+    for document in documents:
+        writer.add({"_index": ROLLUP_INDEX, "_id": document["unique_hash"], "_source": document})
+    return [document["unique_hash"] for document in documents]
+
+
+def delete_stale(es, organization_slug, days, keep_ids):
+    query = {
+        "bool": {
+            "filter": [
+                {"term": {"organization_slug": organization_slug}},
+                {"terms": {"day": days}},
+            ],
+            "must_not": [{"ids": {"values": keep_ids}}],
+        }
+    }
+    resp = es.delete_by_query(index=ROLLUP_INDEX, query=query, conflicts="proceed")
+    return resp.get("deleted", 0)
+
+
+def update_metrics_rollup(es=None, full_rebuild=FULL_REBUILD):
+    """Bring the rollup index up to date with the user metrics; returns the docs written."""
+    es = es or get_es_client()
+    ensure_managed_index(ROLLUP_INDEX, es=es)
+
+    since = None if full_rebuild else read_checkpoint(es, ROLLUP_INDEX, SOURCE_INDEX, CHECKPOINT_META_KEY)
+    pit_id = open_point_in_time(es, SOURCE_INDEX)
+    try:
+        checkpoint = max_source_timestamp(es, pit_id)
+        days_by_org = changed_days(es, pit_id, since)
+    finally:
+        close_point_in_time(es, pit_id)
+
+    if not days_by_org:
+        logger.info(f"No new user metrics since the last rollup of {ROLLUP_INDEX}")
+        return 0
+    logger.info(
+        f"Rolling up {sum(len(days) for days in days_by_org.values())} org/days "
+        f"of {SOURCE_INDEX} into {ROLLUP_INDEX}"
+    )
+
+    written = {}
+    with BulkWriter(es) as writer:
+        for organization_slug, days in days_by_org.items():
+            user_teams = load_user_teams(es, organization_slug)
+            for start in range(0, len(days), DAYS_PER_BATCH):
+                batch = days[start:start + DAYS_PER_BATCH]
+                written[(organization_slug, tuple(batch))] = rollup_days(
+                    es, writer, organization_slug, batch, user_teams
+                )
+
+    writer.log_stats()
+    totals = writer.totals()
+    if totals["failed"]:
+        logger.warning(
+            f"{totals['failed']} rollup docs failed, keeping the previous checkpoint so they are retried"
+        )
+        return totals["indexed"]
+
+    deleted = 0
+    for (organization_slug, batch), keep_ids in written.items():
+        deleted += delete_stale(es, organization_slug, list(batch), keep_ids)
+    if deleted:
+        logger.info(f"Deleted {deleted} rollup docs no longer produced")
+
+    if checkpoint is not None and checkpoint != since:
+        write_checkpoint(es, ROLLUP_INDEX, SOURCE_INDEX, checkpoint, CHECKPOINT_META_KEY)
+    logger.info(f"Created/updated {totals['indexed']} rollup docs in {ROLLUP_INDEX}")
+    return totals["indexed"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create/update the org/team/day user metrics rollup")
+    parser.add_argument("--full", action="store_true", help="Ignore the checkpoint and recompute every day")
+    args = parser.parse_args()
+    update_metrics_rollup(full_rebuild=args.full or FULL_REBUILD)
@@ -0,0 +1,145 @@
+"""
+Sliced parallel scan over an Elasticsearch index for full-index derivation jobs.
+
+A point-in-time is opened on the source index and split into N slices. Each
+slice is paged with search_after by its own worker thread; every source
+document goes through a transform function and the resulting bulk actions are
+fed to one shared BulkWriter, which sizes and throttles the writes.
+
+Fetching is I/O bound and runs in threads. When the transform is CPU heavy,
+use_processes=True applies it in a process pool instead (the transform must
+then be a picklable module-level function or functools.partial of one).
+
+Usage:
+    with BulkWriter(es) as writer:
+        stats = sliced_scan(es, "copilot_user_metrics", to_action, writer)
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from es_client import get_es_client
+
+logger = logging.getLogger(__name__)
+
+# 0 = one slice per shard, but at least one per worker
+SCAN_SLICES = int(os.getenv("SCAN_SLICES", "0"))
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", str(min(8, os.cpu_count() or 1))))
+SCAN_USE_PROCESSES = os.getenv("SCAN_USE_PROCESSES", "false").lower() == "true"
+SCAN_PAGE_SIZE = int(os.getenv("SCAN_PAGE_SIZE", "1000"))
+PIT_KEEP_ALIVE = "5m"
+
+
+def open_point_in_time(es, index, keep_alive=PIT_KEEP_ALIVE):
+    return es.open_point_in_time(index=index, keep_alive=keep_alive)["id"]
+
+
+def close_point_in_time(es, pit_id):
+    try:
+        es.close_point_in_time(id=pit_id)
+    except Exception as e:
+        logger.warning(f"Failed to close point-in-time: {e}")
+
+
+def shard_count(es, pit_id, query=None):
+    resp = es.search(pit={"id": pit_id}, query=query or {"match_all": {}}, size=0)
+    return resp["_shards"]["total"]
+
+
+def iter_slice(es, pit_id, slice_id, max_slices, query=None, page_size=SCAN_PAGE_SIZE, keep_alive=PIT_KEEP_ALIVE):
+    """Yield pages (lists of hits) of one slice of a point-in-time."""
+    body = {
+        "pit": {"id": pit_id, "keep_alive": keep_alive},
+        "query": query or {"match_all": {}},
+        "sort": ["_shard_doc"],
+        "size": page_size,
+    }
+    if max_slices > 1:
+        body["slice"] = {"id": slice_id, "max": max_slices}
+
+    search_after = None
+    while True:
+        resp = es.search(**body, search_after=search_after)
+        hits = resp["hits"]["hits"]
+        if not hits:
+            return
+        yield hits
+        search_after = hits[-1]["sort"]
+
+
+def _add_actions(writer, result):
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        writer.add(result)
+        return 1
+    count = 0
+    for action in result:
+        writer.add(action)
+        count += 1
+    return count
+
+
+def sliced_scan(
+    es,
+    index,
+    transform,
+    writer,
+    query=None,
+    slices=SCAN_SLICES,
+    workers=SCAN_WORKERS,
+    use_processes=SCAN_USE_PROCESSES,
+    page_size=SCAN_PAGE_SIZE,
+    pit_id=None,
+):
+    """
+    Scan `index` in parallel slices, writing transform(source) to `writer`.
+
+    `transform` receives a document's _source and returns a bulk action, a list
+    of actions or None. Pass `pit_id` to scan a point-in-time the caller
+    already holds (e.g. to read a consistent checkpoint from it); it is left
+    open. Returns {"scanned": n, "actions": n, "slices": n}.
+    """
+    es = es or get_es_client()
+    workers = max(1, workers)
+    own_pit = pit_id is None
+    if own_pit:
+        pit_id = open_point_in_time(es, index)
+
+    process_pool = ProcessPoolExecutor(max_workers=workers) if use_processes else None
+    totals = {"scanned": 0, "actions": 0}
+    totals_lock = threading.Lock()
+
+    def run_slice(slice_id, max_slices):
+        scanned = actions = 0
+        for hits in iter_slice(es, pit_id, slice_id, max_slices, query=query, page_size=page_size):
+            sources = [hit["_source"] for hit in hits]
+            if process_pool:
+                results = process_pool.map(transform, sources, chunksize=max(1, len(sources) // workers))
+            else:
+                results = map(transform, sources)
+            for result in results:
+                actions += _add_actions(writer, result)
+            scanned += len(sources)
+        with totals_lock:
+            totals["scanned"] += scanned
+            totals["actions"] += actions
+        logger.info(f"Scan slice {slice_id + 1}/{max_slices} of {index}: {scanned} docs")
+
+    try:
+        max_slices = slices or max(shard_count(es, pit_id, query), workers)
+        logger.info(f"Scanning {index} in {max_slices} slices with {workers} workers")
+        with ThreadPoolExecutor(max_workers=min(workers, max_slices), thread_name_prefix="scan") as pool:
+            futures = [pool.submit(run_slice, slice_id, max_slices) for slice_id in range(max_slices)]
+            for future in futures:
+                future.result()
+    finally:
+        if process_pool:
+            process_pool.shutdown()
+        if own_pit:
+            close_point_in_time(es, pit_id)
+
+    totals["slices"] = max_slices
+    return totals
@@ -0,0 +1,349 @@
+"""
+Rebuild the collector's indices from archived snapshots.
+
+Every collector run keeps what it fetched under LOG_PATH/<date>/ (see
+snapshots.py; pretty-printed .json files of older versions are read too,
+and so are the day archives of log_retention.py).
+This tool replays a date range of them through the collector's transforms
+(transforms.py) and writes the documents with the bulk writer, without calling
+the GitHub API, which only keeps 28 days. Use it to refill indices after a
+mapping change or a reindex, or to backfill history a fresh install never saw.
+
+Replayed artifacts:
+
+- copilot_metrics: <org>_<team>_copilot_metrics, converted to usage rows with
+  convert_metrics_to_usage and split by DataSplitter into the total,
+  breakdown and breakdown_chat indices (team positions from <org>_all_teams),
+- user_metrics: <org>_copilot_user_metrics, re-enriched (top values, unique
+  hash) into copilot_user_metrics and copilot_user_metrics_facts,
+- seat_info, seat_assignments and developer_activity, re-keyed as they are.
+
+Files of one day are read and transformed by parallel workers; days are
+written oldest first and each day is flushed before the next one starts, so
+when several days hold the same document (the 28-day reports overlap) the
+newest snapshot wins. Derived indices (summaries, top-by-day, rollup,
+adoption) are rebuilt from the user metrics by their own scripts afterwards.
+
+Usage:
+    python rebuild_from_snapshots.py --from 2025-03-01 --to 2025-04-30
+    python rebuild_from_snapshots.py --from 2025-04-01 --org my-org --artifact user_metrics --dry-run
+"""
+
+import os
+import re
+import json
+import shutil
+import zipfile
+import tempfile
+import argparse
+import logging
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from bulk_writer import BulkWriter
+from config import Paras, Indexes
+from doc_ids import key_scheme
+from es_client import get_es_client, ensure_indexes
+from index_lifecycle import ensure_partitioned_index, write_index_for
+from log_retention import archive_path
+from log_utils import current_time
+from metrics_facts import FACTS_INDEX, fact_documents
+from snapshots import read_ndjson
+from transforms import DataSplitter, convert_metrics_to_usage, enrich_user_metrics
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - [%(levelname)s] - %(message)s")
+logger = logging.getLogger(__name__)
+
+REBUILD_WORKERS = int(os.getenv("REBUILD_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+# File name suffix (after the org or org_team prefix) -> artifact, longest first
+# so "_copilot_user_metrics_local" is not taken for "_copilot_metrics"
+SNAPSHOT_SUFFIXES = (
+    ("_copilot_user_metrics_local", "user_metrics"),
+    ("_copilot_user_metrics", "user_metrics"),
+    ("_all_teams_copilot_usage", None),
+    ("_developer_activity", "developer_activity"),
+    ("_seat_info_settings", "seat_info"),
+    ("_seat_assignments", "seat_assignments"),
+    ("_all_organizations", None),
+    ("_copilot_metrics", "copilot_metrics"),
+    ("_copilot_usage", None),
+    ("_all_teams", "teams"),
+)
+REPLAYED_ARTIFACTS = ("copilot_metrics", "user_metrics", "seat_info", "seat_assignments", "developer_activity")
+FILE_PATTERN = re.compile(r"^(?P<stem>.+)_(?P<day>\d{4}-\d{2}-\d{2})(?P<ext>\.ndjson(\.gz|\.zst)?|\.json)$")
+SIMPLE_INDEXES = {
+    "seat_info": Indexes.index_seat_info,
+    "seat_assignments": Indexes.index_seat_assignments,
+    "developer_activity": Indexes.index_developer_activity,
+}
+
+
+def parse_snapshot_name(file_name):
+    """(artifact, organization_slug, team_slug) of a snapshot file, or None."""
+    match = FILE_PATTERN.match(file_name)
+    if not match:
+        return None
+    stem = match.group("stem")
+    for suffix, artifact in SNAPSHOT_SUFFIXES:
+        if stem.endswith(suffix):
+            prefix = stem[: -len(suffix)]
+            if artifact == "copilot_metrics":
+                # <org>_<team>; GitHub slugs contain no underscores
+                organization_slug, _, team_slug = prefix.partition("_")
+                if not team_slug:
+                    return None
+                return artifact, organization_slug, team_slug
+            return artifact, prefix, None
+    return None
+
+
+def read_snapshot(path):
+    """Items of a snapshot file: NDJSON (any compression) or a legacy JSON dump."""
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf8") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) else [data]
+    return list(read_ndjson(path))
+
+
+def snapshot_days(log_path, start, end):
+    """
+    (date, folder, archive) of the snapshot days between `start` and `end`, oldest first.
+
+    Either of folder and archive can be None. A day has both when a late
+    snapshot recreated its folder after log_retention.py compacted it.
+    """
+    days = []
+    day = start
+    while day <= end:
+        folder = os.path.join(log_path, day.isoformat())
+        archive = archive_path(log_path, day)
+        folder = folder if os.path.isdir(folder) else None
+        archive = archive if os.path.exists(archive) else None
+        if folder or archive:
+            days.append((day, folder, archive))
+        day += timedelta(days=1)
+    return days
+
+
+def prepare_day(folder, archive, scratch):
+    """
+    The folder to replay one day from.
+
+    An archive (compacted by log_retention.py) is extracted into `scratch`
+    and the files of a folder of the same day are copied over it, so they
+    take precedence by name.
+    """
+    if archive is None:
+        return folder
+    with zipfile.ZipFile(archive) as zipped:
+        zipped.extractall(scratch)
+    if folder is not None:
+        for root, _, files in os.walk(folder):
+            target = os.path.join(scratch, os.path.relpath(root, folder))
+            os.makedirs(target, exist_ok=True)
+            for file_name in files:
+                shutil.copy2(os.path.join(root, file_name), os.path.join(target, file_name))
+    return scratch
+
+
+def team_positions(day_path, organization_slug):
+    """team slug -> position_in_tree from the <org>_all_teams snapshot of a day."""
+    for file_name in os.listdir(day_path):
+        parsed = parse_snapshot_name(file_name)
+        if parsed and parsed[0] == "teams" and parsed[1] == organization_slug:
+            return {
+                team["slug"]: team.get("position_in_tree")
+                for team in read_snapshot(os.path.join(day_path, file_name))
+                if isinstance(team, dict) and team.get("slug")
+            }
+    return {}
+
+
+def usage_documents(path, organization_slug, team_slug, positions):
+    """(index, doc) pairs of a per-team Copilot metrics snapshot."""
+    metrics = read_snapshot(path)
+    usage = convert_metrics_to_usage(metrics)
+    if not usage:
+        return []
+    if team_slug == "no-team":
+        position_in_tree = "root_team"
+    else:
+        position_in_tree = positions.get(team_slug, "leaf_team")
+    splitter = DataSplitter(
+        usage,
+        additional_properties={
+            "organization_slug": organization_slug,
+            "team_slug": team_slug,
+            "position_in_tree": position_in_tree,
+        },
+    )
+    return list(splitter.iter_docs())
+
+
+def user_metrics_documents(path):
+    """(index, doc) pairs of a user metrics snapshot, facts included."""
+    documents = []
+    for record in read_snapshot(path):
+        record = enrich_user_metrics(
+            record,
+            record.get("organization_slug"),
+            record.get("slug_type"),
+            record.get("utc_offset"),
+            record.get("last_updated_at") or current_time(),
+            download_link_index=record.get("download_link_index"),
+        )
+        documents.append((Indexes.index_user_metrics, record))
+        documents.extend((FACTS_INDEX, fact) for fact in fact_documents(record))
+    return documents
+
+
+def simple_documents(path, artifact):
+    """(index, doc) pairs of a snapshot whose items are stored as they are."""
+    index_name = SIMPLE_INDEXES[artifact]
+    scheme = key_scheme(index_name)
+    documents = []
+    for record in read_snapshot(path):
+        if scheme.has_key(record):
+            record["unique_hash"] = scheme.id(record)
+        documents.append((index_name, record))
+    return documents
+
+
+def day_tasks(day_path, artifacts, organization_slug=None):
+    """(path, artifact, org, team) of the replayable snapshots of one day."""
+    tasks = []
+    for file_name in sorted(os.listdir(day_path)):
+        parsed = parse_snapshot_name(file_name)
+        if not parsed:
+            continue
+        artifact, org, team_slug = parsed
+        if artifact not in artifacts or (organization_slug and org != organization_slug):
+            continue
+        tasks.append((os.path.join(day_path, file_name), artifact, org, team_slug))
+    return tasks
+
+
+def replay_file(task, day_path, positions_cache):
+    path, artifact, organization_slug, team_slug = task
+    if artifact == "copilot_metrics":
+        positions = positions_cache.get(organization_slug)
+        if positions is None:
+            positions = positions_cache[organization_slug] = team_positions(day_path, organization_slug)
+        return usage_documents(path, organization_slug, team_slug, positions)
+    if artifact == "user_metrics":
+        return user_metrics_documents(path)
+    return simple_documents(path, artifact)
+
+
+def replay_day(day_path, artifacts, organization_slug, pool, writer, timestamp, es):
+    """Replay the snapshots of one day folder; `writer` None only counts the documents."""
+    tasks = day_tasks(day_path, artifacts, organization_slug)
+    positions_cache = {}
+    found = 0
+    for documents in pool.map(lambda task: replay_file(task, day_path, positions_cache), tasks):
+        found += len(documents)
+        if writer is None:
+            continue
+        for index_name, document in documents:
+            document["@timestamp"] = timestamp
+            writer.add(
+                {
+                    "_index": write_index_for(index_name, document, es=es),
+                    "_id": document.get("unique_hash"),
+                    "_source": document,
+                },
+                stats_key=index_name,
+            )
+    if writer is not None:
+        # Days overwrite each other's documents, so keep them in order
+        writer.flush()
+    return found
+
+
+def rebuild(
+    start,
+    end,
+    artifacts=REPLAYED_ARTIFACTS,
+    organization_slug=None,
+    log_path=None,
+    workers=REBUILD_WORKERS,
+    dry_run=False,
+    es=None,
+):
+    """Replay the snapshots of [start, end]; returns the number of documents written (or found)."""
+    log_path = log_path or Paras.log_path
+    days = snapshot_days(log_path, start, end)
+    if not days:
+        logger.warning(f"No snapshot folders in {log_path} between {start} and {end}")
+        return 0
+
+    if not dry_run:
+        es = es or get_es_client()
+        ensure_indexes(
+            [
+                index_name
+                for index_name in (*SIMPLE_INDEXES.values(), Indexes.index_name_total, Indexes.index_name_breakdown_chat)
+                if index_name not in Indexes.partitioned_indexes
+            ],
+            es=es,
+        )
+        for alias in Indexes.partitioned_indexes:
+            ensure_partitioned_index(alias, es=es)
+
+    timestamp = datetime.now().isoformat()
+    found = 0
+    writer = None if dry_run else BulkWriter(es)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for day, folder, archive in days:
+                with tempfile.TemporaryDirectory() as scratch:
+                    day_path = prepare_day(folder, archive, scratch)
+                    day_found = replay_day(day_path, artifacts, organization_slug, pool, writer, timestamp, es)
+                logger.info(f"{day}: {day_found} documents")
+                found += day_found
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if dry_run:
+        return found
+    writer.log_stats()
+    return writer.totals()["indexed"]
+
+
+def _date(value):
+    return date.fromisoformat(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the collector's indices from archived snapshots")
+    parser.add_argument("--from", dest="start", type=_date, required=True, help="First snapshot day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=_date, default=date.today(), help="Last snapshot day (default: today)")
+    parser.add_argument("--org", help="Only replay this organization or enterprise slug")
+    parser.add_argument(
+        "--artifact",
+        action="append",
+        choices=REPLAYED_ARTIFACTS,
+        help="Artifact to replay (repeatable, default: all)",
+    )
+    parser.add_argument("--log-path", default=Paras.log_path, help=f"Snapshot root (default: {Paras.log_path})")
+    parser.add_argument("--workers", type=int, default=REBUILD_WORKERS, help="Files read and transformed in parallel")
+    parser.add_argument("--dry-run", action="store_true", help="Read and transform, but do not write")
+    args = parser.parse_args()
+
+    count = rebuild(
+        args.start,
+        args.end,
+        artifacts=tuple(args.artifact or REPLAYED_ARTIFACTS),
+        organization_slug=args.org,
+        log_path=args.log_path,
+        workers=args.workers,
+        dry_run=args.dry_run,
+    )
+    logger.info(f"{'Found' if args.dry_run else 'Wrote'} {count} documents")
+
+
+if __name__ == "__main__":
+    main()
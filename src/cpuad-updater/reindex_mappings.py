@@ -0,0 +1,259 @@
+"""
+Online reindex of the collector's indices to a new mapping version.
+
+Readers (Grafana, create_user_summaries, create_user_top_by_day) always go
+through the index name, which is an alias once an index has been migrated.
+For every index this tool:
+
+1. creates the target indices from mapping/<version>/ (monthly partitions for
+   the partitioned indices, <index>-<version> for the others),
+2. copies the documents server-side with _reindex, routing partitioned
+   documents to the partition of their `day`,
+3. copies again whatever was written during the first pass (by @timestamp),
+4. swaps the alias to the new indices in a single atomic _aliases call.
+
+A pre-partitioning concrete index that carries the alias name is removed in
+the same atomic call, since an alias cannot share a name with an index.
+Older partitions are only detached from the alias unless --delete-source is
+given.
+
+Usage:
+    python reindex_mappings.py --to v2
+    python reindex_mappings.py --to v2 --index copilot_user_metrics --delete-source
+
+After migrating, set INDEX_MAPPING_VERSION to the new version for the
+collector and restart it. Documents it wrote to the old indices in between
+can be copied with --catch-up-since <ISO timestamp>.
+"""
+
+import os
+import argparse
+import logging
+from datetime import datetime
+
+from es_client import (
+    get_es_client,
+    wait_for_elasticsearch,
+    ensure_index,
+    load_mapping,
+    versioned_index_name,
+)
+from index_lifecycle import (
+    install_index_template,
+    ensure_partition,
+    partition_prefix,
+    template_name,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - [%(levelname)s] - %(message)s")
+logger = logging.getLogger(__name__)
+
+PARTITIONED_INDEXES = (
+    os.getenv("INDEX_USER_METRICS", "copilot_user_metrics"),
+    os.getenv("INDEX_NAME_BREAKDOWN", "copilot_usage_breakdown"),
+    os.getenv("INDEX_DEVELOPER_ACTIVITY", "developer_activity"),
+    os.getenv("INDEX_USER_METRICS_FACTS", "copilot_user_metrics_facts"),
+)
+
+PLAIN_INDEXES = (
+    os.getenv("INDEX_SEAT_INFO", "copilot_seat_info_settings"),
+    os.getenv("INDEX_SEAT_ASSIGNMENTS", "copilot_seat_assignments"),
+    os.getenv("INDEX_NAME_TOTAL", "copilot_usage_total"),
+    os.getenv("INDEX_NAME_BREAKDOWN_CHAT", "copilot_usage_breakdown_chat"),
+    os.getenv("INDEX_USER_ADOPTION", "copilot_user_adoption"),
+    os.getenv("INDEX_USER_ADOPTION_AGGREGATES", "copilot_user_adoption_aggregates"),
+    os.getenv("INDEX_USER_METRICS_ROLLUP", "copilot_user_metrics_rollup"),
+)
+
+# Route each document to the monthly partition of its `day` (YYYY-MM-DD)
+PARTITION_ROUTING_SCRIPT = """
+def day = ctx._source.day;
+if (day != null && day.length() >= 7) {
+    ctx._index = params.prefix + day.substring(0, 4) + '.' + day.substring(5, 7);
+}
+"""
+
+
+def _is_legacy_index(es, name):
+    return es.indices.exists(index=name) and not es.indices.exists_alias(name=name)
+
+
+def current_sources(es, name, target_indices=()):
+    """Concrete indices that currently serve `name`, excluding the migration targets."""
+    if _is_legacy_index(es, name):
+        return [name]
+    if not es.indices.exists_alias(name=name):
+        return []
+    return sorted(
+        index for index in es.indices.get_alias(name=name) if index not in target_indices
+    )
+
+
+def source_months(es, sources):
+    """Months (YYYY-MM) that have documents in `sources`."""
+    resp = es.search(
+        index=",".join(sources),
+        size=0,
+        aggs={
+            "months": {
+                "date_histogram": {
+                    "field": "day",
+                    "calendar_interval": "month",
+                    "format": "yyyy-MM",
+                    "min_doc_count": 1,
+                }
+            }
+        },
+    )
+    return [bucket["key_as_string"] for bucket in resp["aggregations"]["months"]["buckets"]]
+
+
+def copy_documents(es, sources, dest, script=None, since=None):
+    body = {
+        "source": {"index": sources},
+        "dest": {"index": dest, "op_type": "index"},
+        "conflicts": "proceed",
+        "wait_for_completion": True,
+        "refresh": True,
+        "slices": "auto",
+    }
+    if since:
+        body["source"]["query"] = {"range": {"@timestamp": {"gte": since}}}
+    if script:
+        body["script"] = script
+    resp = es.reindex(**body)
+    failures = resp.get("failures", [])
+    if failures:
+        logger.error(f"Reindex into {dest} reported {len(failures)} failures, first: {failures[0]}")
+    logger.info(
+        f"Copied {resp.get('created', 0)} created / {resp.get('updated', 0)} updated docs "
+        f"from {sources} into {dest}"
+    )
+    return resp
+
+
+def prepare_targets(es, name, version, partitioned, sources):
+    """Create the target indices and return (targets, default dest, routing script)."""
+    if not partitioned:
+        dest = versioned_index_name(name, version)
+        ensure_index(dest, body=load_mapping(name, version), es=es)
+        return [dest], dest, None
+
+    install_index_template(name, version=version, es=es)
+    months = source_months(es, sources) if sources else []
+    targets = [
+        ensure_partition(name, day=f"{month}-01", es=es, version=version)
+        for month in months
+    ]
+    # Documents without a day land in the current month
+    default_dest = ensure_partition(name, es=es, version=version)
+    if default_dest not in targets:
+        targets.append(default_dest)
+    script = {
+        "lang": "painless",
+        "source": PARTITION_ROUTING_SCRIPT,
+        "params": {"prefix": partition_prefix(name, version)},
+    }
+    return targets, default_dest, script
+
+
+def _old_partitions(es, name, version):
+    prefix = partition_prefix(name, version)
+    return sorted(
+        index for index in es.indices.get(index=f"{name}-*") if not index.startswith(prefix)
+    )
+
+
+def migrate_index(es, name, version, partitioned, delete_source=False, catch_up_since=None):
+    if catch_up_since:
+        # Plain indices keep accepting writes through the alias after the swap;
+        # only partitioned ones can have received writes in detached partitions
+        if partitioned:
+            old_indices = _old_partitions(es, name, version)
+            if old_indices:
+                _, default_dest, script = prepare_targets(es, name, version, True, [])
+                copy_documents(es, old_indices, default_dest, script, since=catch_up_since)
+        return
+
+    if partitioned:
+        prefix = partition_prefix(name, version)
+        existing_targets = [
+            index for index in es.indices.get(index=f"{prefix}*") if index.startswith(prefix)
+        ]
+    else:
+        target = versioned_index_name(name, version)
+        existing_targets = [target] if es.indices.exists(index=target) else []
+
+    sources = current_sources(es, name, existing_targets)
+    if not sources:
+        logger.info(f"{name}: nothing to migrate to {version}")
+        return
+
+    # Same clock and format as the @timestamp written by ElasticsearchManager.write_to_es
+    started_at = datetime.now().isoformat()
+    targets, default_dest, script = prepare_targets(es, name, version, partitioned, sources)
+
+    copy_documents(es, sources, default_dest, script)
+    # Pick up writes that happened while the first pass was running
+    copy_documents(es, sources, default_dest, script, since=started_at)
+
+    legacy = _is_legacy_index(es, name)
+    actions = [{"add": {"index": target, "alias": name}} for target in targets]
+    if legacy:
+        actions.append({"remove_index": {"index": name}})
+    else:
+        actions.extend({"remove": {"index": source, "alias": name}} for source in sources)
+    es.indices.update_aliases(actions=actions)
+    logger.info(f"{name}: alias now points to {targets}")
+
+    if partitioned:
+        # Stop older templates from attaching new partitions to the alias
+        for old_version in range(1, int(version.lstrip("v"))):
+            old_template = template_name(name, f"v{old_version}")
+            if es.indices.exists_index_template(name=old_template):
+                es.indices.delete_index_template(name=old_template)
+                logger.info(f"Deleted index template: {old_template}")
+
+    if delete_source and not legacy:
+        for source in sources:
+            es.indices.delete(index=source)
+            logger.info(f"Deleted index: {source}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reindex collector indices to a new mapping version")
+    parser.add_argument("--to", dest="version", default="v2", help="Target mapping version (default: v2)")
+    parser.add_argument(
+        "--index",
+        action="append",
+        help="Index/alias to migrate (repeatable, default: all managed indices)",
+    )
+    parser.add_argument(
+        "--delete-source",
+        action="store_true",
+        help="Delete the old indices after the alias swap",
+    )
+    parser.add_argument(
+        "--catch-up-since",
+        help="Only copy documents written to the old indices since this ISO timestamp",
+    )
+    args = parser.parse_args()
+
+    es = get_es_client()
+    wait_for_elasticsearch(es)
+
+    names = args.index or list(PARTITIONED_INDEXES + PLAIN_INDEXES)
+    for name in names:
+        logger.info(f"Migrating {name} to mapping {args.version}")
+        migrate_index(
+            es,
+            name,
+            args.version,
+            partitioned=name in PARTITIONED_INDEXES,
+            delete_source=args.delete_source,
+            catch_up_since=args.catch_up_since,
+        )
+
+
+if __name__ == "__main__":
+    main()
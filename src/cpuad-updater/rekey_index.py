@@ -0,0 +1,166 @@
+"""
+Re-key the documents of the collector's indices after a document id change.
+
+Document ids are hashes of the key properties each index declares in
+doc_ids.KEY_PROPERTIES, with the hash function selected by DOC_ID_HASH. When
+either changes, the collector writes new ids and the documents already stored
+under the old ones would be duplicated. For every index this tool:
+
+1. reads all documents through a point-in-time and computes their new id,
+2. copies every document whose id differs to its new id in the same concrete
+   index (op_type create, so a document the collector already wrote under the
+   new id is kept),
+3. deletes the old documents whose new id exists (checked with mget, so a
+   failed copy never loses data),
+4. records the key scheme in the `_meta` of the index ("doc_id_scheme"), so
+   later runs skip indices that are already keyed by it.
+
+The ids are computed client-side because _reindex scripts cannot compute the
+non-SHA-256 hashes. Documents that lack a key property (the user metrics
+fallback ids) keep their id. Re-running is safe: documents that already have
+their new id are left alone.
+
+Usage:
+    DOC_ID_HASH=xxh3 python rekey_index.py
+    python rekey_index.py --index copilot_user_metrics --hash blake2b --dry-run
+
+Stop the collector (or run this between collections) and set the same
+DOC_ID_HASH for it afterwards.
+"""
+
+import argparse
+import logging
+
+from bulk_writer import BulkWriter
+from doc_ids import DOC_ID_HASH, KEY_PROPERTIES, key_scheme
+from es_client import get_es_client, wait_for_elasticsearch
+from parallel_scan import open_point_in_time, close_point_in_time, iter_slice
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - [%(levelname)s] - %(message)s")
+logger = logging.getLogger(__name__)
+
+META_KEY = "doc_id_scheme"
+# Old/new id pairs checked per mget in the delete pass
+MGET_BATCH_SIZE = 1000
+
+
+def stored_schemes(es, name):
+    """{concrete index: recorded doc_id_scheme or None} of an index or alias."""
+    mappings = es.indices.get_mapping(index=name)
+    return {
+        index: mapping["mappings"].get("_meta", {}).get(META_KEY)
+        for index, mapping in mappings.items()
+    }
+
+
+def record_scheme(es, name, scheme):
+    """Store the scheme in the _meta of every concrete index, keeping the other _meta keys."""
+    for index, mapping in es.indices.get_mapping(index=name).items():
+        meta = dict(mapping["mappings"].get("_meta", {}))
+        meta[META_KEY] = scheme.describe()
+        es.indices.put_mapping(index=index, meta=meta)
+
+
+def copy_to_new_ids(es, name, scheme, writer, dry_run=False):
+    """Queue a copy of every document whose id changes; returns [(index, old id, new id)]."""
+    moved = []
+    scanned = 0
+    pit_id = open_point_in_time(es, name)
+    try:
+        for hits in iter_slice(es, pit_id, 0, 1):
+            scanned += len(hits)
+            for hit in hits:
+                source = hit["_source"]
+                if not scheme.has_key(source):
+                    continue
+                new_id = scheme.id(source)
+                if new_id == hit["_id"]:
+                    continue
+                moved.append((hit["_index"], hit["_id"], new_id))
+                if dry_run:
+                    continue
+                if "unique_hash" in source:
+                    source["unique_hash"] = new_id
+                writer.add(
+                    {"_op_type": "create", "_index": hit["_index"], "_id": new_id, "_source": source},
+                    stats_key=f"{name} copy",
+                )
+    finally:
+        close_point_in_time(es, pit_id)
+    logger.info(f"{name}: {scanned} documents scanned, {len(moved)} to re-key")
+    return moved
+
+
+def delete_old_ids(es, name, moved, writer):
+    """Delete the old documents of `moved` whose new id exists; returns how many were kept."""
+    missing = 0
+    for start in range(0, len(moved), MGET_BATCH_SIZE):
+        batch = moved[start:start + MGET_BATCH_SIZE]
+        resp = es.mget(docs=[{"_index": index, "_id": new_id} for index, _, new_id in batch], source=False)
+        for (index, old_id, _), doc in zip(batch, resp["docs"]):
+            if not doc.get("found"):
+                missing += 1
+                continue
+            writer.add({"_op_type": "delete", "_index": index, "_id": old_id}, stats_key=f"{name} delete")
+    return missing
+
+
+def rekey_index(es, name, hash_name=None, dry_run=False, force=False):
+    """Re-key one index or alias; returns the number of documents moved."""
+    if not es.indices.exists(index=name):
+        logger.info(f"{name} does not exist, skipping")
+        return 0
+
+    scheme = key_scheme(name, hash_name)
+    if not force and all(stored == scheme.describe() for stored in stored_schemes(es, name).values()):
+        logger.info(f"{name} is already keyed by {scheme.describe()}, skipping (use --force to check anyway)")
+        return 0
+
+    logger.info(f"Re-keying {name} with {scheme.describe()}")
+    with BulkWriter(es) as writer:
+        moved = copy_to_new_ids(es, name, scheme, writer, dry_run=dry_run)
+    if dry_run:
+        return len(moved)
+    writer.log_stats()
+    if writer.totals()["failed"]:
+        logger.warning(
+            f"{name}: {writer.totals()['failed']} copies failed or already existed under their new id"
+        )
+
+    with BulkWriter(es) as writer:
+        missing = delete_old_ids(es, name, moved, writer)
+    writer.log_stats()
+    if missing or writer.totals()["failed"]:
+        logger.error(
+            f"{name}: {missing} documents were not copied and {writer.totals()['failed']} deletes failed; "
+            "kept their old ids, re-run to retry"
+        )
+        return len(moved) - missing
+
+    record_scheme(es, name, scheme)
+    logger.info(f"{name}: re-keyed {len(moved)} documents")
+    return len(moved)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-key collector indices after a document id change")
+    parser.add_argument(
+        "--index",
+        action="append",
+        choices=sorted(KEY_PROPERTIES),
+        help="Index/alias to re-key (repeatable, default: all indices with declared key properties)",
+    )
+    parser.add_argument("--hash", default=DOC_ID_HASH, help=f"Document id hash (default: {DOC_ID_HASH})")
+    parser.add_argument("--force", action="store_true", help="Check indices whose recorded scheme matches too")
+    parser.add_argument("--dry-run", action="store_true", help="Count the documents to re-key, but do not write")
+    args = parser.parse_args()
+
+    es = get_es_client()
+    wait_for_elasticsearch(es)
+
+    for name in args.index or list(KEY_PROPERTIES):
+        rekey_index(es, name, hash_name=args.hash, dry_run=args.dry_run, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Rebuild copilot_user_adoption from the persisted per-user aggregates.
+
+Every collector run stores the inputs of the adoption score (volume, active
+days, acceptance counts, LOC, feature usage and team) per user, org and
+report period in copilot_user_adoption_aggregates. This script reads them
+back and re-scores the leaderboards with the weights, consistency bonus and
+top N given on the command line (or ADOPTION_WEIGHTS, ADOPTION_CONSISTENCY_BONUS
+and ADOPTION_TOP_N), without calling GitHub or reading the user metrics.
+
+By default the latest report period of every organization is re-scored.
+Entries of a re-scored period that are no longer produced (for example users
+that dropped out of a smaller top N) are deleted.
+
+Usage:
+    python rescore_adoption.py --weights volume=0.4,acceptance_rate=0.1 --top-n 5
+    python rescore_adoption.py --org my-org --report-end-day 2025-04-30 --dry-run
+"""
+
+import os
+import argparse
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from bulk_writer import BulkWriter
+from es_client import get_es_client, ensure_managed_index
+from log_utils import current_time
+from parallel_scan import open_point_in_time, close_point_in_time, iter_slice
+from adoption_leaderboard import (
+    CONSISTENCY_BONUS,
+    NO_TEAM,
+    SIGNAL_WEIGHTS,
+    TOP_N,
+    build_adoption_entries,
+    parse_weights,
+    signals_from_documents,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - [%(levelname)s] - %(message)s")
+logger = logging.getLogger(__name__)
+
+AGGREGATES_INDEX = os.getenv("INDEX_USER_ADOPTION_AGGREGATES", "copilot_user_adoption_aggregates")
+ADOPTION_INDEX = os.getenv("INDEX_USER_ADOPTION", "copilot_user_adoption")
+
+
+def write_aggregates(documents, es=None):
+    """Index aggregate documents (from adoption_leaderboard.aggregate_documents)."""
+    es = es or get_es_client()
+    ensure_managed_index(AGGREGATES_INDEX, es=es)
+    last_updated_at = current_time()
+    timestamp = datetime.now().isoformat()
+    with BulkWriter(es) as writer:
+        for document in documents:
+            document["last_updated_at"] = last_updated_at
+            document["@timestamp"] = timestamp
+            writer.add(
+                {"_index": AGGREGATES_INDEX, "_id": document["unique_hash"], "_source": document},
+                stats_key=AGGREGATES_INDEX,
+            )
+    return writer.totals()["indexed"]
+
+
+def latest_periods(es, organization_slug=None):
+    """{organization_slug: latest report_end_day} over the aggregates."""
+    query = {"term": {"organization_slug": organization_slug}} if organization_slug else {"match_all": {}}
+    response = es.search(
+        index=AGGREGATES_INDEX,
+        size=0,
+        query=query,
+        aggs={
+            "orgs": {
+                "terms": {"field": "organization_slug", "size": 10000},
+                "aggs": {"latest": {"max": {"field": "report_end_day", "format": "yyyy-MM-dd"}}},
+            }
+        },
+    )
+    return {
+        bucket["key"]: bucket["latest"]["value_as_string"]
+        for bucket in response["aggregations"]["orgs"]["buckets"]
+        if bucket["latest"].get("value_as_string")
+    }
+
+
+def load_period(es, organization_slug, report_end_day):
+    """Aggregate documents of one org and report end day, grouped by (slug_type, window_days)."""
+    query = {
+        "bool": {
+            "filter": [
+                {"term": {"organization_slug": organization_slug}},
+                {"term": {"report_end_day": report_end_day}},
+            ]
+        }
+    }
+    groups = defaultdict(list)
+    pit_id = open_point_in_time(es, AGGREGATES_INDEX)
+    try:
+        for hits in iter_slice(es, pit_id, 0, 1, query=query):
+            for hit in hits:
+                document = hit["_source"]
+                groups[(document.get("slug_type"), document.get("window_days"))].append(document)
+    finally:
+        close_point_in_time(es, pit_id)
+    return groups
+
+
+def period_query(organization_slug, slug_type, report_end_day, window_days):
+    """Leaderboard entries of one org, period and window in copilot_user_adoption."""
+    filters = [
+        {"term": {"organization_slug": organization_slug}},
+        {"term": {"slug_type": slug_type}},
+        {"term": {"report_end_day": report_end_day}},
+    ]
+    query = {"bool": {"filter": filters}}
+    if window_days is None:
+        query["bool"]["must_not"] = [{"exists": {"field": "window_days"}}]
+    else:
+        filters.append({"term": {"window_days": window_days}})
+    return query
+
+
+def rescore_period(
+    es,
+    organization_slug,
+    report_end_day,
+    top_n=TOP_N,
+    weights=None,
+    consistency_bonus=CONSISTENCY_BONUS,
+    dry_run=False,
+):
+    """Re-score one org and report period; returns the number of entries written."""
+    written = 0
+    for (slug_type, window_days), documents in load_period(es, organization_slug, report_end_day).items():
+        signals = signals_from_documents(documents)
+        user_teams = None
+        if any("team_slug" in document for document in documents):
+            user_teams = {
+                document["user_login"]: document.get("team_slug") or NO_TEAM for document in documents
+            }
+        entries = build_adoption_entries(
+            signals,
+            organization_slug,
+            slug_type,
+            top_n=top_n,
+            user_teams=user_teams,
+            weights=weights,
+            consistency_bonus=consistency_bonus,
+        )
+        logger.info(
+            f"{organization_slug} {report_end_day} window={window_days}: "
+            f"{len(signals)} users -> {len(entries)} leaderboard entries"
+        )
+        if dry_run:
+            continue
+
+        last_updated_at = current_time()
+        timestamp = datetime.now().isoformat()
+        with BulkWriter(es) as writer:
+            for entry in entries:
+                entry["last_updated_at"] = last_updated_at
+                entry["@timestamp"] = timestamp
+                writer.add(
+                    {"_index": ADOPTION_INDEX, "_id": entry["unique_hash"], "_source": entry},
+                    stats_key=ADOPTION_INDEX,
+                )
+        if writer.errors:
+            logger.error(f"{len(writer.errors)} entries failed, keeping the previous entries of this period")
+            continue
+        written += len(entries)
+
+        # Drop entries of the period that the new scoring no longer produces
+        query = period_query(organization_slug, slug_type, report_end_day, window_days)
+        query["bool"].setdefault("must_not", []).append(
+            {"ids": {"values": [entry["unique_hash"] for entry in entries]}}
+        )
+        deleted = es.delete_by_query(index=ADOPTION_INDEX, query=query, conflicts="proceed")
+        if deleted.get("deleted"):
+            logger.info(f"Deleted {deleted['deleted']} stale leaderboard entries")
+    return written
+
+
+def rescore(
+    organization_slug=None,
+    report_end_day=None,
+    top_n=TOP_N,
+    weights=None,
+    consistency_bonus=CONSISTENCY_BONUS,
+    dry_run=False,
+    es=None,
+):
+    """Re-score the latest period of every org (or the given org / period)."""
+    es = es or get_es_client()
+    ensure_managed_index(AGGREGATES_INDEX, es=es)
+    if report_end_day and organization_slug:
+        periods = {organization_slug: report_end_day}
+    else:
+        periods = latest_periods(es, organization_slug)
+        if report_end_day:
+            periods = {org: report_end_day for org in periods}
+    if not periods:
+        logger.warning(f"No adoption aggregates found in {AGGREGATES_INDEX}")
+        return 0
+
+    written = 0
+    for org, end_day in periods.items():
+        written += rescore_period(
+            es,
+            org,
+            end_day,
+            top_n=top_n,
+            weights=weights,
+            consistency_bonus=consistency_bonus,
+            dry_run=dry_run,
+        )
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--org", help="Only re-score this organization or enterprise slug")
+    parser.add_argument("--report-end-day", help="Report period to re-score (YYYY-MM-DD), default: latest")
+    parser.add_argument("--top-n", type=int, default=TOP_N)
+    parser.add_argument(
+        "--weights",
+        type=parse_weights,
+        default=SIGNAL_WEIGHTS,
+        help="signal=weight,... for volume, interactions_per_day, acceptance_rate, average_loc_added, feature_breadth",
+    )
+    parser.add_argument("--consistency-bonus", type=float, default=CONSISTENCY_BONUS)
+    parser.add_argument("--dry-run", action="store_true", help="Score and log, but do not write")
+    args = parser.parse_args()
+
+    written = rescore(
+        organization_slug=args.org,
+        report_end_day=args.report_end_day,
+        top_n=args.top_n,
+        weights=args.weights,
+        consistency_bonus=args.consistency_bonus,
+        dry_run=args.dry_run,
+    )
+    logger.info(f"Wrote {written} adoption leaderboard entries to {ADOPTION_INDEX}")
+
+
+if __name__ == "__main__":
+    main()
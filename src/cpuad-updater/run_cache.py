@@ -0,0 +1,143 @@
+"""
+Run-scoped memo cache for organization-level GitHub listings.
+
+Listings such as the members, repositories or teams of an organization do
+not change within a collection run, but several stages page through them
+(the developer activity fetcher used to list every repository once per
+member). cached_listing() fetches each listing once per run and serves it
+from memory afterwards; concurrent callers of the same key wait for the
+first fetch instead of repeating it.
+
+With RUN_CACHE_TTL_HOURS set, listings are also kept as JSON files under
+RUN_CACHE_PATH and reused by later runs (and processes) until they are older
+than the TTL. Empty listings are never cached, since the fetchers return []
+on errors. main.py starts a new run (start_run) at every collection cycle and
+logs the hit/miss counters at its end.
+
+Configuration:
+
+- RUN_CACHE_TTL_HOURS: hours a listing is reused across runs, 0 (default)
+  keeps it for the current run only,
+- RUN_CACHE_PATH: folder of the persisted listings (default LOG_PATH/cache).
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+RUN_CACHE_TTL_HOURS = float(os.getenv("RUN_CACHE_TTL_HOURS", "0"))
+RUN_CACHE_PATH = os.getenv("RUN_CACHE_PATH", os.path.join(os.getenv("LOG_PATH", "logs"), "cache"))
+
+
+def _file_name(key):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", "-".join(str(part) for part in key)) + ".json"
+
+
+class RunCache:
+    """Memoizes listings by key for one run, optionally persisted with a TTL."""
+
+    def __init__(self, ttl_hours=RUN_CACHE_TTL_HOURS, path=RUN_CACHE_PATH):
+        self.ttl_seconds = ttl_hours * 3600
+        self.path = path
+        self._values = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "persisted_hits": 0, "misses": 0}
+
+    def start_run(self):
+        """Forget the listings of the previous run and reset the counters."""
+        with self._lock:
+            self._values.clear()
+            self._key_locks.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _load(self, key):
+        if not self.ttl_seconds:
+            return None
+        path = os.path.join(self.path, _file_name(key))
+        try:
+            with open(path, "r", encoding="utf8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("stored_at", 0) > self.ttl_seconds:
+            return None
+        return entry.get("value")
+
+    def _store(self, key, value):
+        if not self.ttl_seconds:
+            return
+        path = os.path.join(self.path, _file_name(key))
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf8") as f:
+                json.dump({"key": list(key), "stored_at": time.time(), "value": value}, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.warning(f"Failed to persist cached listing {path}: {e}")
+
+    def get(self, key, fetch):
+        """The listing of `key` (a tuple), calling fetch() on the first request of the run."""
+        key = tuple(key)
+        if key in self._values:
+            self._count("hits")
+            return self._values[key]
+
+        with self._key_lock(key):
+            # Fetched by another thread while this one waited
+            if key in self._values:
+                self._count("hits")
+                return self._values[key]
+
+            value = self._load(key)
+            if value is not None:
+                self._count("persisted_hits")
+            else:
+                self._count("misses")
+                value = fetch()
+                if not value:
+                    return value
+                self._store(key, value)
+            self._values[key] = value
+            return value
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(
+            f"Run cache: {stats['hits']} hits, {stats['persisted_hits']} persisted hits, "
+            f"{stats['misses']} misses"
+        )
+
+
+_run_cache = RunCache()
+
+
+def get_run_cache():
+    """The process-wide RunCache."""
+    return _run_cache
+
+
+def cached_listing(key, fetch):
+    """get_run_cache().get(key, fetch)."""
+    return _run_cache.get(key, fetch)
+
+
+def start_run():
+    _run_cache.start_run()
@@ -0,0 +1,171 @@
+"""
+Pacing of GitHub search API calls shared by concurrent workers.
+
+The search endpoints (search/issues, search/commits) allow 30 requests per
+minute per token and answer bursts with 403/429 secondary rate limits. The
+developer activity fetcher processes members on a thread pool, and every
+search call goes through one process-wide SearchScheduler:
+
+- calls are spaced evenly, SEARCH_REQUESTS_PER_MINUTE per minute, instead of
+  being sent in bursts,
+- waiting calls are served by priority (HIGH_PRIORITY before
+  NORMAL_PRIORITY, e.g. Copilot seat holders first), then in arrival order,
+- a rate limited response holds every caller for its Retry-After (or until
+  the rate limit reset) and the call is retried up to SEARCH_MAX_RETRIES
+  times, so members are not recorded with zeros.
+
+Progress logs how many items of a long run are done, the throughput and the
+ETA every PROGRESS_LOG_SECONDS.
+"""
+
+import os
+import time
+import heapq
+import logging
+import itertools
+import threading
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+SEARCH_REQUESTS_PER_MINUTE = float(os.getenv("SEARCH_REQUESTS_PER_MINUTE", "30"))
+SEARCH_MAX_RETRIES = int(os.getenv("SEARCH_MAX_RETRIES", "3"))
+PROGRESS_LOG_SECONDS = 60
+
+HIGH_PRIORITY = 0
+NORMAL_PRIORITY = 1
+
+# Wait after a rate limited response that says nothing about when to retry
+DEFAULT_RETRY_AFTER = 60
+
+
+def retry_after(response):
+    """Seconds to wait after a rate limited response, or None if it is not one."""
+    if response.status_code not in (403, 429):
+        return None
+    headers = response.headers
+    if headers.get("Retry-After"):
+        try:
+            return max(1.0, float(headers["Retry-After"]))
+        except ValueError:
+            return DEFAULT_RETRY_AFTER
+    if headers.get("X-RateLimit-Remaining") == "0" and headers.get("X-RateLimit-Reset"):
+        return max(1.0, float(headers["X-RateLimit-Reset"]) - time.time())
+    if response.status_code == 429 or "rate limit" in response.text.lower():
+        return DEFAULT_RETRY_AFTER
+    # A 403 for another reason (permissions, SSO)
+    return None
+
+
+class SearchScheduler:
+    """Lets one search call through every 60 / `requests_per_minute` seconds, by priority."""
+
+    def __init__(self, requests_per_minute=SEARCH_REQUESTS_PER_MINUTE, max_retries=SEARCH_MAX_RETRIES):
+        self.interval = 60.0 / max(requests_per_minute, 0.001)
+        self.max_retries = max_retries
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._next_slot = time.monotonic()
+        self._counters = {"requests": 0, "rate_limited": 0, "failed": 0, "waited_seconds": 0.0}
+
+    def acquire(self, priority=NORMAL_PRIORITY):
+        """Block until this caller may send one search request."""
+        ticket = (priority, next(self._sequence))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                now = time.monotonic()
+                first = self._waiting[0] == ticket
+                if first and now >= self._next_slot:
+                    heapq.heappop(self._waiting)
+                    # An idle scheduler does not bank slots for a later burst
+                    self._next_slot = max(self._next_slot, now) + self.interval
+                    self._counters["requests"] += 1
+                    self._counters["waited_seconds"] += now - start
+                    self._cond.notify_all()
+                    return
+                self._cond.wait(self._next_slot - now if first else None)
+
+    def hold(self, seconds):
+        """Delay every caller by `seconds` from now, after a rate limited response."""
+        with self._cond:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+            self._counters["rate_limited"] += 1
+            self._cond.notify_all()
+
+    def get(self, url, headers, priority=NORMAL_PRIORITY):
+        """
+        requests.get of a search URL, paced and retried on rate limits.
+
+        Returns the last response, which is still rate limited when the
+        retries ran out.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(priority)
+            response = requests.get(url, headers=headers)
+            wait = retry_after(response)
+            if wait is None:
+                return response
+            logger.warning(
+                f"Search rate limited (HTTP {response.status_code}), holding searches for {wait:.0f}s "
+                f"(attempt {attempt + 1}/{self.max_retries + 1})"
+            )
+            self.hold(wait)
+        with self._cond:
+            self._counters["failed"] += 1
+        return response
+
+    def stats(self):
+        with self._cond:
+            return dict(self._counters)
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.info(
+            f"Search scheduler: {stats['requests']} requests, {stats['rate_limited']} rate limited, "
+            f"{stats['failed']} failed, {stats['waited_seconds']:.0f}s waited in total"
+        )
+
+
+class Progress:
+    """Thread-safe done/total counter that logs throughput and ETA periodically."""
+
+    def __init__(self, total, label, log_seconds=PROGRESS_LOG_SECONDS):
+        self.total = total
+        self.label = label
+        self.log_seconds = log_seconds
+        self.done = 0
+        self._start = time.monotonic()
+        self._last_log = self._start
+        self._lock = threading.Lock()
+
+    def advance(self, count=1):
+        with self._lock:
+            self.done += count
+            now = time.monotonic()
+            if now - self._last_log < self.log_seconds and self.done < self.total:
+                return
+            self._last_log = now
+            elapsed = now - self._start
+            rate = self.done / elapsed if elapsed else 0.0
+            remaining = self.total - self.done
+            eta = f"{remaining / rate / 60:.1f} min" if rate else "unknown"
+        logger.info(
+            f"{self.label}: {self.done}/{self.total} done, {rate * 60:.1f}/min, ETA {eta}"
+        )
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_search_scheduler():
+    """The process-wide SearchScheduler; the search limit is per token, not per fetcher."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SearchScheduler()
+        return _scheduler
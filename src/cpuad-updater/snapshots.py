@@ -0,0 +1,220 @@
+"""
+Compressed NDJSON snapshots of the data fetched from GitHub.
+
+The collector keeps a copy of every API response and derived list it indexes
+(under LOG_PATH/<date>/) for debugging and for rebuilding the indices. Those
+used to be pretty-printed JSON written synchronously, which on large orgs took
+more CPU and disk time than the Elasticsearch writes.
+
+save_snapshot() encodes the data as compact NDJSON (one line per list item) on
+the calling thread, with the C JSON encoder and before the caller can mutate
+the data any further, and hands the bytes to a background thread through a
+bounded queue. That thread compresses and writes them, so compression and disk
+I/O are off the critical path; a full queue blocks the caller instead of
+buffering without limit.
+
+Configuration:
+
+- SNAPSHOT_COMPRESSION: gzip (default), zstd (needs the `zstandard` package,
+  falls back to gzip without it) or none,
+- SNAPSHOT_ARTIFACTS: comma separated artifact types to keep, "all" (default)
+  or "none"; see ARTIFACTS,
+- SNAPSHOT_QUEUE_SIZE: snapshots waiting to be written before callers block.
+"""
+
+import os
+import json
+import gzip
+import queue
+import atexit
+import logging
+import threading
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for SNAPSHOT_COMPRESSION=zstd
+    zstandard = None
+
+from config import Paras
+
+logger = logging.getLogger(__name__)
+
+ARTIFACTS = (
+    "organizations",
+    "copilot_metrics",
+    "copilot_usage",
+    "seat_info",
+    "seat_assignments",
+    "teams",
+    "user_metrics",
+    "developer_activity",
+)
+
+SNAPSHOT_COMPRESSION = os.getenv("SNAPSHOT_COMPRESSION", "gzip").lower()
+SNAPSHOT_QUEUE_SIZE = int(os.getenv("SNAPSHOT_QUEUE_SIZE", "8"))
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _parse_artifacts(spec):
+    spec = spec.strip().lower()
+    if spec == "all":
+        return set(ARTIFACTS)
+    if spec in ("", "none"):
+        return set()
+    artifacts = {artifact.strip() for artifact in spec.split(",") if artifact.strip()}
+    unknown = artifacts - set(ARTIFACTS)
+    if unknown:
+        logger.warning(f"Ignoring unknown snapshot artifacts: {', '.join(sorted(unknown))}")
+    return artifacts & set(ARTIFACTS)
+
+
+SNAPSHOT_ARTIFACTS = _parse_artifacts(os.getenv("SNAPSHOT_ARTIFACTS", "all"))
+
+
+def _compression(name):
+    if name == "zstd" and zstandard is None:
+        logger.warning("SNAPSHOT_COMPRESSION=zstd needs the zstandard package, using gzip")
+        return "gzip"
+    if name not in ("gzip", "zstd", "none"):
+        logger.warning(f"Unknown SNAPSHOT_COMPRESSION '{name}', using gzip")
+        return "gzip"
+    return name
+
+
+SUFFIXES = {"gzip": ".ndjson.gz", "zstd": ".ndjson.zst", "none": ".ndjson"}
+
+
+def snapshot_enabled(artifact):
+    """Whether snapshots of `artifact` are kept (untyped snapshots always are)."""
+    return artifact is None or artifact in SNAPSHOT_ARTIFACTS
+
+
+def encode_ndjson(data):
+    """Compact NDJSON bytes: one line per item of a list, one line for anything else."""
+    items = data if isinstance(data, list) else [data]
+    return "".join(json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n" for item in items).encode()
+
+
+def read_ndjson(path):
+    """Yield the items of a snapshot written by save_snapshot (any compression)."""
+    if path.endswith(".gz"):
+        opener = gzip.open(path, "rt", encoding="utf8")
+    elif path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"Reading {path} needs the zstandard package")
+        opener = zstandard.open(path, "rt", encoding="utf8")
+    else:
+        opener = open(path, "r", encoding="utf8")
+    with opener as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class SnapshotWriter:
+    """Compresses and writes encoded snapshots on a background thread."""
+
+    def __init__(self, compression=SNAPSHOT_COMPRESSION, queue_size=SNAPSHOT_QUEUE_SIZE):
+        self.compression = _compression(compression)
+        self.suffix = SUFFIXES[self.compression]
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, payload, path):
+        """Queue encoded `payload` for `path` (without suffix); returns the final path."""
+        self._ensure_started()
+        path = path + self.suffix
+        self._queue.put((payload, path))
+        return path
+
+    def flush(self):
+        """Block until every queued snapshot is written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _write(self, payload, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        if self.compression == "gzip":
+            with gzip.open(tmp_path, "wb", compresslevel=GZIP_LEVEL) as f:
+                f.write(payload)
+        elif self.compression == "zstd":
+            with open(tmp_path, "wb") as f:
+                f.write(zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload))
+        else:
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+        os.replace(tmp_path, path)
+
+    def _run(self):
+        while True:
+            payload, path = self._queue.get()
+            try:
+                self._write(payload, path)
+                logger.info(f"Data saved to {path}")
+            except Exception as e:
+                logger.error(f"Failed to write snapshot {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_snapshot_writer():
+    """The process-wide SnapshotWriter; queued snapshots are flushed at exit."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SnapshotWriter()
+            atexit.register(_writer.flush)
+        return _writer
+
+
+def save_snapshot(data, file_name, logs_path, date_str, artifact=None):
+    """
+    Queue a snapshot of `data` as <logs_path>/<file_name>_<date_str>.ndjson[.gz|.zst].
+
+    Returns the path it will be written to, or None when there is nothing to
+    write or `artifact` snapshots are turned off.
+    """
+    if not data or not snapshot_enabled(artifact):
+        return None
+    payload = encode_ndjson(data)
+    return get_snapshot_writer().submit(payload, os.path.join(logs_path, f"{file_name}_{date_str}"))
+
+
+def flush_snapshots():
+    if _writer is not None:
+        _writer.flush()
+
+
+def dict_save_to_json_file(
+    data, file_name, logs_path=None, save_to_json=True, artifact=None
+):
+    """
+    Snapshot `data` to <logs_path>/<file_name>_<date>.ndjson.gz in the background.
+
+    `artifact` is the snapshot type (see snapshots.ARTIFACTS) that
+    SNAPSHOT_ARTIFACTS selects on; `logs_path` defaults to today's log folder.
+    """
+    if not data:
+        logger.warning(f"No data to save for {file_name}")
+        return
+    if save_to_json:
+        save_snapshot(
+            data,
+            file_name,
+            logs_path or Paras.get_log_path(),
+            Paras.date_str(),
+            artifact=artifact,
+        )
@@ -0,0 +1,168 @@
+"""
+Transforms from GitHub API data to Elasticsearch documents.
+
+Shared by the collector (collector.py) and by rebuild_from_snapshots.py, which
+replays archived snapshots through the same code:
+
+- convert_metrics_to_usage: Copilot metrics API -> legacy usage rows,
+- DataSplitter: usage rows -> total, breakdown and breakdown_chat documents,
+- enrich_user_metrics: user metrics report record -> copilot_user_metrics document.
+"""
+
+import logging
+
+from config import Indexes
+from doc_ids import generate_unique_hash, key_scheme
+from metrics_2_usage_convertor import convert_metrics_to_usage  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+def calculate_top_values(user_data):
+    """Calculate top model, language, and feature from user metrics data"""
+    
+    # Initialize counters
+    model_counts = {}
+    language_counts = {}
+    feature_counts = {}
+    
+    # Extract from totals_by_language_model
+    for entry in user_data.get('totals_by_language_model', []):
+        language = entry.get('language', 'unknown')
+        model = entry.get('model', 'unknown')
+        activity_count = entry.get('code_generation_activity_count', 0)
+        
+        language_counts[language] = language_counts.get(language, 0) + activity_count
+        model_counts[model] = model_counts.get(model, 0) + activity_count
+    
+    # Extract from totals_by_feature
+    for entry in user_data.get('totals_by_feature', []):
+        feature = entry.get('feature', 'unknown')
+        activity_count = entry.get('code_generation_activity_count', 0) + entry.get('user_initiated_interaction_count', 0)
+        
+        feature_counts[feature] = feature_counts.get(feature, 0) + activity_count
+    
+    # Extract from totals_by_language_feature (additional language data)
+    for entry in user_data.get('totals_by_language_feature', []):
+        language = entry.get('language', 'unknown')
+        activity_count = entry.get('code_generation_activity_count', 0)
+        
+        language_counts[language] = language_counts.get(language, 0) + activity_count
+    
+    # Find top values (most used)
+    top_model = max(model_counts.items(), key=lambda x: x[1])[0] if model_counts else 'unknown'
+    top_language = max(language_counts.items(), key=lambda x: x[1])[0] if language_counts else 'unknown'
+    top_feature = max(feature_counts.items(), key=lambda x: x[1])[0] if feature_counts else 'unknown'
+    
+    # Map feature names to more user-friendly names
+    feature_mapping = {
+        'chat_panel_ask_mode': 'Chat',
+        'chat_panel_agent_mode': 'Agent',
+        'agent_edit': 'Agent',
+        'code_completion': 'Code Completion',
+        'inline_chat': 'Inline Chat'
+    }
+    
+    top_feature = feature_mapping.get(top_feature, top_feature)
+    
+    return {
+        'top_model': top_model,
+        'top_language': top_language, 
+        'top_feature': top_feature
+    }
+
+
+def enrich_user_metrics(
+    user_data,
+    organization_slug,
+    slug_type,
+    utc_offset,
+    last_updated_at,
+    download_link_index=None,
+    top_values=True,
+):
+    """
+    copilot_user_metrics document for one record of a user metrics report.
+
+    Adds the org context, the top model/language/feature (unless `top_values`
+    is False) and the unique hash: user + day, or the update time (and download
+    link) when the record lacks them.
+    """
+    enriched_user_data = {
+        **user_data,
+        **(calculate_top_values(user_data) if top_values else {}),
+        "organization_slug": organization_slug,
+        "slug_type": slug_type,
+        "last_updated_at": last_updated_at,
+        "utc_offset": utc_offset,
+    }
+    fallback_properties = ["organization_slug", "last_updated_at"]
+    if download_link_index is not None:
+        enriched_user_data["download_link_index"] = download_link_index
+        fallback_properties.append("download_link_index")
+
+    if "user_login" in enriched_user_data and "day" in enriched_user_data:
+        enriched_user_data["unique_hash"] = key_scheme(Indexes.index_user_metrics).id(enriched_user_data)
+    else:
+        enriched_user_data["unique_hash"] = generate_unique_hash(enriched_user_data, fallback_properties)
+    return enriched_user_data
+
+
+class DataSplitter:
+    """
+    Split Copilot usage rows into total, breakdown and breakdown_chat documents.
+
+    iter_docs() makes a single pass and turns each row and its breakdown
+    entries into documents in place, so the rows are consumed by it.
+    """
+
+    # Fields corrected for 0 per document type
+    TOTAL_CORRECTED = ("total_suggestions_count", "total_lines_suggested", "total_chat_turns")
+    BREAKDOWN_CORRECTED = ("suggestions_count", "lines_suggested")
+    BREAKDOWN_CHAT_CORRECTED = ("chat_turns",)
+
+    def __init__(self, data, additional_properties={}):
+        self.data = data
+        self.additional_properties = additional_properties
+        self.correction_for_0 = 0
+        # organization_slug and team_slug are the same for every document, so
+        # they are bound into the key prefix of each index once
+        self.key_schemes = {
+            index_name: key_scheme(index_name).bind(additional_properties)
+            for index_name in (
+                Indexes.index_name_total,
+                Indexes.index_name_breakdown,
+                Indexes.index_name_breakdown_chat,
+            )
+        }
+
+    def _finish(self, doc, index_name, corrected_fields):
+        doc.update(self.additional_properties)
+        doc["unique_hash"] = self.key_schemes[index_name].id(doc)
+        # If the denominator value is 0, it is corrected to a uniform value
+        for field in corrected_fields:
+            if doc[field] == 0:
+                doc[field] = self.correction_for_0
+        return doc
+
+    def iter_docs(self):
+        """Yield (index name, document) pairs for every row of the data."""
+        logger.info("Generating total, breakdown and breakdown chat documents from data")
+        for entry in self.data:
+            breakdown = entry.pop("breakdown", None) or []
+            breakdown_chat = entry.pop("breakdown_chat", None) or []
+            day = entry.get("day")
+
+            yield Indexes.index_name_total, self._finish(
+                entry, Indexes.index_name_total, self.TOTAL_CORRECTED
+            )
+            for breakdown_entry in breakdown:
+                breakdown_entry["day"] = day
+                yield Indexes.index_name_breakdown, self._finish(
+                    breakdown_entry, Indexes.index_name_breakdown, self.BREAKDOWN_CORRECTED
+                )
+            for breakdown_chat_entry in breakdown_chat:
+                breakdown_chat_entry["day"] = day
+                yield Indexes.index_name_breakdown_chat, self._finish(
+                    breakdown_chat_entry, Indexes.index_name_breakdown_chat, self.BREAKDOWN_CHAT_CORRECTED
+                )